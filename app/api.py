@@ -1,60 +1,97 @@
 from fastapi import FastAPI
-from fastapi.responses import FileResponse, JSONResponse
-import mysql.connector
+from fastapi.responses import FileResponse, JSONResponse, Response
 import sys
-import subprocess
 import os
 
-app = FastAPI()
+# Add the project root to Python path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.worker import get_worker_pool
+from app.utils import load_yaml
+from app.thumbnails import resolve_evidence_path, get_thumbnail
+from app.metrics import render_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from app.storage import get_all_violations, get_pool_stats, get_violation_file_path, get_violation_clip_path
 
-MYSQL_CONFIG = {
-    "host": "localhost",
-    "user": "root",
-    "password": "sanjay@123",
-    "database": "traffic_db"
-}
+app = FastAPI()
 
 @app.get("/detections")
 def get_detections():
-    con = mysql.connector.connect(**MYSQL_CONFIG)
-    cur = con.cursor(dictionary=True)
-    cur.execute("SELECT id, ts_utc, file_path, violation_type, fine FROM violations ORDER BY ts_utc DESC")
-    detections = cur.fetchall()
-    cur.close()
-    con.close()
-    return detections
+    return get_all_violations()
+
+THUMBNAIL_CONFIG = load_yaml("app/config.yaml").get("thumbnails") or {}
+# Evidence files never change once written; FileResponse adds ETag/Last-Modified
+IMAGE_CACHE_HEADERS = {"Cache-Control": f"public, max-age={THUMBNAIL_CONFIG.get('cache_max_age_sec', 31536000)}"}
 
 @app.get("/image/{detection_id}")
 def get_image(detection_id: int):
-    con = mysql.connector.connect(**MYSQL_CONFIG)
-    cur = con.cursor()
-    cur.execute("SELECT file_path FROM violations WHERE id = %s", (detection_id,))
-    result = cur.fetchone()
-    cur.close()
-    con.close()
-    if result:
-        return FileResponse(result[0])
-    return {"error": "Image not found"}
+    file_path = resolve_evidence_path(get_violation_file_path(detection_id))
+    if file_path:
+        return FileResponse(file_path, headers=IMAGE_CACHE_HEADERS)
+    return JSONResponse(content={"error": "Image not found"}, status_code=404)
+
+@app.get("/clip/{detection_id}")
+def get_clip(detection_id: int):
+    """Video clip recorded around a detection"""
+    clip_path = resolve_evidence_path(get_violation_clip_path(detection_id))
+    if clip_path:
+        return FileResponse(clip_path, headers=IMAGE_CACHE_HEADERS)
+    return JSONResponse(content={"error": "Clip not found"}, status_code=404)
+
+@app.get("/thumbnail/{detection_id}")
+def get_thumbnail_image(detection_id: int):
+    """Small cached thumbnail of a detection's evidence image"""
+    file_path = resolve_evidence_path(get_violation_file_path(detection_id))
+    thumb = file_path and get_thumbnail(
+        file_path,
+        max_side=THUMBNAIL_CONFIG.get("max_side", 240),
+        jpeg_quality=THUMBNAIL_CONFIG.get("jpeg_quality", 80),
+        thumb_dir=THUMBNAIL_CONFIG.get("dir", "crops/thumbs"),
+    )
+    if thumb:
+        return FileResponse(thumb, media_type="image/jpeg", headers=IMAGE_CACHE_HEADERS)
+    return JSONResponse(content={"error": "Image not found"}, status_code=404)
+
+@app.get("/db/pool")
+def db_pool_stats():
+    """Database connection usage (pool wait times on MySQL)"""
+    return get_pool_stats()
+
+@app.get("/metrics")
+def metrics():
+    """Detector metrics in the Prometheus text format"""
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+# /predict only reads videos from these directories (app_flask.py saves uploads to "uploads")
+VIDEO_DIRS = ("uploads", "videos")
+
+def is_allowed_video_path(video_path):
+    """True if video_path resolves (symlinks included) to a file inside one of VIDEO_DIRS"""
+    real_path = os.path.realpath(video_path)
+    for video_dir in VIDEO_DIRS:
+        real_dir = os.path.realpath(video_dir)
+        if real_path != real_dir and os.path.commonpath([real_path, real_dir]) == real_dir:
+            return True
+    return False
 
 @app.get("/predict")
-def run_prediction():
-    try:
-        env = os.environ.copy()
-        env["PYTHONPATH"] = os.getcwd()
-        result = subprocess.run(
-            [sys.executable, os.path.join("app", "realtime.py")],
-            cwd=os.getcwd(),
-            env=env,
-            capture_output=True, text=True, check=True
-        )
-        return JSONResponse(content={
-            "message": "Prediction completed.",
-            "stdout": result.stdout,
-            "stderr": result.stderr
-        })
-    except subprocess.CalledProcessError as e:
-        return JSONResponse(content={
-            "message": "Prediction failed.",
-            "stdout": e.stdout,
-            "stderr": e.stderr
-        }, status_code=500)
\ No newline at end of file
+def run_prediction(video_path: str = "videos/no_helmet.mp4"):
+    """Queue a video on the persistent detection workers and return the job id"""
+    if not is_allowed_video_path(video_path):
+        return JSONResponse(content={"error": f"Videos must be in one of: {', '.join(VIDEO_DIRS)}"},
+                            status_code=400)
+    if not os.path.exists(video_path):
+        return JSONResponse(content={"error": f"Video not found: {video_path}"}, status_code=404)
+    job_id = get_worker_pool().submit(video_path)
+    return JSONResponse(content={
+        "message": "Prediction queued.",
+        "job_id": job_id,
+        "status_url": f"/jobs/{job_id}"
+    }, status_code=202)
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Status and result of a queued detection job"""
+    job = get_worker_pool().get_job(job_id)
+    if job is None:
+        return JSONResponse(content={"error": "Job not found"}, status_code=404)
+    return job
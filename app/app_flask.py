@@ -1,4 +1,5 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, send_from_directory, jsonify, Response
+from flask import Flask, render_template, request, redirect, url_for, flash, send_from_directory, send_file, jsonify, Response, stream_with_context, abort
+import itertools
 import os
 import subprocess
 import sys
@@ -6,7 +7,11 @@ import sys
 # Add the project root to Python path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.dbsql import get_all_violations, update_number_plate, delete_violation, delete_all_violations, export_violations_to_csv
+from app.worker import get_worker_pool
+from app.utils import load_yaml
+from app.thumbnails import resolve_evidence_path, get_thumbnail
+from app.metrics import render_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from app.storage import get_violations_page, get_violation_summary, get_violation_types, get_violation_file_path, get_violation_clip_path, update_number_plate, delete_violation, delete_all_violations, stream_violations_csv, stream_violations_csv_gz, get_pool_stats
 
 app = Flask(__name__)
 app.secret_key = "your_secret_key"
@@ -61,44 +66,109 @@ def index():
             filepath = os.path.join(UPLOAD_FOLDER, file.filename)
             file.save(filepath)
             
-            # Run your detection backend (realtime.py) on the uploaded file
+            # Queue the uploaded file on the persistent detection workers
             try:
-                result = subprocess.run(
-                    [sys.executable, os.path.join("app", "realtime.py"), filepath, "--no-display"],
-                    capture_output=True, text=True, timeout=300,  # 5 minute timeout
-                    cwd=os.getcwd()  # Set working directory to project root
-                )
-                
-                if result.returncode == 0:
-                    # Extract violation count from output
-                    output_lines = result.stdout.strip().split('\n')
-                    violation_msg = "Video detection completed!"
-                    for line in output_lines:
-                        if "Total violations detected:" in line:
-                            violation_msg = f"Video detection completed! {line}"
-                            break
-                    flash(violation_msg)
-                else:
-                    flash(f"Video detection failed: {result.stderr}")
-                    
-            except subprocess.TimeoutExpired:
-                flash("Detection timed out. Please try with a smaller video file.")
+                job_id = get_worker_pool().submit(filepath)
+                flash(f"Video queued for detection: {file.filename}")
+                return redirect(url_for("index", job_id=job_id))
             except Exception as e:
                 flash(f"Error during detection: {str(e)}")
                 
             return redirect(url_for("index"))
-    return render_template("index.html")
+    return render_template("index.html", job_id=request.args.get("job_id"))
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    """Status and result of a queued detection job"""
+    job = get_worker_pool().get_job(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route("/db/pool")
+def db_pool_stats():
+    """Database connection pool usage and wait times"""
+    return jsonify(get_pool_stats())
+
+@app.route("/metrics")
+def metrics():
+    """Detector metrics in the Prometheus text format"""
+    return Response(render_metrics(), content_type=METRICS_CONTENT_TYPE)
+
+ADMIN_PAGE_SIZE = 50
 
 @app.route("/admin")
 def admin_dashboard():
-    """Admin dashboard to view all violations"""
+    """Admin dashboard: one page of violations plus filters and SQL-side totals"""
     try:
-        violations = get_all_violations()
-        return render_template("admin.html", violations=violations)
+        filters = {
+            "violation_type": request.args.get("type") or None,
+            "date_from": request.args.get("date_from") or None,
+            "date_to": request.args.get("date_to") or None,
+            "number_plate": (request.args.get("plate") or "").strip() or None,
+        }
+        page_size = min(request.args.get("page_size", ADMIN_PAGE_SIZE, type=int) or ADMIN_PAGE_SIZE, 500)
+        page = get_violations_page(
+            limit=page_size,
+            before=request.args.get("before") or None,
+            after=request.args.get("after") or None,
+            **filters
+        )
+        return render_template(
+            "admin.html",
+            violations=page["violations"],
+            next_cursor=page["next_cursor"],
+            prev_cursor=page["prev_cursor"],
+            summary=get_violation_summary(**filters),
+            violation_types=get_violation_types(),
+            filters=filters,
+            page_size=page_size,
+        )
+    except ValueError as e:
+        flash(f"Invalid filter: {str(e)}")
+        return redirect(url_for("admin_dashboard"))
     except Exception as e:
         flash(f"Error loading violations: {str(e)}")
         return redirect(url_for("index"))
 
+THUMBNAIL_CONFIG = load_yaml("app/config.yaml").get("thumbnails") or {}
+# Evidence files never change once written, so browsers may keep them for long
+IMAGE_MAX_AGE = THUMBNAIL_CONFIG.get("cache_max_age_sec", 31536000)
+
+def violation_image_path(violation_id):
+    """Evidence file of a violation via a primary-key lookup, or 404"""
+    image_path = resolve_evidence_path(get_violation_file_path(violation_id))
+    if image_path is None:
+        abort(404)
+    return image_path
+
+@app.route('/violations/<int:violation_id>/image')
+def violation_image(violation_id):
+    """Full-size evidence image with ETag/Last-Modified and a long cache lifetime"""
+    return send_file(violation_image_path(violation_id), conditional=True, etag=True,
+                     max_age=IMAGE_MAX_AGE)
+
+@app.route('/violations/<int:violation_id>/clip')
+def violation_clip(violation_id):
+    """Short video clip around the violation (supports range requests for seeking)"""
+    clip_path = resolve_evidence_path(get_violation_clip_path(violation_id))
+    if clip_path is None:
+        abort(404)
+    return send_file(clip_path, conditional=True, etag=True, max_age=IMAGE_MAX_AGE)
+
+@app.route('/violations/<int:violation_id>/thumbnail')
+def violation_thumbnail(violation_id):
+    """Small cached thumbnail of the evidence image, for list views"""
+    thumb = get_thumbnail(
+        violation_image_path(violation_id),
+        max_side=THUMBNAIL_CONFIG.get("max_side", 240),
+        jpeg_quality=THUMBNAIL_CONFIG.get("jpeg_quality", 80),
+        thumb_dir=THUMBNAIL_CONFIG.get("dir", "crops/thumbs"),
+    )
+    if thumb is None:
+        abort(404)
+    return send_file(thumb, mimetype="image/jpeg", conditional=True, etag=True, max_age=IMAGE_MAX_AGE)
+
 @app.route('/image/<path:filepath>')
 def serve_image_file(filepath):
     """Serve images from project directory"""
@@ -116,7 +186,8 @@ def serve_image_file(filepath):
             return send_from_directory(directory, filename)
         # Handle normal paths with separators
         elif filepath.startswith('crops\\') or filepath.startswith('crops/'):
-            filename = filepath.split('\\')[-1] if '\\' in filepath else filepath.split('/')[-1]
+            # Keep sub-directories: evidence is sharded by date (crops/YYYY/MM/DD/...)
+            filename = filepath.replace('\\', '/')[len('crops/'):]
             directory = os.path.join(os.getcwd(), 'crops')
             return send_from_directory(directory, filename)
         elif filepath.startswith('annotated_frames\\') or filepath.startswith('annotated_frames/'):
@@ -173,18 +244,35 @@ def delete_all_violations_route():
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+EXPORT_FORMATS = {
+    # format: (stream function, mimetype, file name)
+    "csv": (stream_violations_csv, "text/csv", "traffic_violations.csv"),
+    "csv.gz": (stream_violations_csv_gz, "application/gzip", "traffic_violations.csv.gz"),
+}
+
 @app.route('/export_csv')
 def export_csv():
-    """Export all violations to CSV file"""
+    """Stream violations as CSV (or gzip CSV with ?format=csv.gz), optionally filtered"""
     try:
-        csv_data = export_violations_to_csv()
-        
-        # Create response with CSV data
+        export_format = request.args.get("format", "csv")
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"unknown export format '{export_format}'")
+        stream, mimetype, filename = EXPORT_FORMATS[export_format]
+
+        chunks = stream(
+            violation_type=request.args.get("type") or None,
+            date_from=request.args.get("date_from") or None,
+            date_to=request.args.get("date_to") or None,
+            number_plate=(request.args.get("plate") or "").strip() or None,
+        )
+        # Run the query now so errors can still be reported with a redirect
+        first_chunk = next(chunks)
+
         response = Response(
-            csv_data,
-            mimetype='text/csv',
+            stream_with_context(itertools.chain([first_chunk], chunks)),
+            mimetype=mimetype,
             headers={
-                'Content-Disposition': 'attachment; filename=traffic_violations.csv'
+                'Content-Disposition': f'attachment; filename={filename}'
             }
         )
         return response
@@ -0,0 +1,93 @@
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from app.metrics import watch_queue, unwatch_queue
+
+class AsyncValidationPool:
+    """
+    Runs GeminiValidator calls on a thread pool so detection keeps going while
+    validations are in flight.
+
+    At most `max_concurrency` requests run at once and at most `max_pending`
+    frames wait in total; submit() blocks when that limit is reached so a
+    burst of detections cannot grow memory without bound. Every finished
+    validation is passed to `on_result(image_path, violation, result)`, which
+    is where confirmed violations get written to the database. All violations
+    of one frame are validated together with a single Gemini request.
+    """
+
+    def __init__(self, gemini_validator, on_result, max_concurrency=4, max_pending=64):
+        self.gemini_validator = gemini_validator
+        self.on_result = on_result
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(max_concurrency)),
+                                            thread_name_prefix="gemini")
+        self._slots = threading.BoundedSemaphore(max(1, int(max_pending)))
+        self._lock = threading.Lock()
+        self.stats = {"submitted": 0, "confirmed": 0, "rejected": 0, "deferred": 0, "errors": 0}
+        watch_queue("validation", self, lambda pool: pool.pending())
+
+    def submit(self, image_path, violations, image=None):
+        """
+        Queue the violations of one frame for validation (blocks while
+        max_pending frames are waiting)
+
+        Args:
+            image_path: Evidence file stored with the violations
+            violations: Violation dicts from find_violations
+            image: Optional in-memory frame sent to Gemini instead of reading image_path
+        """
+        self._slots.acquire()
+        with self._lock:
+            self.stats["submitted"] += len(violations)
+        try:
+            return self._executor.submit(self._run, image_path, violations, image)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def pending(self):
+        """Number of validations submitted but not finished yet"""
+        with self._lock:
+            s = self.stats
+            return s["submitted"] - s["confirmed"] - s["rejected"] - s["deferred"] - s["errors"]
+
+    def close(self, wait=True):
+        """Stop accepting work; by default wait until every pending validation is handled"""
+        self._executor.shutdown(wait=wait)
+        unwatch_queue("validation", self)
+
+    def _run(self, image_path, violations, image=None):
+        handled = 0
+        try:
+            results = self.gemini_validator.validate_detections(
+                image if image is not None else image_path, violations
+            )
+            for violation, result in zip(violations, results):
+                confirmed = self.on_result(image_path, violation, result)
+                handled += 1
+                if result['status'] == 'deferred':
+                    outcome = "deferred"
+                else:
+                    outcome = "confirmed" if confirmed else "rejected"
+                with self._lock:
+                    self.stats[outcome] += 1
+            return results
+        except Exception:
+            traceback.print_exc()
+            with self._lock:
+                self.stats["errors"] += len(violations) - handled
+        finally:
+            self._slots.release()
+
+def create_validation_pool(config, gemini_validator, on_result):
+    """Build an AsyncValidationPool from app/config.yaml, or None for inline validation"""
+    validation_config = config.get("validation") or {}
+    if not validation_config.get("async", False):
+        return None
+    return AsyncValidationPool(
+        gemini_validator,
+        on_result,
+        max_concurrency=validation_config.get("max_concurrency", 4),
+        max_pending=validation_config.get("max_pending", 64),
+    )
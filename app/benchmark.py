@@ -0,0 +1,374 @@
+"""
+Per-stage latency benchmark of the detection engine.
+
+Runs the engine's own functions over local videos with Gemini and the database
+stubbed out (no network, no writes to the real DB) and times every stage:
+
+    decode            cv2.VideoCapture.read of one frame
+    predict_<model>   one predict call per model (a batch of `batch_size` frames)
+    postprocess       detector.match_violations for one frame
+    annotate          detector.annotate_violations for one frame
+    encode            evidence image encode + write (to a temporary directory)
+    validation        GeminiValidator.validate_detections with a stub model
+    db_write          ViolationWriter.write with a stub insert
+
+Stages run one after the other on one thread (no pipeline threads and no
+motion gate), so each timing is the cost of that stage alone and the FPS is
+that of a serial loop. Results are written as JSON; --baseline compares them
+with a saved run and exits with status 1 if anything regressed.
+
+Usage:
+    python -m app.benchmark --output benchmarks/baseline.json
+    python -m app.benchmark --output current.json --baseline benchmarks/baseline.json
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+# Add the project root to Python path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils import load_yaml
+from app.detector import load_models, create_postprocessor, match_violations, annotate_violations
+from app.dbwriter import ViolationWriter
+from app.evidence import EvidenceWriter
+from app.gemini_validator import create_gemini_validator
+from app.inference import inference_settings
+from app.tracker import create_violation_tracker
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv")
+PERCENTILES = (50, 95, 99)
+
+class StubGeminiModel:
+    """Stands in for the Gemini client: confirms every detection after `latency_ms`"""
+
+    def __init__(self, latency_ms=0.0):
+        self.latency_ms = latency_ms
+
+    def generate_content(self, parts, **kwargs):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        verdict = {"status": "correct", "confidence": 0.95, "reason": "benchmark stub"}
+        prompt = parts[0]
+        if "The detections to validate are:" in prompt:
+            count = sum(1 for line in prompt.splitlines() if line[:1].isdigit() and '. "' in line)
+            items = [dict(verdict, id=i) for i in range(1, count + 1)]
+            return SimpleNamespace(text=json.dumps(items))
+        return SimpleNamespace(text=json.dumps(verdict))
+
+class StageTimer:
+    """Collects latency samples per stage"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def record(self, stage, start):
+        self.samples[stage].append((time.perf_counter() - start) * 1000)
+
+    def summary(self):
+        """p50/p95/p99/mean in milliseconds and the sample count of every stage"""
+        stages = {}
+        for stage, samples in self.samples.items():
+            values = np.asarray(samples)
+            stages[stage] = {f"p{p}_ms": round(float(np.percentile(values, p)), 3) for p in PERCENTILES}
+            stages[stage]["mean_ms"] = round(float(values.mean()), 3)
+            stages[stage]["count"] = len(samples)
+        return stages
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where it cannot be read"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+        return round(peak / 1e6 if sys.platform == "darwin" else peak / 1e3, 1)
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return round(psutil.Process().memory_info().peak_wset / 1e6, 1)
+    except (ImportError, AttributeError):
+        return None
+
+def find_videos(paths):
+    """Video files given directly or found in the given directories"""
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            videos.extend(sorted(p for p in glob.glob(os.path.join(path, "*")) if p.lower().endswith(VIDEO_EXTENSIONS)))
+        else:
+            videos.append(path)
+    return videos
+
+def benchmark_video(video_path, models, postprocessor, config, fines, timer, validator, evidence_writer, db_writer,
+                    max_frames=None):
+    """
+    Run every stage over one video.
+
+    Returns:
+        dict: frames, violations, elapsed_sec and fps of the video
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print(f"❌ Error: Could not open video file: {video_path}")
+        return None
+
+    conf = config["conf_thresholds"]["helmet_triple"]
+    batch_size = max(1, int(config.get("batch_size", 1)))
+    tracker = create_violation_tracker(config)
+    frames_processed = violations_detected = 0
+    start_time = time.perf_counter()
+
+    done = False
+    while not done:
+        batch = []
+        while len(batch) < batch_size:
+            if max_frames is not None and frames_processed + len(batch) >= max_frames:
+                done = True
+                break
+            start = time.perf_counter()
+            ret, frame = cap.read()
+            if not ret:
+                done = True
+                break
+            timer.record("decode", start)
+            batch.append(frame)
+        if not batch:
+            break
+
+        batch_results = {}
+        for name, model in models.items():
+            start = time.perf_counter()
+            batch_results[name] = model.predict(batch, conf=conf, verbose=False)
+            timer.record(f"predict_{name}", start)
+
+        for i, frame in enumerate(batch):
+            frames_processed += 1
+            start = time.perf_counter()
+            violations = match_violations({name: results[i] for name, results in batch_results.items()},
+                                          postprocessor, fines, tracker)
+            timer.record("postprocess", start)
+
+            start = time.perf_counter()
+            annotate_violations(frame, violations)
+            timer.record("annotate", start)
+
+            if not violations:
+                continue
+            violations_detected += len(violations)
+
+            start = time.perf_counter()
+            img_path = evidence_writer.submit(frame, prefix="benchmark")
+            timer.record("encode", start)
+
+            start = time.perf_counter()
+            results = validator.validate_detections(frame, violations)
+            timer.record("validation", start)
+
+            for violation, result in zip(violations, results):
+                if result["status"] == "correct":
+                    start = time.perf_counter()
+                    db_writer.write(img_path, violation["type"], violation["fine"])
+                    timer.record("db_write", start)
+
+    elapsed = time.perf_counter() - start_time
+    cap.release()
+    return {
+        "frames": frames_processed,
+        "violations": violations_detected,
+        "elapsed_sec": round(elapsed, 3),
+        "fps": round(frames_processed / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+
+def run_benchmark(videos, config, max_frames=None, gemini_latency_ms=0.0, db_latency_ms=0.0):
+    """
+    Benchmark the engine over the videos.
+
+    Returns:
+        dict: The JSON report (meta, stages, end_to_end, peak_rss_mb, videos)
+    """
+    fines = load_yaml("app/fines.yaml")
+    models = load_models(config)
+    postprocessor = create_postprocessor(models, fines)
+
+    # Gemini: the real validator (cropping, encoding, parsing) around a stub
+    # model, without the verdict cache so repeated runs do the same work, and
+    # without the rate limiter and breaker so the stage times the validator,
+    # not token-bucket waits
+    validator_config = dict(config, validation=dict(config.get("validation") or {}, cache={"enabled": False},
+                                                    resilience={}))
+    validator = create_gemini_validator(validator_config, model=StubGeminiModel(gemini_latency_ms))
+
+    # Database: the write path up to the driver, which is replaced by a stub
+    def insert_many(rows):
+        if db_latency_ms:
+            time.sleep(db_latency_ms / 1000)
+        return len(rows)
+    db_writer = ViolationWriter(insert_many, synchronous=True)
+
+    evidence_config = config.get("evidence") or {}
+    evidence_dir = tempfile.mkdtemp(prefix="benchmark_evidence_")
+    evidence_writer = EvidenceWriter(evidence_dir, image_format=evidence_config.get("format", "jpg"),
+                                     quality=evidence_config.get("quality", 90), shard="", num_workers=0)
+
+    timer = StageTimer()
+    per_video = {}
+    try:
+        for video_path in videos:
+            print(f"⏱️  Benchmarking {video_path}...")
+            result = benchmark_video(video_path, models, postprocessor, config, fines, timer, validator,
+                                     evidence_writer, db_writer, max_frames)
+            if result is not None:
+                per_video[video_path] = result
+                print(f"   {result['frames']} frames at {result['fps']} FPS")
+    finally:
+        shutil.rmtree(evidence_dir, ignore_errors=True)
+
+    frames = sum(v["frames"] for v in per_video.values())
+    elapsed = sum(v["elapsed_sec"] for v in per_video.values())
+    settings = inference_settings(config)
+    return {
+        "meta": {
+            "created_utc": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "backend": settings["backend"],
+            "variant": settings["variant"],
+            "batch_size": max(1, int(config.get("batch_size", 1))),
+            "max_frames": max_frames,
+            "gemini_latency_ms": gemini_latency_ms,
+            "db_latency_ms": db_latency_ms,
+        },
+        "stages": timer.summary(),
+        "end_to_end": {
+            "frames": frames,
+            "elapsed_sec": round(elapsed, 3),
+            "fps": round(frames / elapsed, 2) if elapsed > 0 else 0.0,
+        },
+        "peak_rss_mb": peak_rss_mb(),
+        "videos": per_video,
+    }
+
+def compare_reports(current, baseline, threshold_pct=10.0, min_delta_ms=0.5):
+    """
+    Compare a report with a baseline.
+
+    A stage regresses when its p50 or p95 is more than threshold_pct slower and
+    at least min_delta_ms slower (so tiny stages do not flag on noise). FPS
+    regresses when it drops, and peak RSS when it grows, by more than threshold_pct.
+
+    Returns:
+        list: Regression messages (empty if none)
+    """
+    regressions = []
+    for stage, base in sorted(baseline.get("stages", {}).items()):
+        cur = current.get("stages", {}).get(stage)
+        if cur is None:
+            continue
+        for key in ("p50_ms", "p95_ms"):
+            delta = cur[key] - base[key]
+            if delta >= min_delta_ms and base[key] > 0 and delta / base[key] * 100 > threshold_pct:
+                regressions.append(f"{stage} {key}: {base[key]:.2f} -> {cur[key]:.2f} ms "
+                                   f"(+{delta / base[key] * 100:.0f}%)")
+
+    base_fps, cur_fps = baseline["end_to_end"]["fps"], current["end_to_end"]["fps"]
+    if base_fps > 0 and (base_fps - cur_fps) / base_fps * 100 > threshold_pct:
+        regressions.append(f"fps: {base_fps:.2f} -> {cur_fps:.2f} ({(cur_fps - base_fps) / base_fps * 100:.0f}%)")
+
+    base_rss, cur_rss = baseline.get("peak_rss_mb"), current.get("peak_rss_mb")
+    if base_rss and cur_rss and (cur_rss - base_rss) / base_rss * 100 > threshold_pct:
+        regressions.append(f"peak_rss_mb: {base_rss:.1f} -> {cur_rss:.1f} (+{(cur_rss - base_rss) / base_rss * 100:.0f}%)")
+    return regressions
+
+def print_report(report, baseline=None):
+    """Print the stage table, with the baseline p95 next to each stage when given"""
+    print("\n📊 Benchmark Results:")
+    print("-" * 80)
+    header = f"{'Stage':<20}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header + (f"{'base p95':>11}" if baseline else ""))
+    for stage, s in report["stages"].items():
+        line = f"{stage:<20}{s['count']:>7}{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}"
+        if baseline and stage in baseline.get("stages", {}):
+            line += f"{baseline['stages'][stage]['p95_ms']:>11.2f}"
+        print(line)
+    print("-" * 80)
+    e2e = report["end_to_end"]
+    print(f"End to end: {e2e['frames']} frames in {e2e['elapsed_sec']:.1f}s ({e2e['fps']:.2f} FPS), "
+          f"peak RSS {report['peak_rss_mb']} MB")
+    if baseline and report["meta"].get("batch_size") != baseline["meta"].get("batch_size"):
+        print("⚠️ Baseline was recorded with a different batch size")
+    if baseline and report["meta"].get("backend") != baseline["meta"].get("backend"):
+        print("⚠️ Baseline was recorded with a different inference backend")
+
+def main():
+    """Run the benchmark and/or compare against a baseline"""
+    parser = argparse.ArgumentParser(description="Per-stage latency benchmark of the detection engine")
+    parser.add_argument("videos", nargs="*", default=["videos"],
+                       help="Video files or directories of videos (default: videos/)")
+    parser.add_argument("--max-frames", type=int, default=300,
+                       help="Frames per video, 0 for all (default: 300)")
+    parser.add_argument("--output", default=None,
+                       help="Write the JSON report to this file (default: print it)")
+    parser.add_argument("--baseline", default=None,
+                       help="Saved report to compare against; exit status 1 on regressions")
+    parser.add_argument("--load", default=None,
+                       help="Compare this saved report instead of running the benchmark")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                       help="Regression threshold in percent (default: 10)")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5,
+                       help="Ignore stage slowdowns smaller than this (default: 0.5)")
+    parser.add_argument("--gemini-latency-ms", type=float, default=0.0,
+                       help="Simulated Gemini response time of the stub (default: 0)")
+    parser.add_argument("--db-latency-ms", type=float, default=0.0,
+                       help="Simulated database insert time of the stub (default: 0)")
+    args = parser.parse_args()
+
+    if args.load:
+        with open(args.load) as f:
+            report = json.load(f)
+    else:
+        videos = find_videos(args.videos)
+        if not videos:
+            print(f"❌ No videos found in {args.videos}")
+            sys.exit(1)
+        config = load_yaml("app/config.yaml")
+        report = run_benchmark(videos, config, max_frames=args.max_frames or None,
+                               gemini_latency_ms=args.gemini_latency_ms, db_latency_ms=args.db_latency_ms)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    print_report(report, baseline)
+    if args.output and not args.load:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report saved: {args.output}")
+    elif not args.load:
+        print(json.dumps(report, indent=2))
+
+    if baseline is not None:
+        regressions = compare_reports(report, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"❌ {len(regressions)} regressions against {args.baseline}:")
+            for regression in regressions:
+                print(f"   {regression}")
+            sys.exit(1)
+        print(f"✅ No regressions against {args.baseline}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+import math
+import os
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+class FrameRingBuffer:
+    """
+    Fixed-size ring of the most recent frames, allocated once.
+
+    Frames are scaled to `width` (keeping the aspect ratio of the first frame)
+    and copied into a preallocated array, so pushing a frame allocates nothing
+    and memory use is exactly capacity * height * width * 3 bytes.
+    """
+
+    def __init__(self, capacity, width=480):
+        self.capacity = max(1, int(capacity))
+        self.width = int(width)
+        self.frames = None  # (capacity, height, width, 3) uint8, allocated on the first push
+        self.indices = np.full(self.capacity, -1, dtype=np.int64)
+        self.next_slot = 0
+        self.lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        return self.frames.nbytes if self.frames is not None else 0
+
+    def push(self, frame, frame_index):
+        """Copy a frame into the oldest slot"""
+        with self.lock:
+            if self.frames is None:
+                h, w = frame.shape[:2]
+                height = max(2, int(round(h * self.width / w / 2)) * 2)  # even, for video codecs
+                self.frames = np.empty((self.capacity, height, self.width, 3), dtype=np.uint8)
+            slot = self.frames[self.next_slot]
+            if frame.shape == slot.shape:
+                np.copyto(slot, frame)
+            else:
+                cv2.resize(frame, (slot.shape[1], slot.shape[0]), dst=slot, interpolation=cv2.INTER_AREA)
+            self.indices[self.next_slot] = frame_index
+            self.next_slot = (self.next_slot + 1) % self.capacity
+
+    def copy_range(self, first_index, last_index):
+        """Copy the buffered frames with first_index <= index <= last_index, oldest first"""
+        with self.lock:
+            if self.frames is None:
+                return np.empty((0, 0, 0, 3), dtype=np.uint8)
+            slots = np.nonzero((self.indices >= first_index) & (self.indices <= last_index))[0]
+            slots = slots[np.argsort(self.indices[slots])]
+            return self.frames[slots]  # fancy indexing already copies
+
+class ClipJob:
+    """
+    Clip of one violation: frames from `pre` before to `post` after the event.
+
+    The job is encoded once both its frames have been captured and a
+    violation it belongs to has been confirmed. It is dropped once all of its
+    `verdicts` (one per violation in the frame) were rejections.
+    when_encoded() callbacks learn whether the file at `path` exists.
+    """
+
+    def __init__(self, recorder, path, first_index, last_index, verdicts=1):
+        self.recorder = recorder
+        self.path = path
+        self.first_index = first_index
+        self.last_index = last_index
+        self.verdicts = verdicts
+        self.frames = None
+        self.decision = None  # None (pending), "confirmed" or "discarded"
+        self.outcome = None  # None (pending), "encoded", "failed" or "discarded"
+        self.callbacks = []
+
+    def when_encoded(self, callback):
+        """
+        Run callback(path) once the clip is on disk, or callback(None) if it
+        was discarded or could not be encoded. Runs immediately if the clip
+        is already done, otherwise on the thread that finishes it.
+        """
+        with self.recorder._lock:
+            if self.outcome is None:
+                self.callbacks.append(callback)
+                return
+        callback(self.path if self.outcome == "encoded" else None)
+
+    def confirm(self):
+        self.recorder._decide(self, "confirmed")
+
+    def discard(self):
+        self.recorder._decide(self, "discarded")
+
+class ClipRecorder:
+    """
+    Per-stream clip evidence: a FrameRingBuffer plus a background encoder.
+
+    Memory is capped at the ring buffer (pre + post seconds of frames) plus at
+    most `max_pending` captured clips waiting for their verdict or encoder;
+    events beyond that get no clip. Both figures are printed at start-up.
+    """
+
+    def __init__(self, fps, pre_sec=3.0, post_sec=2.0, width=480, max_pending=4,
+                 clip_dir="crops/clips", codec="mp4v", extension=".mp4"):
+        self.fps = fps if fps and fps > 0 else 15.0
+        self.pre_frames = int(math.ceil(pre_sec * self.fps))
+        self.post_frames = int(math.ceil(post_sec * self.fps))
+        self.max_pending = max(1, int(max_pending))
+        self.clip_dir = clip_dir
+        self.codec = codec
+        self.extension = extension
+        # Pre window + event frame + post window, plus one spare slot
+        self.buffer = FrameRingBuffer(self.pre_frames + self.post_frames + 2, width)
+        self.frame_index = -1
+        self.stats = {"requested": 0, "skipped": 0, "encoded": 0, "discarded": 0, "failed": 0}
+        self._jobs = []  # requested, not yet encoded or discarded
+        self._lock = threading.Lock()
+        self._encode_queue = queue.Queue()
+        self._encoder = threading.Thread(target=self._encode_loop, name="clip-encoder", daemon=True)
+        self._encoder.start()
+
+    def memory_budget(self, frame_shape):
+        """Upper bound in bytes of the frames this recorder holds for a given frame shape"""
+        h, w = frame_shape[:2]
+        frame_bytes = self.buffer.width * max(2, int(round(h * self.buffer.width / w / 2)) * 2) * 3
+        return frame_bytes * (self.buffer.capacity + self.max_pending * (self.pre_frames + self.post_frames + 1))
+
+    def push(self, frame):
+        """Add the next frame of the stream (call for every frame, annotated or not)"""
+        if self.frame_index < 0:
+            print(f"🎞️  Clip buffer: {self.buffer.capacity} frames, at most "
+                  f"{self.memory_budget(frame.shape) / 1e6:.1f} MB with {self.max_pending} pending clips")
+        self.frame_index += 1
+        self.buffer.push(frame, self.frame_index)
+
+        with self._lock:
+            ready = [job for job in self._jobs if job.frames is None and job.last_index <= self.frame_index]
+        for job in ready:
+            self._capture(job)
+
+    def request(self, prefix="clip", verdicts=1):
+        """
+        Start a clip around the current frame.
+
+        Args:
+            prefix: File name prefix
+            verdicts: Violations sharing the clip; it is dropped only if all are rejected
+
+        Returns:
+            ClipJob, or None if `max_pending` clips are already held
+        """
+        with self._lock:
+            self.stats["requested"] += 1
+            if len(self._jobs) >= self.max_pending:
+                self.stats["skipped"] += 1
+                return None
+            path = os.path.join(self.clip_dir, f"{prefix}_{int(time.time() * 1000)}_{self.frame_index}{self.extension}")
+            job = ClipJob(self, path, self.frame_index - self.pre_frames, self.frame_index + self.post_frames,
+                          verdicts=verdicts)
+            self._jobs.append(job)
+            return job
+
+    def _capture(self, job):
+        frames = self.buffer.copy_range(job.first_index, job.last_index)
+        with self._lock:
+            if job not in self._jobs:
+                return
+            job.frames = frames
+            encode = job.decision == "confirmed"
+        if encode:
+            self._encode_queue.put(job)
+
+    def _decide(self, job, decision):
+        with self._lock:
+            if job.decision is not None or job not in self._jobs:
+                return
+            if decision == "discarded":
+                job.verdicts -= 1
+                if job.verdicts > 0:
+                    return
+            job.decision = decision
+            encode = decision == "confirmed" and job.frames is not None
+        if decision == "discarded":
+            self._finish(job, "discarded")
+        elif encode:
+            self._encode_queue.put(job)
+
+    def _finish(self, job, outcome):
+        with self._lock:
+            if job in self._jobs:
+                self._jobs.remove(job)
+            job.frames = None
+            job.outcome = outcome
+            self.stats[outcome] += 1
+            callbacks, job.callbacks = job.callbacks, []
+        for callback in callbacks:
+            try:
+                callback(job.path if outcome == "encoded" else None)
+            except Exception as e:
+                print(f"❌ Error after finishing clip {job.path}: {e}")
+
+    def _encode_loop(self):
+        while True:
+            job = self._encode_queue.get()
+            try:
+                if job is None:
+                    return
+                self._encode(job)
+            finally:
+                self._encode_queue.task_done()
+
+    def _encode(self, job):
+        frames = job.frames
+        try:
+            if frames is None or len(frames) == 0:
+                raise RuntimeError("no frames captured")
+            os.makedirs(os.path.dirname(job.path) or ".", exist_ok=True)
+            root, ext = os.path.splitext(job.path)
+            tmp_path = f"{root}.tmp{ext}"
+            h, w = frames.shape[1:3]
+            writer = cv2.VideoWriter(tmp_path, cv2.VideoWriter_fourcc(*self.codec), self.fps, (w, h))
+            if not writer.isOpened():
+                raise RuntimeError(f"could not open a {self.codec} video writer")
+            for frame in frames:
+                writer.write(frame)
+            writer.release()
+            os.replace(tmp_path, job.path)
+            outcome = "encoded"
+        except Exception as e:
+            print(f"❌ Error encoding clip {job.path}: {e}")
+            outcome = "failed"
+        self._finish(job, outcome)
+
+    def close(self):
+        """
+        Capture clips still waiting for post-event frames (shorter clips at the
+        end of a stream), encode the confirmed ones and stop the encoder.
+        Clips that never got a verdict are dropped.
+        """
+        with self._lock:
+            waiting = [job for job in self._jobs if job.frames is None]
+        for job in waiting:
+            self._capture(job)
+        with self._lock:
+            undecided = [job for job in self._jobs if job.decision is None]
+        for job in undecided:
+            job.verdicts = 1
+            job.discard()
+        self._encode_queue.put(None)
+        self._encoder.join()
+        print(f"🎞️  Clips: {self.stats}")
+
+def create_clip_recorder(config, fps):
+    """Build a ClipRecorder from app/config.yaml, or None if clips are disabled"""
+    clip_config = config.get("clips") or {}
+    if not clip_config.get("enabled", False):
+        return None
+    return ClipRecorder(
+        fps,
+        pre_sec=clip_config.get("pre_sec", 3.0),
+        post_sec=clip_config.get("post_sec", 2.0),
+        width=clip_config.get("width", 480),
+        max_pending=clip_config.get("max_pending", 4),
+        clip_dir=clip_config.get("dir", "crops/clips"),
+        codec=clip_config.get("codec", "mp4v"),
+        extension=clip_config.get("extension", ".mp4"),
+    )
@@ -1,30 +1,230 @@
 import sqlite3
+import threading
 from pathlib import Path
 from datetime import datetime
 
+from app.storage import (violation_filters, where_clause, keyset_condition, finish_page,
+                         csv_chunks, gzip_chunks)
+from app.utils import load_yaml
+
+# Embedded SQLite backend with the same API as app/dbsql.py. Each thread keeps
+# one long-lived connection in WAL mode, so readers never block the writer and
+# repeated statements come from sqlite3's prepared-statement cache.
+
 DB_PATH = Path("violations.sqlite").as_posix()
 
+VIOLATION_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_violations_ts ON violations (ts_utc, id)",
+    "CREATE INDEX IF NOT EXISTS idx_violations_type_ts ON violations (violation_type, ts_utc)",
+    "CREATE INDEX IF NOT EXISTS idx_violations_plate ON violations (number_plate)",
+]
+
+_local = threading.local()
+_stats_lock = threading.Lock()
+_stats = {"connections_opened": 0}
+
+def get_db_path():
+    """SQLite file from `database.sqlite_path` in app/config.yaml"""
+    db_config = load_yaml("app/config.yaml").get("database") or {}
+    return Path(db_config.get("sqlite_path", DB_PATH)).as_posix()
+
+def get_connection():
+    """Return this thread's SQLite connection, opening it on first use"""
+    con = getattr(_local, "con", None)
+    if con is None:
+        con = sqlite3.connect(get_db_path(), timeout=30, cached_statements=256)
+        con.row_factory = sqlite3.Row
+        con.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL only syncs at checkpoints: committed rows survive a
+        # process crash, the last transactions may be lost on power failure
+        con.execute("PRAGMA synchronous=NORMAL")
+        con.execute("PRAGMA temp_store=MEMORY")
+        _local.con = con
+        with _stats_lock:
+            _stats["connections_opened"] += 1
+    return con
+
+def close_connection():
+    """Close the calling thread's connection (it is reopened on next use)"""
+    con = getattr(_local, "con", None)
+    if con is not None:
+        con.close()
+        _local.con = None
+
+def get_pool_stats():
+    """Connection usage, in the shape of the MySQL pool stats where it applies"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats.update({"backend": "sqlite", "path": get_db_path()})
+    return stats
+
 def init_db():
-    con = sqlite3.connect(DB_PATH)
-    cur = con.cursor()
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS violations (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        ts_utc TEXT NOT NULL,
-        file_path TEXT NOT NULL,
-        violation_type TEXT NOT NULL,
-        fine INTEGER NOT NULL
-    );
+    con = get_connection()
+    with con:
+        con.execute("""
+        CREATE TABLE IF NOT EXISTS violations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts_utc TEXT NOT NULL,
+            file_path TEXT NOT NULL,
+            violation_type TEXT NOT NULL,
+            fine INTEGER NOT NULL,
+            number_plate TEXT DEFAULT NULL,
+            clip_path TEXT DEFAULT NULL
+        );
+        """)
+
+    # Add columns missing from older databases
+    columns = [row["name"] for row in con.execute("PRAGMA table_info(violations)")]
+    for column in ("number_plate", "clip_path"):
+        if column not in columns:
+            with con:
+                con.execute(f"ALTER TABLE violations ADD COLUMN {column} TEXT DEFAULT NULL")
+
+    with con:
+        for index_sql in VIOLATION_INDEXES:
+            con.execute(index_sql)
+
+def insert_violation(file_path, violation_type, fine, clip_path=None):
+    insert_violations([(datetime.utcnow().isoformat(), file_path, violation_type, fine, clip_path)])
+
+def insert_violations(rows):
+    """
+    Insert many violations in one transaction.
+
+    Args:
+        rows: Iterable of (ts_utc, file_path, violation_type, fine, clip_path) tuples
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+    with get_connection() as con:
+        con.executemany("""
+            INSERT INTO violations (ts_utc, file_path, violation_type, fine, clip_path)
+            VALUES (?, ?, ?, ?, ?)
+        """, rows)
+    return len(rows)
+
+def get_all_violations():
+    """Retrieve all violations from the database"""
+    cur = get_connection().execute("""
+        SELECT id, ts_utc, file_path, violation_type, fine, number_plate, clip_path
+        FROM violations
+        ORDER BY ts_utc DESC
     """)
-    con.commit()
-    con.close()
-
-def insert_violation(file_path, violation_type, fine):
-    con = sqlite3.connect(DB_PATH)
-    cur = con.cursor()
-    cur.execute("""
-        INSERT INTO violations (ts_utc, file_path, violation_type, fine)
-        VALUES (?, ?, ?, ?)
-    """, (datetime.utcnow().isoformat(), file_path, violation_type, fine))
-    con.commit()
-    con.close()
\ No newline at end of file
+    return [dict(row) for row in cur.fetchall()]
+
+def get_violations_page(limit=50, before=None, after=None, **filters):
+    """
+    One page of violations, newest first, using keyset pagination on
+    (ts_utc, id). See app.dbsql.get_violations_page.
+    """
+    conditions, params = violation_filters(placeholder="?", **filters)
+    newer = keyset_condition(conditions, params, before, after, placeholder="?")
+    order = "ASC" if newer else "DESC"
+    cur = get_connection().execute(f"""
+        SELECT id, ts_utc, file_path, violation_type, fine, number_plate, clip_path
+        FROM violations
+        {where_clause(conditions)}
+        ORDER BY ts_utc {order}, id {order}
+        LIMIT ?
+    """, (*params, limit + 1))
+    violations = [dict(row) for row in cur.fetchall()]
+    return finish_page(violations, limit, before, after)
+
+def get_violation_summary(**filters):
+    """
+    Totals for the dashboard cards, computed in SQL.
+
+    Returns:
+        dict: total, total_fines, latest_ts and most_common violation type
+    """
+    conditions, params = violation_filters(placeholder="?", **filters)
+    where = where_clause(conditions)
+    con = get_connection()
+    summary = dict(con.execute(f"""
+        SELECT COUNT(*) AS total, COALESCE(SUM(fine), 0) AS total_fines, MAX(ts_utc) AS latest_ts
+        FROM violations
+        {where}
+    """, params).fetchone())
+    row = con.execute(f"""
+        SELECT violation_type, COUNT(*) AS n
+        FROM violations
+        {where}
+        GROUP BY violation_type
+        ORDER BY n DESC
+        LIMIT 1
+    """, params).fetchone()
+    summary["most_common"] = row["violation_type"] if row else None
+    return summary
+
+def get_violation_types():
+    """Distinct violation types, for the dashboard filter"""
+    cur = get_connection().execute("SELECT DISTINCT violation_type FROM violations ORDER BY violation_type")
+    return [row[0] for row in cur.fetchall()]
+
+def get_violation_file_path(violation_id):
+    """Return the evidence file path of one violation, or None"""
+    row = get_connection().execute("SELECT file_path FROM violations WHERE id = ?", (violation_id,)).fetchone()
+    return row[0] if row else None
+
+def get_violation_clip_path(violation_id):
+    """Return the evidence clip path of one violation, or None"""
+    row = get_connection().execute("SELECT clip_path FROM violations WHERE id = ?", (violation_id,)).fetchone()
+    return row[0] if row else None
+
+def update_number_plate(violation_id, number_plate):
+    """Update the number plate for a specific violation"""
+    with get_connection() as con:
+        con.execute("""
+            UPDATE violations
+            SET number_plate = ?
+            WHERE id = ?
+        """, (number_plate, violation_id))
+
+def delete_violation(violation_id):
+    """Delete a specific violation from the database"""
+    with get_connection() as con:
+        cur = con.execute("DELETE FROM violations WHERE id = ?", (violation_id,))
+    return cur.rowcount > 0
+
+def delete_all_violations():
+    """Delete all violations from the database"""
+    with get_connection() as con:
+        cur = con.execute("DELETE FROM violations")
+    return cur.rowcount
+
+def iter_violations(batch_size=1000, **filters):
+    """
+    Yield violations newest first without loading the table into memory.
+
+    SQLite steps through the result lazily, so rows are fetched `batch_size`
+    at a time straight from the database file.
+    """
+    conditions, params = violation_filters(placeholder="?", **filters)
+    cur = get_connection().execute(f"""
+        SELECT id, ts_utc, violation_type, fine, number_plate
+        FROM violations
+        {where_clause(conditions)}
+        ORDER BY ts_utc DESC, id DESC
+    """, params)
+    try:
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(row)
+    finally:
+        cur.close()
+
+def stream_violations_csv(batch_size=1000, **filters):
+    """Export violations as CSV text chunks of about `batch_size` rows each"""
+    return csv_chunks(iter_violations(batch_size=batch_size, **filters), batch_size)
+
+def stream_violations_csv_gz(batch_size=1000, level=6, **filters):
+    """Export violations as a gzip-compressed CSV byte stream"""
+    return gzip_chunks(stream_violations_csv(batch_size=batch_size, **filters), level)
+
+def export_violations_to_csv(**filters):
+    """Export violations to CSV format as one string (use stream_violations_csv for large tables)"""
+    return "".join(stream_violations_csv(**filters))
@@ -0,0 +1,178 @@
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+class PoolTimeout(Exception):
+    """No connection became free within the pool's max wait"""
+
+class ConnectionPool:
+    """
+    Size-bounded pool of DB-API connections shared by every thread.
+
+    `connect` is any zero-argument callable returning a connection, so the same
+    pool serves MySQL in production and SQLite in tests. Connections that have
+    been idle for more than `health_check_sec` are checked before being handed
+    out and replaced if they are dead.
+    """
+
+    def __init__(self, connect, size=5, max_wait_sec=10.0, health_check_sec=30.0):
+        self.connect = connect
+        self.size = max(1, int(size))
+        self.max_wait_sec = max_wait_sec
+        self.health_check_sec = health_check_sec
+        self._idle = queue.LifoQueue()  # (connection, returned_at)
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._invalidated = set()  # ids of borrowed connections to close on return
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "health_check_failures": 0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+        }
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; it is rolled back on error and always returned"""
+        con = self._acquire()
+        try:
+            yield con
+        except Exception:
+            if not self._is_invalidated(con):
+                try:
+                    con.rollback()
+                except Exception:
+                    self.invalidate(con)
+            raise
+        finally:
+            self._release(con)
+
+    def invalidate(self, con):
+        """Close a borrowed connection when it is returned instead of reusing it,
+        e.g. one abandoned in the middle of reading a streamed result"""
+        with self._lock:
+            self._invalidated.add(id(con))
+
+    def _is_invalidated(self, con):
+        with self._lock:
+            return id(con) in self._invalidated
+
+    def _acquire(self):
+        start = time.perf_counter()
+        waited = False
+        while True:
+            try:
+                con, returned_at = self._idle.get_nowait()
+            except queue.Empty:
+                con = None
+                with self._lock:
+                    can_create = self._created < self.size
+                    if can_create:
+                        self._created += 1
+                if can_create:
+                    try:
+                        con = self.connect()
+                    except Exception:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                    returned_at = time.time()
+                else:
+                    # Every connection is busy: wait for one to come back
+                    waited = True
+                    remaining = self.max_wait_sec - (time.perf_counter() - start)
+                    if remaining <= 0:
+                        with self._lock:
+                            self._stats["timeouts"] += 1
+                        raise PoolTimeout(f"No database connection free after {self.max_wait_sec}s")
+                    try:
+                        con, returned_at = self._idle.get(timeout=remaining)
+                    except queue.Empty:
+                        continue
+
+            if time.time() - returned_at > self.health_check_sec and not self._is_healthy(con):
+                with self._lock:
+                    self._stats["health_check_failures"] += 1
+                self._discard(con)
+                continue
+
+            wait_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self._in_use += 1
+                self._stats["checkouts"] += 1
+                self._stats["total_wait_ms"] += wait_ms
+                self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], wait_ms)
+                if waited:
+                    self._stats["waits"] += 1
+            return con
+
+    def _release(self, con):
+        with self._lock:
+            invalidated = id(con) in self._invalidated
+            self._invalidated.discard(id(con))
+        if invalidated:
+            self._discard(con, borrowed=True)
+            return
+
+        # End read transactions left open, so the next borrower sees fresh data
+        if getattr(con, "in_transaction", False):
+            try:
+                con.rollback()
+            except Exception:
+                self._discard(con, borrowed=True)
+                return
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put((con, time.time()))
+
+    def _discard(self, con, borrowed=False):
+        with self._lock:
+            self._created -= 1
+            if borrowed:
+                self._in_use -= 1
+        try:
+            con.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, con):
+        try:
+            if hasattr(con, "ping"):
+                con.ping(reconnect=False)
+            else:
+                cur = con.cursor()
+                cur.execute("SELECT 1")
+                cur.fetchall()
+                cur.close()
+            return True
+        except Exception:
+            return False
+
+    def close(self):
+        """Close every idle connection"""
+        while True:
+            try:
+                con, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(con)
+
+    def stats(self):
+        """Pool usage and wait-time counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                "size": self.size,
+                "open": self._created,
+                "in_use": self._in_use,
+                "idle": self._created - self._in_use,
+            })
+        checkouts = stats["checkouts"]
+        stats["avg_wait_ms"] = round(stats["total_wait_ms"] / checkouts, 3) if checkouts else 0.0
+        stats["total_wait_ms"] = round(stats["total_wait_ms"], 3)
+        stats["max_wait_ms"] = round(stats["max_wait_ms"], 3)
+        return stats
@@ -1,7 +1,11 @@
 import mysql.connector
 from datetime import datetime
-import csv
-import io
+import threading
+
+from app.dbpool import ConnectionPool
+from app.storage import (violation_filters, where_clause, keyset_condition, finish_page,
+                         csv_chunks, gzip_chunks)
+from app.utils import load_yaml
 
 # Update these with your MySQL credentials
 MYSQL_CONFIG = {
@@ -11,128 +15,298 @@ MYSQL_CONFIG = {
     "database": "traffic_db"
 }
 
+VIOLATION_INDEXES = [
+    "CREATE INDEX idx_violations_ts ON violations (ts_utc, id)",
+    "CREATE INDEX idx_violations_type_ts ON violations (violation_type, ts_utc)",
+    "CREATE INDEX idx_violations_plate ON violations (number_plate)",
+]
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Return the process-wide MySQL connection pool, creating it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            db_config = load_yaml("app/config.yaml").get("database") or {}
+            _pool = ConnectionPool(
+                lambda: mysql.connector.connect(**MYSQL_CONFIG),
+                size=db_config.get("pool_size", 5),
+                max_wait_sec=db_config.get("pool_max_wait_sec", 10),
+                health_check_sec=db_config.get("health_check_sec", 30),
+            )
+        return _pool
+
+def set_pool(pool):
+    """Replace the shared pool, e.g. with one built on a local stand-in database"""
+    global _pool
+    with _pool_lock:
+        _pool = pool
+
+def get_pool_stats():
+    """Connection pool usage and wait times"""
+    return get_pool().stats()
+
 def init_db():
-    con = mysql.connector.connect(**MYSQL_CONFIG)
-    cur = con.cursor()
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS violations (
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        ts_utc VARCHAR(32) NOT NULL,
-        file_path VARCHAR(255) NOT NULL,
-        violation_type VARCHAR(64) NOT NULL,
-        fine INT NOT NULL,
-        number_plate VARCHAR(20) DEFAULT NULL
-    );
-    """)
-    
-    # Add number_plate column if it doesn't exist (for existing databases)
-    try:
+    with get_pool().connection() as con:
+        cur = con.cursor()
         cur.execute("""
-        ALTER TABLE violations 
-        ADD COLUMN number_plate VARCHAR(20) DEFAULT NULL
+        CREATE TABLE IF NOT EXISTS violations (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            ts_utc VARCHAR(32) NOT NULL,
+            file_path VARCHAR(255) NOT NULL,
+            violation_type VARCHAR(64) NOT NULL,
+            fine INT NOT NULL,
+            number_plate VARCHAR(20) DEFAULT NULL,
+            clip_path VARCHAR(255) DEFAULT NULL
+        );
         """)
+
+        # Add number_plate column if it doesn't exist (for existing databases)
+        try:
+            cur.execute("""
+            ALTER TABLE violations
+            ADD COLUMN number_plate VARCHAR(20) DEFAULT NULL
+            """)
+            con.commit()
+        except mysql.connector.Error:
+            # Column already exists, ignore the error
+            pass
+
+        # Add clip_path column if it doesn't exist (for existing databases)
+        try:
+            cur.execute("""
+            ALTER TABLE violations
+            ADD COLUMN clip_path VARCHAR(255) DEFAULT NULL
+            """)
+            con.commit()
+        except mysql.connector.Error:
+            pass
+
+        # Indexes behind the admin dashboard's paging, filters and summaries
+        for index_sql in VIOLATION_INDEXES:
+            try:
+                cur.execute(index_sql)
+                con.commit()
+            except mysql.connector.Error:
+                # Index already exists
+                pass
+
         con.commit()
-    except mysql.connector.Error:
-        # Column already exists, ignore the error
-        pass
-    
-    con.commit()
-    cur.close()
-    con.close()
-
-def insert_violation(file_path, violation_type, fine):
-    con = mysql.connector.connect(**MYSQL_CONFIG)
-    cur = con.cursor()
-    cur.execute("""
-        INSERT INTO violations (ts_utc, file_path, violation_type, fine)
-        VALUES (%s, %s, %s, %s)
-    """, (datetime.utcnow().isoformat(), file_path, violation_type, fine))
-    con.commit()
-    cur.close()
-    con.close()
+        cur.close()
+
+def insert_violation(file_path, violation_type, fine, clip_path=None):
+    with get_pool().connection() as con:
+        cur = con.cursor()
+        cur.execute("""
+            INSERT INTO violations (ts_utc, file_path, violation_type, fine, clip_path)
+            VALUES (%s, %s, %s, %s, %s)
+        """, (datetime.utcnow().isoformat(), file_path, violation_type, fine, clip_path))
+        con.commit()
+        cur.close()
+
+def insert_violations(rows):
+    """
+    Insert many violations in one transaction.
+
+    Args:
+        rows: Iterable of (ts_utc, file_path, violation_type, fine, clip_path) tuples
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+    with get_pool().connection() as con:
+        cur = con.cursor()
+        cur.executemany("""
+            INSERT INTO violations (ts_utc, file_path, violation_type, fine, clip_path)
+            VALUES (%s, %s, %s, %s, %s)
+        """, rows)
+        con.commit()
+        cur.close()
+    return len(rows)
 
 def get_all_violations():
     """Retrieve all violations from the database"""
-    con = mysql.connector.connect(**MYSQL_CONFIG)
-    cur = con.cursor(dictionary=True)
-    cur.execute("""
-        SELECT id, ts_utc, file_path, violation_type, fine, number_plate
-        FROM violations
-        ORDER BY ts_utc DESC
-    """)
-    violations = cur.fetchall()
-    cur.close()
-    con.close()
+    with get_pool().connection() as con:
+        cur = con.cursor(dictionary=True)
+        cur.execute("""
+            SELECT id, ts_utc, file_path, violation_type, fine, number_plate, clip_path
+            FROM violations
+            ORDER BY ts_utc DESC
+        """)
+        violations = cur.fetchall()
+        cur.close()
     return violations
 
+def get_violations_page(limit=50, before=None, after=None, **filters):
+    """
+    One page of violations, newest first, using keyset pagination on
+    (ts_utc, id) so deep pages cost the same as the first one.
+
+    Args:
+        limit: Rows per page
+        before: Cursor of the last row of the previous page (older rows)
+        after: Cursor of the first row of the next page (newer rows)
+        **filters: See storage.violation_filters
+
+    Returns:
+        dict: violations, next_cursor (older page) and prev_cursor (newer page)
+    """
+    conditions, params = violation_filters(**filters)
+    newer = keyset_condition(conditions, params, before, after)
+    order = "ASC" if newer else "DESC"
+    with get_pool().connection() as con:
+        cur = con.cursor(dictionary=True)
+        cur.execute(f"""
+            SELECT id, ts_utc, file_path, violation_type, fine, number_plate, clip_path
+            FROM violations
+            {where_clause(conditions)}
+            ORDER BY ts_utc {order}, id {order}
+            LIMIT %s
+        """, (*params, limit + 1))
+        violations = cur.fetchall()
+        cur.close()
+    return finish_page(violations, limit, before, after)
+
+def get_violation_summary(**filters):
+    """
+    Totals for the dashboard cards, computed in SQL.
+
+    Returns:
+        dict: total, total_fines, latest_ts and most_common violation type
+    """
+    conditions, params = violation_filters(**filters)
+    where = where_clause(conditions)
+    with get_pool().connection() as con:
+        cur = con.cursor(dictionary=True)
+        cur.execute(f"""
+            SELECT COUNT(*) AS total, COALESCE(SUM(fine), 0) AS total_fines, MAX(ts_utc) AS latest_ts
+            FROM violations
+            {where}
+        """, params)
+        summary = cur.fetchone()
+        cur.execute(f"""
+            SELECT violation_type, COUNT(*) AS n
+            FROM violations
+            {where}
+            GROUP BY violation_type
+            ORDER BY n DESC
+            LIMIT 1
+        """, params)
+        row = cur.fetchone()
+        cur.close()
+    summary["most_common"] = row["violation_type"] if row else None
+    return summary
+
+def get_violation_types():
+    """Distinct violation types, for the dashboard filter"""
+    with get_pool().connection() as con:
+        cur = con.cursor()
+        cur.execute("SELECT DISTINCT violation_type FROM violations ORDER BY violation_type")
+        types = [row[0] for row in cur.fetchall()]
+        cur.close()
+    return types
+
+def get_violation_file_path(violation_id):
+    """Return the evidence file path of one violation, or None"""
+    with get_pool().connection() as con:
+        cur = con.cursor()
+        cur.execute("SELECT file_path FROM violations WHERE id = %s", (violation_id,))
+        row = cur.fetchone()
+        cur.close()
+    return row[0] if row else None
+
+def get_violation_clip_path(violation_id):
+    """Return the evidence clip path of one violation, or None"""
+    with get_pool().connection() as con:
+        cur = con.cursor()
+        cur.execute("SELECT clip_path FROM violations WHERE id = %s", (violation_id,))
+        row = cur.fetchone()
+        cur.close()
+    return row[0] if row else None
+
 def update_number_plate(violation_id, number_plate):
     """Update the number plate for a specific violation"""
-    con = mysql.connector.connect(**MYSQL_CONFIG)
-    cur = con.cursor()
-    cur.execute("""
-        UPDATE violations 
-        SET number_plate = %s 
-        WHERE id = %s
-    """, (number_plate, violation_id))
-    con.commit()
-    cur.close()
-    con.close()
+    with get_pool().connection() as con:
+        cur = con.cursor()
+        cur.execute("""
+            UPDATE violations
+            SET number_plate = %s
+            WHERE id = %s
+        """, (number_plate, violation_id))
+        con.commit()
+        cur.close()
 
 def delete_violation(violation_id):
     """Delete a specific violation from the database"""
-    con = mysql.connector.connect(**MYSQL_CONFIG)
-    cur = con.cursor()
-    cur.execute("""
-        DELETE FROM violations 
-        WHERE id = %s
-    """, (violation_id,))
-    con.commit()
-    rows_affected = cur.rowcount
-    cur.close()
-    con.close()
+    with get_pool().connection() as con:
+        cur = con.cursor()
+        cur.execute("""
+            DELETE FROM violations
+            WHERE id = %s
+        """, (violation_id,))
+        con.commit()
+        rows_affected = cur.rowcount
+        cur.close()
     return rows_affected > 0
 
 def delete_all_violations():
     """Delete all violations from the database"""
-    con = mysql.connector.connect(**MYSQL_CONFIG)
-    cur = con.cursor()
-    cur.execute("DELETE FROM violations")
-    con.commit()
-    rows_affected = cur.rowcount
-    cur.close()
-    con.close()
+    with get_pool().connection() as con:
+        cur = con.cursor()
+        cur.execute("DELETE FROM violations")
+        con.commit()
+        rows_affected = cur.rowcount
+        cur.close()
     return rows_affected
 
-def export_violations_to_csv():
-    """Export all violations to CSV format"""
-    con = mysql.connector.connect(**MYSQL_CONFIG)
-    cur = con.cursor(dictionary=True)
-    cur.execute("""
-        SELECT id, ts_utc, violation_type, fine, number_plate
-        FROM violations
-        ORDER BY ts_utc DESC
-    """)
-    violations = cur.fetchall()
-    cur.close()
-    con.close()
-    
-    # Create CSV in memory
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    writer.writerow(['ID', 'Date & Time (UTC)', 'Violation Type', 'Fine Amount (₹)', 'Number Plate'])
-    
-    # Write data rows
-    for violation in violations:
-        writer.writerow([
-            violation['id'],
-            violation['ts_utc'],
-            #violation['file_path'],
-            violation['violation_type'],
-            violation['fine'],
-            violation['number_plate'] or ''
-        ])
-    
-    output.seek(0)
-    return output.getvalue()
\ No newline at end of file
+def iter_violations(batch_size=1000, **filters):
+    """
+    Yield violations newest first without loading the table into memory.
+
+    Rows are read through an unbuffered (server-side) cursor `batch_size` at a
+    time, so memory stays flat however large the table is. The connection is
+    held until the generator finishes; one abandoned part-way through is
+    closed rather than returned to the pool with rows still unread.
+
+    Args:
+        batch_size: Rows fetched per round trip
+        **filters: See storage.violation_filters
+    """
+    conditions, params = violation_filters(**filters)
+    pool = get_pool()
+    with pool.connection() as con:
+        cur = con.cursor(dictionary=True, buffered=False)
+        finished = False
+        try:
+            cur.execute(f"""
+                SELECT id, ts_utc, violation_type, fine, number_plate
+                FROM violations
+                {where_clause(conditions)}
+                ORDER BY ts_utc DESC, id DESC
+            """, params)
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row
+            finished = True
+        finally:
+            if finished:
+                cur.close()
+            else:
+                pool.invalidate(con)
+
+def stream_violations_csv(batch_size=1000, **filters):
+    """Export violations as CSV text chunks of about `batch_size` rows each"""
+    return csv_chunks(iter_violations(batch_size=batch_size, **filters), batch_size)
+
+def stream_violations_csv_gz(batch_size=1000, level=6, **filters):
+    """Export violations as a gzip-compressed CSV byte stream"""
+    return gzip_chunks(stream_violations_csv(batch_size=batch_size, **filters), level)
+
+def export_violations_to_csv(**filters):
+    """Export violations to CSV format as one string (use stream_violations_csv for large tables)"""
+    return "".join(stream_violations_csv(**filters))
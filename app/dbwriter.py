@@ -0,0 +1,128 @@
+import atexit
+import threading
+import time
+from datetime import datetime
+
+from app.utils import load_yaml
+from app.metrics import watch_queue
+
+class ViolationWriter:
+    """
+    Write-behind buffer for violation rows.
+
+    Rows are collected in memory and written with a single executemany
+    transaction once `batch_rows` rows are waiting or every `flush_ms`
+    milliseconds, whichever comes first. With `synchronous=True` every row is
+    written immediately (one INSERT and COMMIT per violation, as before).
+    A failed flush keeps its rows and retries on the next flush.
+    """
+
+    def __init__(self, insert_many, batch_rows=50, flush_ms=500, synchronous=False):
+        self.insert_many = insert_many
+        self.batch_rows = max(1, int(batch_rows))
+        self.flush_ms = flush_ms
+        self.synchronous = synchronous
+        self._stats = {"rows_written": 0, "flushes": 0, "failures": 0}
+        self._rows = []
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._thread = None
+        if not synchronous:
+            self._thread = threading.Thread(target=self._flush_loop, name="violation-writer", daemon=True)
+            self._thread.start()
+
+    def write(self, file_path, violation_type, fine, clip_path=None):
+        """Queue one violation row (timestamped now)"""
+        row = (datetime.utcnow().isoformat(), file_path, violation_type, fine, clip_path)
+        if self.synchronous or self._closed:
+            # Closed writers (e.g. during interpreter exit) write straight through
+            self.insert_many([row])
+            self._count(rows_written=1, flushes=1)
+            return
+        with self._cond:
+            self._rows.append(row)
+            if len(self._rows) >= self.batch_rows:
+                self._cond.notify()
+
+    def _count(self, **amounts):
+        with self._cond:
+            for key, amount in amounts.items():
+                self._stats[key] += amount
+
+    @property
+    def stats(self):
+        """Snapshot of rows_written, flushes and failures"""
+        with self._cond:
+            return dict(self._stats)
+
+    def pending(self):
+        """Rows waiting to be written"""
+        with self._cond:
+            return len(self._rows)
+
+    def flush(self):
+        """Write every buffered row now. Returns the number of rows written"""
+        with self._flush_lock:
+            with self._cond:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+            try:
+                self.insert_many(rows)
+            except Exception as e:
+                print(f"❌ Error writing {len(rows)} violations to database: {e}")
+                with self._cond:
+                    # Put them back in front of anything queued meanwhile
+                    self._rows = rows + self._rows
+                    self._stats["failures"] += 1
+                raise
+            self._count(rows_written=len(rows), flushes=1)
+            return len(rows)
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or len(self._rows) >= self.batch_rows,
+                                    timeout=self.flush_ms / 1000)
+                closed = self._closed
+            try:
+                self.flush()
+            except Exception:
+                # Rows were kept; back off a little before retrying
+                time.sleep(self.flush_ms / 1000)
+            if closed:
+                break
+
+    def close(self):
+        """Stop the background thread and write every remaining row"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+        self.flush()
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_violation_writer():
+    """Return the process-wide violation writer configured in app/config.yaml"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            from app.storage import insert_violations
+
+            db_config = load_yaml("app/config.yaml").get("database") or {}
+            _writer = ViolationWriter(
+                insert_violations,
+                batch_rows=db_config.get("batch_rows", 50),
+                flush_ms=db_config.get("flush_ms", 500),
+                synchronous=db_config.get("write_mode", "batched") == "sync",
+            )
+            # Rows still buffered when the process exits are written here
+            atexit.register(_writer.close)
+            watch_queue("db_writer", _writer, lambda writer: writer.pending())
+        return _writer
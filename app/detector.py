@@ -0,0 +1,224 @@
+import cv2
+import time
+
+from app.dbwriter import get_violation_writer
+from app.evidence import get_evidence_writer
+from app.inference import load_inference_models
+from app.postprocess import ViolationPostProcessor
+from app.metrics import FRAMES_INFERRED, INFERENCE_LATENCY, VIOLATIONS_DETECTED, VALIDATION_VERDICTS
+from app.utils import load_yaml
+
+# Paths of the three YOLO models used by the detection engine
+MODEL_PATHS = {
+    "main": "models/best.pt",                       # Original model (no helmet)
+    "helmet": "models/helmet_triple_best.pt",       # Helmet and triple riding model
+    "seatbelt": "models/seatbelt_best.pt",          # Seatbelt model
+}
+
+def load_models(config=None):
+    """
+    Load all YOLO models once and return them keyed by name, using the
+    backend selected by `inference.backend` in app/config.yaml
+    (pytorch, onnxruntime or openvino; see app/inference.py)
+    """
+    config = config or load_yaml("app/config.yaml")
+    return load_inference_models(MODEL_PATHS, config)
+
+def predict_batch(models, frames, config):
+    """
+    Run every model on a batch of frames with a single predict call per model.
+
+    Args:
+        models: Dict of loaded models (see load_models)
+        frames: List of BGR frames
+        config: Parsed app/config.yaml
+
+    Returns:
+        list: One dict per frame mapping model name to its Results object
+    """
+    conf = config["conf_thresholds"]["helmet_triple"]
+    batch_results = {}
+    for name, model in models.items():
+        start = time.perf_counter()
+        batch_results[name] = model.predict(frames, conf=conf)
+        INFERENCE_LATENCY.labels(model=name).observe(time.perf_counter() - start)
+    FRAMES_INFERRED.inc(len(frames))
+    return [
+        {name: results[i] for name, results in batch_results.items()}
+        for i in range(len(frames))
+    ]
+
+# Violation key (as in fines.yaml) -> (violation type stored in DB, label drawn on frame, box colour)
+VIOLATION_STYLES = {
+    "0": ("No helmet", "No helmet", (0, 0, 255)),                     # Red for no helmet
+    "triple riding": ("Triple Riding", "Triple Riding", (255, 0, 0)), # Blue for triple riding
+    "No-seat-belt": ("No-seat-belt", "No Seatbelt", (0, 255, 0)),     # Green for seatbelt
+}
+
+# Violation type stored in DB -> (label drawn on frame, box colour)
+VIOLATION_LABELS = {violation_type: (label, color) for violation_type, label, color in VIOLATION_STYLES.values()}
+
+# Model name -> rule mapping one of its classes (id, name) to a violation key
+VIOLATION_CLASSES = {
+    "main": lambda cls_id, cls_name: str(cls_id),  # one-class model, its key is the class id ("0")
+    "helmet": lambda cls_id, cls_name: "triple riding" if str(cls_name).lower() == "triple riding" else None,
+    "seatbelt": lambda cls_id, cls_name: "No-seat-belt" if str(cls_name).lower() == "no-seat-belt" else None,
+}
+
+def create_postprocessor(models, fines):
+    """
+    Build the class-id -> violation-key tables of the loaded models once, for
+    the violations that have a fine in fines.yaml
+    """
+    keys = [violation_key for violation_key in VIOLATION_STYLES if violation_key in fines]
+    return ViolationPostProcessor(models, keys, VIOLATION_CLASSES)
+
+def find_violations(frame, frame_results, postprocessor, fines, tracker):
+    """
+    Match one frame's results to tracked objects, annotate the frame and return
+    the violations of tracks that have not been reported yet.
+
+    Args:
+        postprocessor: ViolationPostProcessor from create_postprocessor
+        tracker: ViolationTracker keeping the per-track reporting state
+    """
+    violations_in_frame = match_violations(frame_results, postprocessor, fines, tracker)
+    annotate_violations(frame, violations_in_frame)
+    for violation in violations_in_frame:
+        VIOLATIONS_DETECTED.labels(type=violation['type']).inc()
+    return violations_in_frame
+
+def match_violations(frame_results, postprocessor, fines, tracker):
+    """Post-processing half of find_violations: the new violations, without drawing"""
+    violations_in_frame = []  # Store all violations detected in this frame
+
+    # Every class is updated, even without boxes, so its tracks age out
+    for violation_key, boxes in postprocessor.candidates(frame_results).items():
+        violation_type = VIOLATION_STYLES[violation_key][0]
+        for index, track_id in tracker.new_violations(violation_key, boxes):
+            violations_in_frame.append({
+                'type': violation_type,
+                'fine': fines[violation_key],
+                'bbox': boxes[index].tolist(),
+                'track_id': track_id
+            })
+
+    return violations_in_frame
+
+def annotate_violations(frame, violations_in_frame):
+    """Draw the bounding box and label of each violation on the frame"""
+    for violation in violations_in_frame:
+        label, color = VIOLATION_LABELS[violation['type']]
+        x1, y1, x2, y2 = map(int, violation['bbox'])
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, color, 2)
+
+def handle_validation_result(img_path, violation, validation_result):
+    """Log a Gemini verdict and store the violation if it was confirmed"""
+    print(f"Gemini validation for {violation['type']}: {validation_result['status']} (confidence: {validation_result['confidence']:.2f})")
+    print(f"Reason: {validation_result['reason']}")
+    VALIDATION_VERDICTS.labels(status=validation_result['status']).inc()
+
+    # Clips are only kept for violations confirmed while their frames are buffered
+    clip = violation.pop('clip', None)
+
+    if validation_result['status'] == 'deferred':
+        if clip is not None:
+            clip.discard()
+        print(f"⏸️  Violation waiting for re-validation: {violation['type']}")
+        return False
+
+    # Only save to DB if validation is correct, and only once the evidence file exists
+    if validation_result['status'] == 'correct':
+        def write_row(clip_path=None):
+            get_violation_writer().write(
+                file_path=img_path,
+                violation_type=violation['type'],
+                fine=violation['fine'],
+                clip_path=clip_path
+            )
+
+        if clip is not None:
+            clip.confirm()
+            # The row only points at the clip once it is encoded (None if that failed)
+            clip.when_encoded(lambda clip_path: get_evidence_writer().when_written(
+                img_path, lambda: write_row(clip_path)))
+        else:
+            get_evidence_writer().when_written(img_path, write_row)
+        print(f"✅ Violation queued for database: {violation['type']}")
+        return True
+
+    if clip is not None:
+        clip.discard()
+    print(f"❌ Violation rejected by Gemini: {violation['type']}")
+    # Optionally, you could save rejected detections to a separate folder
+    # for manual review later
+    return False
+
+def record_violations(frame, violations_in_frame, gemini_validator, prefix="annotated", validation_pool=None,
+                      clip_recorder=None):
+    """
+    Save the full annotated frame, validate every violation with Gemini and
+    store the confirmed ones in the database.
+
+    The frame is encoded and written by the background evidence writer (see
+    evidence.py). With a validation_pool (see async_validator) the Gemini
+    calls run in the background too and this returns as soon as they are
+    queued. Gemini gets the in-memory frame, never the file being written.
+
+    With a clip_recorder (see clips.py) a short clip around the frame is
+    recorded too and encoded if a violation is confirmed.
+    """
+    img_path = get_evidence_writer().submit(frame, prefix=prefix)
+    clip = clip_recorder.request(prefix=f"{prefix}_clip", verdicts=len(violations_in_frame)) if clip_recorder else None
+
+    # Kept with the violation so a deferred re-validation can still store it
+    for violation in violations_in_frame:
+        violation['file_path'] = img_path
+        if clip is not None:
+            violation['clip'] = clip
+
+    if validation_pool is not None:
+        validation_pool.submit(img_path, violations_in_frame, image=frame)
+        return
+
+    # Validate every violation of the frame with one Gemini request, then save to DB
+    validation_results = gemini_validator.validate_detections(frame, violations_in_frame)
+    for violation, validation_result in zip(violations_in_frame, validation_results):
+        handle_validation_result(img_path, violation, validation_result)
+
+def finish_validation(gemini_validator, validation_pool=None, clip_recorders=()):
+    """
+    Wait for background validations to finish and print the validation summary.
+    The clip_recorders of the run are closed before the database flush, since
+    rows with a clip are only queued once it is encoded.
+    """
+    if validation_pool is not None:
+        print(f"⏳ Waiting for {validation_pool.pending()} pending Gemini validations...")
+        validation_pool.close(wait=True)
+        print(f"🤖 Gemini validation: {validation_pool.stats}")
+    if gemini_validator.deferred:
+        revalidated = gemini_validator.revalidate_deferred(
+            lambda violation, result: handle_validation_result(violation['file_path'], violation, result)
+        )
+        print(f"🔁 Re-validated {revalidated} deferred detections, {len(gemini_validator.deferred)} still queued")
+    if gemini_validator.cache is not None:
+        gemini_validator.cache.flush()
+        print(f"♻️  Validation cache: {gemini_validator.cache.stats()}")
+    for clip_recorder in clip_recorders:
+        if clip_recorder is not None:
+            clip_recorder.close()
+
+    # Make every confirmed violation durable before the run reports back:
+    # evidence files first, since their rows are only queued once written
+    evidence_writer = get_evidence_writer()
+    evidence_writer.flush()
+    print(f"🖼️  Evidence writes: {evidence_writer.stats}")
+    writer = get_violation_writer()
+    try:
+        writer.flush()
+    except Exception:
+        print(f"⚠️ {writer.pending()} violations still buffered; retrying in the background")
+    print(f"💾 Database writes: {writer.stats}")
+    if gemini_validator.is_available():
+        print(f"🩺 Gemini health: {gemini_validator.health()}")
@@ -0,0 +1,177 @@
+import atexit
+import os
+import queue
+import threading
+import time
+import traceback
+from datetime import datetime
+
+import cv2
+
+from app.utils import load_yaml
+from app.metrics import watch_queue
+
+# Encoder flags per output format: (file extension, OpenCV quality flag)
+IMAGE_FORMATS = {
+    "jpg": (".jpg", cv2.IMWRITE_JPEG_QUALITY),
+    "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY),
+}
+
+class EvidenceWriter:
+    """
+    Background pool that encodes and writes evidence frames.
+
+    submit() returns the final file path at once and queues the frame; worker
+    threads encode it (JPEG or WebP at the configured quality) into a
+    date-sharded directory such as crops/2025/01/31/. The bounded queue blocks
+    the caller when the disk falls behind instead of growing memory. Files are
+    written to a temporary name and renamed, so a path that exists is always
+    a complete image. when_written() defers work, such as the database
+    insert, until the file is on disk.
+
+    With num_workers=0 frames are written synchronously inside submit().
+    """
+
+    def __init__(self, base_dir="crops", image_format="jpg", quality=90, shard="%Y/%m/%d",
+                 num_workers=2, queue_size=32):
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"Unsupported evidence format '{image_format}' (expected one of {sorted(IMAGE_FORMATS)})")
+        self.base_dir = base_dir
+        self.extension, quality_flag = IMAGE_FORMATS[image_format]
+        self.encode_params = [quality_flag, int(quality)]
+        self.shard = shard
+        self.stats = {"submitted": 0, "written": 0, "failed": 0, "bytes_written": 0}
+        self._queue = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._lock = threading.Lock()
+        self._pending = {}  # path -> callbacks waiting for the file
+        self._last_stamp = 0
+        self._workers = [
+            threading.Thread(target=self._work_loop, name=f"evidence-{i}", daemon=True)
+            for i in range(int(num_workers))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def path_for(self, prefix):
+        """Evidence path for a new frame, e.g. crops/2025/01/31/annotated_1738300000000.jpg"""
+        now = time.time()
+        with self._lock:
+            # Strictly increasing so two frames in the same millisecond never share a file
+            stamp = self._last_stamp = max(int(now * 1000), self._last_stamp + 1)
+        shard_dir = datetime.fromtimestamp(now).strftime(self.shard) if self.shard else ""
+        return os.path.join(self.base_dir, shard_dir, f"{prefix}_{stamp}{self.extension}")
+
+    def submit(self, frame, prefix="annotated"):
+        """
+        Queue a frame for writing (blocks while the queue is full)
+
+        Args:
+            frame: BGR image; it must not be modified after submitting
+            prefix: File name prefix
+
+        Returns:
+            str: Path the frame will be written to
+        """
+        path = self.path_for(prefix)
+        with self._lock:
+            self._pending[path] = []
+            self.stats["submitted"] += 1
+        if self._workers:
+            self._queue.put((path, frame))
+        else:
+            self._write(path, frame)
+        return path
+
+    def when_written(self, path, callback):
+        """
+        Run callback() once `path` is on disk: immediately if it already is,
+        otherwise on the writer thread right after the file is written.
+        Returns False (and drops the callback) if the file could not be written.
+        """
+        with self._lock:
+            if path in self._pending:
+                self._pending[path].append(callback)
+                return True
+        if not os.path.exists(path):
+            print(f"❌ Evidence file missing, skipping: {path}")
+            return False
+        callback()
+        return True
+
+    def pending(self):
+        """Frames queued or being written"""
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """Block until every queued frame has been written"""
+        if self._workers:
+            self._queue.join()
+
+    def close(self):
+        """Write the remaining frames and stop the workers"""
+        self.flush()
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout=5)
+        self._workers = []
+
+    def _work_loop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, path, frame):
+        try:
+            ok, encoded = cv2.imencode(self.extension, frame, self.encode_params)
+            if not ok:
+                raise RuntimeError(f"could not encode {self.extension}")
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(encoded.tobytes())
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"❌ Error writing evidence {path}: {e}")
+            with self._lock:
+                self._pending.pop(path, None)
+                self.stats["failed"] += 1
+            return
+
+        with self._lock:
+            callbacks = self._pending.pop(path, [])
+            self.stats["written"] += 1
+            self.stats["bytes_written"] += len(encoded)
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                traceback.print_exc()
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_evidence_writer():
+    """Return the process-wide evidence writer configured in app/config.yaml"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            evidence_config = load_yaml("app/config.yaml").get("evidence") or {}
+            _writer = EvidenceWriter(
+                base_dir=evidence_config.get("dir", "crops"),
+                image_format=evidence_config.get("format", "jpg"),
+                quality=evidence_config.get("quality", 90),
+                shard=evidence_config.get("shard", "%Y/%m/%d"),
+                num_workers=evidence_config.get("workers", 2) if evidence_config.get("async", True) else 0,
+                queue_size=evidence_config.get("queue_size", 32),
+            )
+            # Frames still queued when the process exits are written here
+            atexit.register(_writer.close)
+            watch_queue("evidence", _writer, lambda writer: writer.pending())
+        return _writer
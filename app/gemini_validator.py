@@ -1,30 +1,346 @@
 import google.generativeai as genai
 import json
 import base64
-from PIL import Image
+import cv2
+import numpy as np
 import io
 import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from dotenv import load_dotenv
 from app.gemini_config import GEMINI_API_KEY
+from app.resilience import TokenBucket, CircuitBreaker, LatencyTracker
+from app.metrics import GEMINI_CALLS, GEMINI_LATENCY
 
 # Load environment variables from .env file
 load_dotenv()
 
+def perceptual_hash(image, hash_size=8):
+    """
+    64-bit difference hash (dHash) of a BGR or grayscale image region.
+
+    Near-identical regions (same parked scooter, re-encoded frames, repeated
+    test videos) get hashes that differ in only a few bits.
+    """
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(image, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, :-1] > small[:, 1:]).flatten()
+
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+def union_box(bbox):
+    """Accept one [x1, y1, x2, y2] box or a list of them and return their union"""
+    boxes = np.asarray(bbox, dtype=np.float32).reshape(-1, 4)
+    return boxes[:, 0].min(), boxes[:, 1].min(), boxes[:, 2].max(), boxes[:, 3].max()
+
+def crop_for_validation(frame, bbox=None, padding=0.25, max_side=512):
+    """
+    Padded crop around the violation box(es), downscaled so its longest side
+    is at most max_side. Without a bbox the whole frame is downscaled.
+
+    Returns:
+        tuple: (crop, (x_offset, y_offset, scale)) mapping frame coordinates
+            into the crop as (x - x_offset) * scale
+    """
+    h, w = frame.shape[:2]
+    x_offset, y_offset = 0, 0
+    if bbox is not None and len(bbox):
+        x1, y1, x2, y2 = union_box(bbox)
+        pad_x = (x2 - x1) * padding
+        pad_y = (y2 - y1) * padding
+        x1, y1 = max(0, int(x1 - pad_x)), max(0, int(y1 - pad_y))
+        x2, y2 = min(w, int(x2 + pad_x)), min(h, int(y2 + pad_y))
+        if x2 > x1 and y2 > y1:
+            frame = frame[y1:y2, x1:x2]
+            x_offset, y_offset = x1, y1
+
+    h, w = frame.shape[:2]
+    scale = max_side / max(h, w)
+    if scale < 1.0:
+        frame = cv2.resize(frame, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+    else:
+        scale = 1.0
+    return frame, (x_offset, y_offset, scale)
+
+def parse_verdict(result):
+    """Check one verdict object against the expected schema and return it"""
+    if not isinstance(result, dict) or not all(key in result for key in ["status", "confidence", "reason"]):
+        raise ValueError("Invalid response format")
+
+    if result["status"] not in ["correct", "incorrect"]:
+        raise ValueError("Invalid status value")
+
+    if not isinstance(result["confidence"], (int, float)) or not (0.0 <= result["confidence"] <= 1.0):
+        raise ValueError("Invalid confidence value")
+
+    return {"status": result["status"], "confidence": float(result["confidence"]), "reason": str(result["reason"])}
+
+def verdict_from_text(text):
+    """Fallback when a verdict does not match the schema: look for 'correct' in the text"""
+    text_lower = text.lower()
+    if "correct" in text_lower and "incorrect" not in text_lower:
+        print("🔄 Fallback: Parsed 'correct' from text response")
+        return {
+            "status": "correct",
+            "confidence": 0.7,
+            "reason": "Parsed from text response"
+        }
+    print("🔄 Fallback: Parsed 'incorrect' from text response")
+    return {
+        "status": "incorrect",
+        "confidence": 0.7,
+        "reason": "Parsed from text response"
+    }
+
+class ValidationUnavailable(Exception):
+    """Raised instead of calling Gemini when the breaker is open or the rate limit is hit"""
+
+class ValidationCache:
+    """
+    Cache of Gemini verdicts keyed by (violation type, perceptual hash).
+
+    A lookup hits when a cached entry of the same type is within
+    `max_distance` bits of the query hash. Entries expire after `ttl_sec`,
+    the least recently used entry is evicted beyond `max_entries`, and the
+    cache is optionally persisted as JSON in `path` so it survives restarts.
+
+    Hashes are indexed by `max_distance + 1` bit ranges: two hashes at most
+    `max_distance` bits apart agree exactly on at least one of them, so a
+    lookup only compares the entries sharing a range with the query.
+    """
+
+    def __init__(self, max_entries=1024, ttl_sec=86400, max_distance=4, path=None, save_interval_sec=30.0):
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self.max_distance = max_distance
+        self.path = path
+        self.save_interval_sec = save_interval_sec
+        self._entries = OrderedDict()  # (violation_type, hash) -> (stored_at, result)
+        self._index = {}  # (violation_type, range number, bits in that range) -> set of hashes
+        bounds = [64 * i // (max_distance + 1) for i in range(max_distance + 2)]
+        self._ranges = [(low, (1 << (high - low)) - 1) for low, high in zip(bounds, bounds[1:])]
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._save_timer = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.hits_by_distance = {}
+        self._load()
+
+    def _index_keys(self, violation_type, image_hash):
+        return [(violation_type, number, (image_hash >> shift) & mask)
+                for number, (shift, mask) in enumerate(self._ranges)]
+
+    def _add(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        for index_key in self._index_keys(*key):
+            self._index.setdefault(index_key, set()).add(key[1])
+
+    def _remove(self, key):
+        del self._entries[key]
+        for index_key in self._index_keys(*key):
+            hashes = self._index[index_key]
+            hashes.discard(key[1])
+            if not hashes:
+                del self._index[index_key]
+
+    def get(self, violation_type, image_hash):
+        """Return the cached result for a near-identical region, or None"""
+        now = time.time()
+        with self._lock:
+            candidates = set()
+            for index_key in self._index_keys(violation_type, image_hash):
+                candidates.update(self._index.get(index_key, ()))
+
+            best_key, best_distance = None, None
+            for candidate in candidates:
+                key = (violation_type, candidate)
+                if now - self._entries[key][0] > self.ttl_sec:
+                    self._remove(key)
+                    self._dirty = True
+                    continue
+                distance = (candidate ^ image_hash).bit_count()
+                if distance <= self.max_distance and (best_distance is None or distance < best_distance):
+                    best_key, best_distance = key, distance
+
+            if best_key is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.hits_by_distance[best_distance] = self.hits_by_distance.get(best_distance, 0) + 1
+            self._entries.move_to_end(best_key)
+            return dict(self._entries[best_key][1])
+
+    def put(self, violation_type, image_hash, result):
+        """Store a verdict, evicting the least recently used entries if needed"""
+        with self._lock:
+            key = (violation_type, image_hash)
+            if key in self._entries:
+                self._remove(key)
+            self._add(key, (time.time(), dict(result)))
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            self._dirty = True
+            if self.path and self._save_timer is None:
+                # Batch the writes of the next few seconds into one save, off the caller's thread
+                self._save_timer = threading.Timer(self.save_interval_sec, self.flush)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+
+    def stats(self):
+        """Hit/miss counters for tuning max_distance"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "hits_by_distance": dict(sorted(self.hits_by_distance.items())),
+                "entries": len(self._entries),
+                "evictions": self.evictions,
+            }
+
+    def flush(self):
+        """Save the cache to `path` if it changed since the last save"""
+        with self._save_lock:
+            with self._lock:
+                if self._save_timer is not None:
+                    self._save_timer.cancel()
+                    self._save_timer = None
+                if not self.path or not self._dirty:
+                    return
+                now = time.time()
+                rows = [
+                    {"violation_type": key[0], "hash": f"{key[1]:016x}", "stored_at": stored_at, "result": result}
+                    for key, (stored_at, result) in self._entries.items()
+                    if now - stored_at <= self.ttl_sec
+                ]
+                self._dirty = False
+            # Lookups go on while the file is written
+            self._save(rows)
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                rows = json.load(f)
+            for row in rows:
+                self._add((row["violation_type"], int(row["hash"], 16)), (row["stored_at"], row["result"]))
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+            print(f"🗂️  Loaded {len(self._entries)} cached Gemini verdicts from {self.path}")
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️  Could not load validation cache {self.path}: {e}")
+
+    def _save(self, rows):
+        # Write to a temp file and swap it in
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(rows, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"⚠️  Could not save validation cache {self.path}: {e}")
+            with self._lock:
+                self._dirty = True
+
 class GeminiValidator:
-    def __init__(self, api_key=None):
-        """Initialize Gemini validator with API key"""
+    def __init__(self, api_key=None, model=None, cache=None, crop_padding=0.25, max_side=512, jpeg_quality=85,
+                 deadline_sec=15.0, rate_limit_per_sec=None, rate_limit_burst=1, breaker_failures=5,
+                 breaker_reset_sec=30.0, degraded_policy="accept", max_deferred=500, max_calls_in_flight=8,
+                 rate_limit_wait_sec=0.5, api_endpoint=None):
+        """
+        Initialize Gemini validator with API key
+
+        Args:
+            api_key: Gemini API key (defaults to GEMINI_API_KEY from the environment or gemini_config)
+            model: Optional object with a generate_content() method used instead of
+                the Gemini client, e.g. a local stub for tests and benchmarks
+            cache: Optional ValidationCache reused for near-identical evidence
+            crop_padding: Padding around the violation box, as a fraction of its size
+            max_side: Longest side in pixels of the image sent to Gemini
+            jpeg_quality: JPEG quality of the image sent to Gemini
+            deadline_sec: Maximum time to wait for one Gemini call
+            rate_limit_per_sec: Optional Gemini request rate limit (token bucket)
+            rate_limit_burst: Requests that may be made back to back under the rate limit
+            rate_limit_wait_sec: Longest wait for a rate-limit token before the
+                degraded policy is used instead
+            breaker_failures: Consecutive failures that trip the circuit breaker
+            breaker_reset_sec: Time the breaker stays open before a trial call
+            degraded_policy: What to do while Gemini cannot be called:
+                "accept", "reject" or "queue" (keep for re-validation later)
+            max_deferred: Maximum number of queued detections kept for re-validation
+            max_calls_in_flight: Gemini calls running at once; further calls are
+                refused immediately (degraded policy) instead of queueing
+            api_endpoint: Optional Gemini REST endpoint, e.g. a local fake server
+        """
+        self.cache = cache
+        self.crop_padding = crop_padding
+        self.max_side = max_side
+        self.jpeg_quality = jpeg_quality
+        self.deadline_sec = deadline_sec
+        self.rate_limit_wait_sec = rate_limit_wait_sec
+        self.degraded_policy = degraded_policy
+        self.rate_limiter = TokenBucket(rate_limit_per_sec, rate_limit_burst) if rate_limit_per_sec else None
+        self.breaker = CircuitBreaker(breaker_failures, breaker_reset_sec)
+        self.latency = LatencyTracker()
+        self.deferred = deque(maxlen=max_deferred)
+        self.counters = {"calls": 0, "failures": 0, "timeouts": 0, "rate_limited": 0,
+                         "short_circuited": 0, "saturated": 0, "degraded": 0}
+        self._counter_lock = threading.Lock()
+        # One slot per executor thread, so calls never wait in the executor's queue
+        self._call_slots = threading.BoundedSemaphore(max_calls_in_flight)
+        self._call_executor = ThreadPoolExecutor(max_workers=max_calls_in_flight, thread_name_prefix="gemini-call")
+
         self.api_key = api_key or os.getenv('GEMINI_API_KEY', '') or GEMINI_API_KEY
-        if self.api_key:
-            genai.configure(api_key=self.api_key)
+        if model is not None:
+            self.model = model
+            print("🤖 Gemini validator using a custom model")
+        elif self.api_key:
+            if api_endpoint:
+                genai.configure(api_key=self.api_key, transport="rest",
+                                client_options={"api_endpoint": api_endpoint})
+            else:
+                genai.configure(api_key=self.api_key)
             self.model = genai.GenerativeModel('gemini-1.5-flash')
             print(f"🤖 Gemini API initialized with key: {self.api_key[:10]}...{self.api_key[-4:]}")
         else:
             self.model = None
             print("⚠️  Gemini API key not found - validation will be bypassed")
     
-    def get_system_prompt(self):
-        """Get the system prompt for detection validation"""
-        return """You are an AI traffic violation detection validator. Your task is to analyze annotated images and determine if the detected violations are correct.
+    def get_system_prompt(self, multiple=False):
+        """Get the system prompt for detection validation (one or several detections)"""
+        if multiple:
+            response_format = """The image contains several numbered detections. Respond ONLY with a JSON array containing one object per detection, in the same order, in this exact format:
+[
+    {
+        "id": detection number,
+        "status": "correct" or "incorrect",
+        "confidence": 0.0 to 1.0,
+        "reason": "Brief explanation of your decision"
+    }
+]"""
+        else:
+            response_format = """Respond ONLY with a JSON object in this exact format:
+{
+    "status": "correct" or "incorrect",
+    "confidence": 0.0 to 1.0,
+    "reason": "Brief explanation of your decision"
+}"""
+
+        return f"""You are an AI traffic violation detection validator. Your task is to analyze annotated images and determine if the detected violations are correct.
 
 You will receive images with bounding boxes and labels showing detected violations. The possible violations are:
 1. "No helmet" - Person riding motorcycle/scooter without helmet
@@ -36,38 +352,235 @@ Analyze the image carefully and determine if the detection is accurate:
 - Verify the violation type matches what's actually shown
 - Consider if the detection is a false positive
 
-Respond ONLY with a JSON object in this exact format:
-{
-    "status": "correct" or "incorrect",
-    "confidence": 0.0 to 1.0,
-    "reason": "Brief explanation of your decision"
-}
+{response_format}
 
 Be strict in your validation - only mark as "correct" if you are confident the detection is accurate."""
 
-    def validate_detection(self, image_path, violation_type):
+    def load_image(self, image):
+        """Return a BGR numpy frame for a frame or an image path"""
+        if isinstance(image, (str, os.PathLike)):
+            frame = cv2.imread(str(image))
+            if frame is None:
+                raise ValueError("Could not read image")
+            return frame
+        return image
+
+    def prepare_image(self, image, bbox=None):
+        """
+        Build the in-memory JPEG payload for Gemini.
+
+        Args:
+            image: Annotated BGR frame (numpy array) or path to an image file
+            bbox: Optional [x1, y1, x2, y2] box, or list of boxes, to crop around
+
+        Returns:
+            tuple: (payload dict for generate_content, cropped BGR image,
+                (x_offset, y_offset, scale) transform from frame to crop)
+        """
+        crop, transform = crop_for_validation(self.load_image(image), bbox, self.crop_padding, self.max_side)
+        ok, encoded = cv2.imencode(".jpg", crop, [cv2.IMWRITE_JPEG_QUALITY, int(self.jpeg_quality)])
+        if not ok:
+            raise ValueError("Could not encode image")
+        return {"mime_type": "image/jpeg", "data": encoded.tobytes()}, crop, transform
+
+    def bypass_result(self):
+        """Result used when the Gemini API is not configured"""
+        print("⚠️  Gemini API not available - bypassing validation (accepting detection)")
+        return {
+            "status": "correct",
+            "confidence": 1.0,
+            "reason": "Gemini API not configured - accepting detection"
+        }
+
+    def error_result(self, error):
+        """Result used when the Gemini call itself fails"""
+        print(f"❌ Error validating with Gemini API: {error}")
+        print("🔄 Defaulting to accepting detection due to API error")
+        # On error, default to accepting detection
+        return {
+            "status": "correct",
+            "confidence": 0.5,
+            "reason": f"Validation error: {str(error)}"
+        }
+
+    def _count(self, key):
+        with self._counter_lock:
+            self.counters[key] += 1
+
+    def generate(self, parts):
+        """
+        Call the model with rate limiting, a per-call deadline and the circuit breaker.
+
+        Raises:
+            ValidationUnavailable: The breaker is open, no rate-limit token came in
+                time or every call slot is busy with an earlier call
+        """
+        if not self.breaker.allow():
+            self._count("short_circuited")
+            GEMINI_CALLS.labels(outcome="short_circuited").inc()
+            raise ValidationUnavailable(f"circuit breaker {self.breaker.state}")
+
+        if self.rate_limiter is not None and not self.rate_limiter.acquire(timeout=self.rate_limit_wait_sec):
+            self._count("rate_limited")
+            GEMINI_CALLS.labels(outcome="rate_limited").inc()
+            # Refused locally, not a Gemini failure: give a half-open trial slot back
+            self.breaker.release_trial()
+            raise ValidationUnavailable("rate limit exceeded")
+
+        if not self._call_slots.acquire(blocking=False):
+            self._count("saturated")
+            GEMINI_CALLS.labels(outcome="saturated").inc()
+            self.breaker.release_trial()
+            raise ValidationUnavailable("too many Gemini calls in flight")
+
+        kwargs = {}
+        if isinstance(self.model, genai.GenerativeModel):
+            kwargs["request_options"] = {"timeout": self.deadline_sec}
+
+        self._count("calls")
+        start = time.perf_counter()
+        try:
+            future = self._call_executor.submit(self.model.generate_content, parts, **kwargs)
+        except Exception:
+            self._call_slots.release()
+            raise
+        # The slot is freed when the call really ends, not when we stop waiting
+        future.add_done_callback(lambda _: self._call_slots.release())
+        try:
+            response = future.result(timeout=self.deadline_sec)
+        except FutureTimeoutError:
+            # Drop the call if it has not started; a running one cannot be
+            # interrupted and keeps its slot until it returns
+            future.cancel()
+            self._count("timeouts")
+            self._count("failures")
+            GEMINI_CALLS.labels(outcome="timeout").inc()
+            self.breaker.record_failure()
+            raise TimeoutError(f"Gemini call exceeded {self.deadline_sec}s deadline")
+        except Exception:
+            self._count("failures")
+            GEMINI_CALLS.labels(outcome="error").inc()
+            self.breaker.record_failure()
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.latency.record(elapsed)
+            GEMINI_LATENCY.observe(elapsed)
+
+        GEMINI_CALLS.labels(outcome="success").inc()
+        self.breaker.record_success()
+        return response
+
+    def degraded_result(self, reason, crop=None, detection=None):
+        """Fast local verdict used while Gemini cannot be called"""
+        self._count("degraded")
+        if self.degraded_policy == "queue" and detection is not None:
+            if len(self.deferred) == self.deferred.maxlen:
+                print("⚠️  Re-validation queue full - dropping the oldest deferred detection")
+            self.deferred.append((crop, detection))
+            print(f"⏸️  Gemini unavailable ({reason}) - queued '{detection['type']}' for re-validation")
+            return {"status": "deferred", "confidence": 0.0, "reason": f"Queued for re-validation: {reason}"}
+
+        if self.degraded_policy == "reject":
+            print(f"⏭️  Gemini unavailable ({reason}) - rejecting detection")
+            return {"status": "incorrect", "confidence": 0.0, "reason": f"Gemini unavailable: {reason}"}
+
+        print(f"⏭️  Gemini unavailable ({reason}) - accepting detection")
+        return {"status": "correct", "confidence": 0.5, "reason": f"Gemini unavailable: {reason}"}
+
+    def revalidate_deferred(self, callback):
+        """
+        Validate queued detections again while the breaker lets calls through.
+
+        Every attempt goes through generate(), so an open breaker whose reset
+        time has passed lets one trial call through; a success closes it and
+        the rest of the queue follows.
+
+        Args:
+            callback: Called as callback(detection, result) for every re-validated detection
+
+        Returns:
+            int: Number of detections re-validated
+        """
+        done = 0
+        while self.deferred:
+            crop, detection = self.deferred.popleft()
+            try:
+                payload, _, _ = self.prepare_image(crop)
+                prompt = f"""
+{self.get_system_prompt()}
+
+The detected violation type is: "{detection['type']}"
+
+Please analyze this annotated image and validate if the detection is correct.
+"""
+                response = self.generate([prompt, payload])
+            except ValidationUnavailable as e:
+                # Breaker still open or no rate-limit token: try again later
+                print(f"⏸️  Gemini still unavailable ({e}) - keeping {len(self.deferred) + 1} detections queued")
+                self.deferred.appendleft((crop, detection))
+                break
+            except Exception as e:
+                # Still failing: keep it for the next attempt
+                print(f"⚠️  Re-validation failed, keeping detection queued: {e}")
+                self.deferred.appendleft((crop, detection))
+                break
+            try:
+                result = parse_verdict(json.loads(response.text.strip()))
+                # Cached like validate_detection, so the same evidence is not sent again
+                if self.cache is not None:
+                    self.cache.put(detection['type'], perceptual_hash(crop), result)
+            except (json.JSONDecodeError, ValueError):
+                result = verdict_from_text(response.text)
+            callback(detection, result)
+            done += 1
+        return done
+
+    def health(self):
+        """Breaker state, call counters and latency percentiles"""
+        with self._counter_lock:
+            counters = dict(self.counters)
+        return {
+            "breaker_state": self.breaker.state,
+            "breaker_opened": self.breaker.times_opened,
+            "consecutive_failures": self.breaker.consecutive_failures,
+            "latency_ms": self.latency.percentiles(),
+            "deferred": len(self.deferred),
+            **counters,
+        }
+
+    def validate_detection(self, image, violation_type, bbox=None, detection=None):
         """
         Validate a detection using Gemini API
         
         Args:
-            image_path: Path to the annotated image
+            image: Annotated BGR frame (numpy array) or path to the annotated image
             violation_type: Type of violation detected
+            bbox: Optional [x1, y1, x2, y2] of the violation (or a list of boxes);
+                only a padded, downscaled crop around it is sent to Gemini
+            detection: Optional caller's detection dict, kept if the degraded
+                policy queues it for re-validation
             
         Returns:
             dict: Validation result with status, confidence, and reason
         """
-        if not self.model or not self.api_key:
+        if not self.model:
             # If no API key, default to accepting all detections
-            print("⚠️  Gemini API not available - bypassing validation (accepting detection)")
-            return {
-                "status": "correct",
-                "confidence": 1.0,
-                "reason": "Gemini API not configured - accepting detection"
-            }
+            return self.bypass_result()
         
         try:
-            # Load and prepare image
-            image = Image.open(image_path)
+            # Crop, downscale and JPEG-encode in memory
+            payload, crop, _ = self.prepare_image(image, bbox)
+
+            # Reuse the verdict for near-identical evidence
+            image_hash = None
+            if self.cache is not None:
+                image_hash = perceptual_hash(crop)
+                cached = self.cache.get(violation_type, image_hash)
+                if cached is not None:
+                    print(f"♻️  Using cached Gemini verdict for '{violation_type}'")
+                    GEMINI_CALLS.labels(outcome="cached").inc()
+                    return cached
             
             # Create prompt with context
             prompt = f"""
@@ -80,23 +593,18 @@ Please analyze this annotated image and validate if the detection is correct.
             
             print(f"🔍 Calling Gemini API to validate '{violation_type}' detection...")
             # Send to Gemini
-            response = self.model.generate_content([prompt, image])
+            try:
+                response = self.generate([prompt, payload])
+            except ValidationUnavailable as e:
+                return self.degraded_result(str(e), crop, detection or {"type": violation_type, "bbox": bbox})
             print(f"✅ Received response from Gemini API")
             
             # Parse JSON response
             try:
-                result = json.loads(response.text.strip())
-                
-                # Validate response format
-                if not all(key in result for key in ["status", "confidence", "reason"]):
-                    raise ValueError("Invalid response format")
-                
-                if result["status"] not in ["correct", "incorrect"]:
-                    raise ValueError("Invalid status value")
-                
-                if not (0.0 <= result["confidence"] <= 1.0):
-                    raise ValueError("Invalid confidence value")
+                result = parse_verdict(json.loads(response.text.strip()))
                 
+                if image_hash is not None:
+                    self.cache.put(violation_type, image_hash, result)
                 return result
                 
             except (json.JSONDecodeError, ValueError) as e:
@@ -104,32 +612,169 @@ Please analyze this annotated image and validate if the detection is correct.
                 print(f"📄 Raw Gemini response: {response.text}")
                 
                 # Fallback: try to extract status from text
-                response_lower = response.text.lower()
-                if "correct" in response_lower and "incorrect" not in response_lower:
-                    print("🔄 Fallback: Parsed 'correct' from text response")
-                    return {
-                        "status": "correct",
-                        "confidence": 0.7,
-                        "reason": "Parsed from text response"
-                    }
-                else:
-                    print("🔄 Fallback: Parsed 'incorrect' from text response")
-                    return {
-                        "status": "incorrect",
-                        "confidence": 0.7,
-                        "reason": "Parsed from text response"
-                    }
+                return verdict_from_text(response.text)
         
         except Exception as e:
-            print(f"❌ Error validating with Gemini API: {e}")
-            print("🔄 Defaulting to accepting detection due to API error")
-            # On error, default to accepting detection
-            return {
-                "status": "correct",
-                "confidence": 0.5,
-                "reason": f"Validation error: {str(e)}"
-            }
+            return self.error_result(e)
+
+    def validate_detections(self, image, detections):
+        """
+        Validate all detections of one frame with a single Gemini request.
+
+        Args:
+            image: Annotated BGR frame (numpy array) or path to the annotated image
+            detections: List of dicts with 'type' and optional 'bbox' (e.g. violations
+                from find_violations)
+
+        Returns:
+            list: One validation result per detection, in the same order
+        """
+        if not detections:
+            return []
+
+        if len(detections) == 1:
+            detection = detections[0]
+            return [self.validate_detection(image, detection['type'], bbox=detection.get('bbox'),
+                                            detection=detection)]
+
+        if not self.model:
+            return [self.bypass_result() for _ in detections]
+
+        results = [None] * len(detections)
+        hashes = [None] * len(detections)
+        try:
+            frame = self.load_image(image)
+
+            # Reuse verdicts for near-identical evidence, one region per detection
+            if self.cache is not None:
+                for i, detection in enumerate(detections):
+                    crop, _ = crop_for_validation(frame, detection.get('bbox'), self.crop_padding, self.max_side)
+                    hashes[i] = perceptual_hash(crop)
+                    cached = self.cache.get(detection['type'], hashes[i])
+                    if cached is not None:
+                        print(f"♻️  Using cached Gemini verdict for '{detection['type']}'")
+                        GEMINI_CALLS.labels(outcome="cached").inc()
+                        results[i] = cached
+
+            pending = [i for i, result in enumerate(results) if result is None]
+            if not pending:
+                return results
+
+            # One crop covering every detection still to validate
+            boxes = [detections[i]['bbox'] for i in pending if detections[i].get('bbox') is not None]
+            payload, _, (x_offset, y_offset, scale) = self.prepare_image(frame, boxes or None)
+
+            lines = []
+            for number, i in enumerate(pending, 1):
+                line = f'{number}. "{detections[i]["type"]}"'
+                if detections[i].get('bbox') is not None:
+                    x1, y1, x2, y2 = detections[i]['bbox']
+                    line += (f" at [{int((x1 - x_offset) * scale)}, {int((y1 - y_offset) * scale)}, "
+                             f"{int((x2 - x_offset) * scale)}, {int((y2 - y_offset) * scale)}] (x1, y1, x2, y2 in pixels)")
+                lines.append(line)
+            detection_list = "\n".join(lines)
+
+            prompt = f"""
+{self.get_system_prompt(multiple=True)}
+
+The detections to validate are:
+{detection_list}
+
+Please analyze this annotated image and validate each detection.
+"""
+
+            print(f"🔍 Calling Gemini API to validate {len(pending)} detections in one request...")
+            try:
+                response = self.generate([prompt, payload])
+            except ValidationUnavailable as e:
+                for i in pending:
+                    crop, _ = crop_for_validation(frame, detections[i].get('bbox'), self.crop_padding, self.max_side)
+                    results[i] = self.degraded_result(str(e), crop, detections[i])
+                return results
+            print(f"✅ Received response from Gemini API")
+
+            for i, (result, valid) in zip(pending, self.parse_batch_response(response.text, len(pending))):
+                results[i] = result
+                if valid and hashes[i] is not None:
+                    self.cache.put(detections[i]['type'], hashes[i], result)
+            return results
+
+        except Exception as e:
+            # Keep the cached verdicts, accept the rest as for a single detection
+            return [result if result is not None else self.error_result(e) for result in results]
+
+    def parse_batch_response(self, text, count):
+        """
+        Split a multi-detection response into per-detection results.
+
+        Returns:
+            list: (result, valid) per detection, where valid is False when the
+                result came from the text fallback
+        """
+        try:
+            items = json.loads(text.strip())
+            if not isinstance(items, list):
+                raise ValueError("Expected a JSON array")
+        except (json.JSONDecodeError, ValueError) as e:
+            print(f"❌ Error parsing Gemini response: {e}")
+            print(f"📄 Raw Gemini response: {text}")
+            # Same fallback as a single detection, applied to every detection
+            result = verdict_from_text(text)
+            return [(dict(result), False) for _ in range(count)]
+
+        # Match items by their id when given, otherwise by position
+        by_number = {}
+        for position, item in enumerate(items, 1):
+            number = item.get("id", position) if isinstance(item, dict) else position
+            try:
+                by_number.setdefault(int(number), item)
+            except (TypeError, ValueError):
+                by_number.setdefault(position, item)
+
+        parsed = []
+        for number in range(1, count + 1):
+            item = by_number.get(number)
+            try:
+                parsed.append((parse_verdict(item), True))
+            except ValueError as e:
+                print(f"❌ Invalid verdict for detection {number}: {e}")
+                parsed.append((verdict_from_text(json.dumps(item) if item is not None else text), False))
+        return parsed
 
     def is_available(self):
         """Check if Gemini API is available"""
-        return self.model is not None and bool(self.api_key)
+        return self.model is not None
+
+def create_gemini_validator(config, api_key=None, model=None):
+    """Build a GeminiValidator with the cache, payload and resilience settings in app/config.yaml"""
+    validation_config = config.get("validation") or {}
+    cache_config = validation_config.get("cache") or {}
+    payload_config = validation_config.get("payload") or {}
+    resilience_config = validation_config.get("resilience") or {}
+    cache = None
+    if cache_config.get("enabled", False):
+        cache = ValidationCache(
+            max_entries=cache_config.get("max_entries", 1024),
+            ttl_sec=cache_config.get("ttl_sec", 86400),
+            max_distance=cache_config.get("max_distance", 4),
+            path=cache_config.get("path"),
+            save_interval_sec=cache_config.get("save_interval_sec", 30.0),
+        )
+    return GeminiValidator(
+        api_key=api_key,
+        model=model,
+        cache=cache,
+        crop_padding=payload_config.get("crop_padding", 0.25),
+        max_side=payload_config.get("max_side", 512),
+        jpeg_quality=payload_config.get("jpeg_quality", 85),
+        deadline_sec=resilience_config.get("deadline_sec", 15.0),
+        rate_limit_per_sec=resilience_config.get("rate_limit_per_sec"),
+        rate_limit_burst=resilience_config.get("rate_limit_burst", 1),
+        rate_limit_wait_sec=resilience_config.get("rate_limit_wait_sec", 0.5),
+        breaker_failures=resilience_config.get("breaker_failures", 5),
+        breaker_reset_sec=resilience_config.get("breaker_reset_sec", 30.0),
+        degraded_policy=resilience_config.get("degraded_policy", "accept"),
+        max_deferred=resilience_config.get("max_deferred", 500),
+        max_calls_in_flight=resilience_config.get("max_calls_in_flight", 8),
+        api_endpoint=validation_config.get("api_endpoint"),
+    )
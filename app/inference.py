@@ -0,0 +1,448 @@
+"""
+Inference backends for the YOLO detectors.
+
+backend: pytorch       ultralytics + PyTorch on the .pt weights (reference path)
+backend: onnxruntime   ONNX export run with ONNX Runtime on the CPU
+backend: openvino      OpenVINO IR export run with the OpenVINO CPU plugin
+
+The ONNX/OpenVINO files are exported once with ultralytics and cached next to
+the weights (models/best.640.onnx, models/best.640_openvino_model/), so CPU
+nodes only need onnxruntime or openvino, not torch. Pre- and post-processing
+(letterbox, confidence filter, class-aware NMS, box rescaling) follow
+ultralytics' own predict path, and exports are dynamic so frames get the same
+stride-32 rectangular letterbox as PyTorch.
+
+Tolerance against the PyTorch path at the same imgsz (checked by
+`python -m app.inference --check <video>`): every detection has a partner of
+the same class with box corners within TOLERANCE["box_px"] pixels and
+confidence within TOLERANCE["conf"]; only detections whose confidence lies
+within TOLERANCE["conf"] of the threshold may appear on one side only.
+"""
+import abc
+import argparse
+import ast
+import glob
+import os
+import shutil
+import sys
+
+import cv2
+import numpy as np
+
+# Add the project root to Python path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils import load_yaml
+
+BACKENDS = ("pytorch", "onnxruntime", "openvino")
+VARIANTS = ("fp32", "int8")
+TOLERANCE = {"box_px": 2.0, "conf": 0.01}
+LETTERBOX_COLOR = (114, 114, 114)
+MAX_DET = 300
+
+class Boxes:
+    """Detections of one image, laid out like ultralytics Boxes (NumPy arrays)"""
+
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = xyxy  # (N, 4) float32, original image pixels
+        self.conf = conf  # (N,) float32
+        self.cls = cls    # (N,) float32 class ids
+
+    def __len__(self):
+        return len(self.conf)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield Boxes(self.xyxy[i:i + 1], self.conf[i:i + 1], self.cls[i:i + 1])
+
+class Results:
+    """Per-image result with the attributes the detector uses"""
+
+    def __init__(self, boxes, names, orig_shape):
+        self.boxes = boxes
+        self.names = names
+        self.orig_shape = orig_shape
+
+def letterbox(image, new_shape, auto=False, stride=32):
+    """
+    Resize keeping aspect ratio and pad to new_shape (ultralytics LetterBox).
+    With auto=True the padding is only up to the next multiple of stride.
+
+    Returns:
+        np.ndarray: Letterboxed BGR image
+    """
+    h, w = image.shape[:2]
+    r = min(new_shape[0] / h, new_shape[1] / w)
+    new_unpad = (int(round(w * r)), int(round(h * r)))
+    dw, dh = new_shape[1] - new_unpad[0], new_shape[0] - new_unpad[1]
+    if auto:
+        dw, dh = np.mod(dw, stride), np.mod(dh, stride)
+    dw, dh = dw / 2, dh / 2
+    if (w, h) != new_unpad:
+        image = cv2.resize(image, new_unpad, interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+    left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+    return cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=LETTERBOX_COLOR)
+
+def scale_boxes(input_shape, boxes, orig_shape):
+    """Map xyxy boxes from the letterboxed input back to the original image (in place)"""
+    gain = min(input_shape[0] / orig_shape[0], input_shape[1] / orig_shape[1])
+    pad_x = round((input_shape[1] - orig_shape[1] * gain) / 2 - 0.1)
+    pad_y = round((input_shape[0] - orig_shape[0] * gain) / 2 - 0.1)
+    boxes[:, [0, 2]] -= pad_x
+    boxes[:, [1, 3]] -= pad_y
+    boxes /= gain
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, orig_shape[1])
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, orig_shape[0])
+    return boxes
+
+def nms(boxes, scores, iou_threshold):
+    """Greedy NMS (same rule as torchvision.ops.nms). Returns kept indices, best first"""
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort(kind="stable")[::-1]
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        inter = (np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None) *
+                 np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None))
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+def postprocess(prediction, conf, iou, input_shape, orig_shape, max_det=MAX_DET):
+    """
+    Turn one image's raw YOLOv8-style output (4 + num_classes, anchors) into Boxes.
+    """
+    pred = prediction.T  # (anchors, 4 + nc)
+    scores = pred[:, 4:]
+    cls = scores.argmax(1)
+    best = scores[np.arange(len(cls)), cls]
+    mask = best > conf
+    pred, cls, best = pred[mask], cls[mask], best[mask]
+    if not len(best):
+        empty = np.zeros((0,), dtype=np.float32)
+        return Boxes(np.zeros((0, 4), dtype=np.float32), empty, empty)
+
+    cx, cy, w, h = pred[:, 0], pred[:, 1], pred[:, 2], pred[:, 3]
+    boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1).astype(np.float32)
+
+    # Offset boxes by class so NMS never suppresses across classes
+    offsets = cls[:, None].astype(np.float32) * 7680
+    keep = nms(boxes + offsets, best, iou)[:max_det]
+    boxes = scale_boxes(input_shape, boxes[keep], orig_shape)
+    return Boxes(boxes, best[keep].astype(np.float32), cls[keep].astype(np.float32))
+
+class ExportedModel(abc.ABC):
+    """
+    A YOLO detector exported for CPU inference, with predict() shaped like
+    ultralytics' (a list of Results with .boxes) so the detector can use it
+    unchanged.
+    """
+
+    def __init__(self, names, imgsz=640, stride=32, dynamic=True, iou=0.7):
+        self.names = names
+        self.imgsz = imgsz
+        self.stride = stride
+        self.dynamic = dynamic
+        self.iou = iou
+
+    def preprocess(self, frames):
+        images = [letterbox(frame, (self.imgsz, self.imgsz), auto=self.dynamic, stride=self.stride)
+                  for frame in frames]
+        return images
+
+    def predict(self, frames, conf=0.25, **kwargs):
+        if isinstance(frames, np.ndarray):
+            frames = [frames]
+        images = self.preprocess(frames)
+
+        # Frames with the same letterboxed shape run as one batch
+        outputs = [None] * len(frames)
+        groups = {}
+        for i, image in enumerate(images):
+            groups.setdefault(image.shape, []).append(i)
+        for shape, indices in groups.items():
+            batch = np.stack([images[i] for i in indices])[..., ::-1].transpose(0, 3, 1, 2)  # BGR->RGB, NCHW
+            batch = np.ascontiguousarray(batch, dtype=np.float32) / 255.0
+            raw = self.run(batch)
+            for j, i in enumerate(indices):
+                outputs[i] = raw[j]
+
+        return [
+            Results(postprocess(outputs[i], conf, self.iou, images[i].shape[:2], frame.shape[:2]),
+                    self.names, frame.shape[:2])
+            for i, frame in enumerate(frames)
+        ]
+
+    @abc.abstractmethod
+    def run(self, batch):
+        """Run the exported graph on an NCHW float32 batch and return the raw output"""
+
+class OnnxRuntimeModel(ExportedModel):
+    """ONNX export run with ONNX Runtime's CPU execution provider"""
+
+    def __init__(self, path, threads=None, imgsz=640, iou=0.7):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = int(threads)
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        input_shape = self.session.get_inputs()[0].shape
+        self.static_batch = isinstance(input_shape[0], int)
+
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        super().__init__(
+            names=ast.literal_eval(metadata["names"]) if "names" in metadata else {},
+            imgsz=imgsz,
+            stride=int(metadata.get("stride", 32)),
+            dynamic=not isinstance(input_shape[2], int),
+            iou=iou,
+        )
+
+    def run(self, batch):
+        if self.static_batch and len(batch) > 1:
+            return np.concatenate([self.run(batch[i:i + 1]) for i in range(len(batch))])
+        return self.session.run(None, {self.input_name: batch})[0]
+
+class OpenVinoModel(ExportedModel):
+    """OpenVINO IR export compiled for the CPU plugin"""
+
+    def __init__(self, path, threads=None, imgsz=640, iou=0.7):
+        import openvino as ov
+
+        xml_path = glob.glob(os.path.join(path, "*.xml"))[0]
+        core = ov.Core()
+        config = {"PERFORMANCE_HINT": "LATENCY"}
+        if threads:
+            config["INFERENCE_NUM_THREADS"] = int(threads)
+        model = core.read_model(xml_path)
+        self.compiled = core.compile_model(model, "CPU", config)
+        input_shape = model.input(0).get_partial_shape()
+        self.static_batch = input_shape[0].is_static
+
+        metadata_path = os.path.join(path, "metadata.yaml")
+        metadata = load_yaml(metadata_path) if os.path.exists(metadata_path) else {}
+        super().__init__(
+            names=metadata.get("names", {}),
+            imgsz=imgsz,
+            stride=int(metadata.get("stride", 32)),
+            dynamic=input_shape[2].is_dynamic,
+            iou=iou,
+        )
+
+    def run(self, batch):
+        if self.static_batch and len(batch) > 1:
+            return np.concatenate([self.run(batch[i:i + 1]) for i in range(len(batch))])
+        return self.compiled(batch)[self.compiled.output(0)]
+
+class TorchModel:
+    """The reference ultralytics/PyTorch path, with a per-model input size"""
+
+    def __init__(self, path, imgsz=640, threads=None, iou=0.7):
+        from ultralytics import YOLO
+
+        if threads:
+            # PyTorch has one intra-op pool per process, so this is global
+            import torch
+            torch.set_num_threads(int(threads))
+        self.model = YOLO(path)
+        self.imgsz = imgsz
+        self.iou = iou
+
+    @property
+    def names(self):
+        return self.model.names
+
+    def predict(self, frames, conf=0.25, **kwargs):
+        return self.model.predict(frames, conf=conf, imgsz=self.imgsz, iou=self.iou, **kwargs)
+
+def exported_path(weights_path, backend, imgsz):
+    """Cache location of an export, keyed by input size"""
+    root, _ = os.path.splitext(weights_path)
+    if backend == "onnxruntime":
+        return f"{root}.{imgsz}.onnx"
+    return f"{root}.{imgsz}_openvino_model"
+
+def quantized_path(weights_path, imgsz):
+    """Location of the INT8 variant built by quantize_yolo.py"""
+    root, _ = os.path.splitext(weights_path)
+    return f"{root}.{imgsz}.int8.onnx"
+
+def export_model(weights_path, backend, imgsz=640):
+    """
+    Export a .pt model for a CPU backend unless an up-to-date export is cached.
+
+    Returns:
+        str: Path of the exported model (file or OpenVINO directory)
+    """
+    target = exported_path(weights_path, backend, imgsz)
+    if os.path.exists(target) and (not os.path.exists(weights_path) or
+                                   os.path.getmtime(target) >= os.path.getmtime(weights_path)):
+        return target
+
+    from ultralytics import YOLO
+
+    print(f"📦 Exporting {weights_path} for {backend} (imgsz {imgsz})...")
+    export_format = "onnx" if backend == "onnxruntime" else "openvino"
+    exported = YOLO(weights_path).export(format=export_format, imgsz=imgsz, dynamic=True)
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    os.replace(exported, target)
+    print(f"✅ Cached export: {target}")
+    return target
+
+def inference_settings(config):
+    """The `inference` section of app/config.yaml with defaults filled in"""
+    settings = dict(config.get("inference") or {})
+    settings.setdefault("backend", "pytorch")
+    settings.setdefault("iou_threshold", 0.7)
+    settings.setdefault("variant", "fp32")
+    settings.setdefault("models", {})
+    if settings["backend"] not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{settings['backend']}' (expected one of {BACKENDS})")
+    return settings
+
+def load_model(name, weights_path, config, backend=None, variant=None):
+    """
+    Load one detector with the configured (or given) backend and variant.
+
+    The variant is `inference.models.<name>.variant`, else `inference.variant`:
+    "fp32" runs the weights on `backend`, "int8" the quantized ONNX model
+    built by quantize_yolo.py, which always runs on ONNX Runtime.
+    """
+    settings = inference_settings(config)
+    backend = backend or settings["backend"]
+    model_settings = settings["models"].get(name) or {}
+    variant = variant or model_settings.get("variant", settings["variant"])
+    imgsz = model_settings.get("imgsz", 640)
+    threads = model_settings.get("threads")
+    iou = settings["iou_threshold"]
+
+    if variant not in VARIANTS:
+        raise ValueError(f"Unknown model variant '{variant}' for {name} (expected one of {VARIANTS})")
+    if variant == "int8":
+        path = quantized_path(weights_path, imgsz)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"INT8 model not found: {path} (build it with `python quantize_yolo.py`)")
+        print(f"🧮 {name}: INT8 variant {path} on ONNX Runtime")
+        return OnnxRuntimeModel(path, threads=threads, imgsz=imgsz, iou=iou)
+    if backend == "pytorch":
+        return TorchModel(weights_path, imgsz=imgsz, threads=threads, iou=iou)
+    if backend == "openvino":
+        try:
+            import openvino  # noqa: F401
+        except ImportError:
+            print("⚠️ OpenVINO is not installed, falling back to ONNX Runtime")
+            backend = "onnxruntime"
+    path = export_model(weights_path, backend, imgsz)
+    model_class = OnnxRuntimeModel if backend == "onnxruntime" else OpenVinoModel
+    return model_class(path, threads=threads, imgsz=imgsz, iou=iou)
+
+def load_inference_models(model_paths, config, backend=None):
+    """Load every detector in model_paths (name -> .pt path) with one backend"""
+    backend = backend or inference_settings(config)["backend"]
+    print(f"🧠 Inference backend: {backend}")
+    return {name: load_model(name, path, config, backend) for name, path in model_paths.items()}
+
+def box_array(result):
+    """(N, 6) array of x1, y1, x2, y2, conf, cls for either backend's Results"""
+    boxes = result.boxes
+    columns = [np.asarray(getattr(boxes, attr).cpu() if hasattr(getattr(boxes, attr), "cpu") else getattr(boxes, attr),
+                          dtype=np.float32).reshape(len(boxes), -1)
+               for attr in ("xyxy", "conf", "cls")]
+    return np.concatenate(columns, axis=1) if len(boxes) else np.zeros((0, 6), dtype=np.float32)
+
+def compare_results(reference, candidate, conf):
+    """
+    Compare one image's detections of two backends.
+
+    Returns:
+        dict: max box and confidence differences of matched detections and
+        the number of unmatched detections outside the tolerance band
+    """
+    ref, cand = box_array(reference), box_array(candidate)
+    used = set()
+    max_box, max_conf, unmatched = 0.0, 0.0, 0
+    for row in ref:
+        best, best_diff = None, None
+        for j, other in enumerate(cand):
+            if j in used or other[5] != row[5]:
+                continue
+            diff = np.abs(other[:4] - row[:4]).max()
+            if best_diff is None or diff < best_diff:
+                best, best_diff = j, diff
+        if best is not None and best_diff <= TOLERANCE["box_px"] * 4:
+            used.add(best)
+            max_box = max(max_box, float(best_diff))
+            max_conf = max(max_conf, float(abs(cand[best][4] - row[4])))
+        elif row[4] - conf > TOLERANCE["conf"]:
+            unmatched += 1
+    unmatched += sum(1 for j, other in enumerate(cand) if j not in used and other[4] - conf > TOLERANCE["conf"])
+    return {"max_box_px": max_box, "max_conf": max_conf, "unmatched": unmatched}
+
+def check_backend(video_path, config, backend, model_paths, frames=50):
+    """
+    Run the PyTorch path and `backend` on the first frames of a video and
+    report whether they agree within TOLERANCE.
+    """
+    cap = cv2.VideoCapture(video_path)
+    images = []
+    while len(images) < frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        images.append(frame)
+    cap.release()
+    if not images:
+        print(f"❌ Error: Could not read frames from {video_path}")
+        return False
+
+    conf = config["conf_thresholds"]["helmet_triple"]
+    ok = True
+    for name, path in model_paths.items():
+        reference = load_model(name, path, config, backend="pytorch", variant="fp32").predict(images, conf=conf, verbose=False)
+        candidate = load_model(name, path, config, backend=backend).predict(images, conf=conf)
+        stats = [compare_results(r, c, conf) for r, c in zip(reference, candidate)]
+        max_box = max(s["max_box_px"] for s in stats)
+        max_conf = max(s["max_conf"] for s in stats)
+        unmatched = sum(s["unmatched"] for s in stats)
+        passed = max_box <= TOLERANCE["box_px"] and max_conf <= TOLERANCE["conf"] and unmatched == 0
+        ok = ok and passed
+        print(f"{'✅' if passed else '❌'} {name}: max box diff {max_box:.2f}px, "
+              f"max conf diff {max_conf:.4f}, unmatched {unmatched} over {len(images)} frames")
+    return ok
+
+def main():
+    """Export the detectors for a CPU backend and/or check them against PyTorch"""
+    from app.detector import MODEL_PATHS
+
+    parser = argparse.ArgumentParser(description="Export and check CPU inference backends")
+    parser.add_argument("--backend", choices=BACKENDS[1:], default=None,
+                       help="Backend to export/check (default: 'inference.backend' in app/config.yaml)")
+    parser.add_argument("--check", metavar="VIDEO", default=None,
+                       help="Compare the backend with PyTorch on this video")
+    parser.add_argument("--frames", type=int, default=50,
+                       help="Frames to compare (default: 50)")
+    args = parser.parse_args()
+
+    config = load_yaml("app/config.yaml")
+    backend = args.backend or inference_settings(config)["backend"]
+    if backend == "pytorch":
+        parser.error("choose --backend onnxruntime or openvino (PyTorch needs no export)")
+
+    settings = inference_settings(config)
+    for name, path in MODEL_PATHS.items():
+        export_model(path, backend, (settings["models"].get(name) or {}).get("imgsz", 640))
+
+    if args.check and not check_backend(args.check, config, backend, MODEL_PATHS, args.frames):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
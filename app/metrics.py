@@ -0,0 +1,228 @@
+import abc
+import bisect
+import threading
+import weakref
+
+# Prometheus-style metrics for the running detectors, rendered in the text
+# exposition format by the /metrics endpoints of app_flask.py and app/api.py.
+# Updating a metric is a dict lookup plus a short lock, so it can be called on
+# every frame; queue depths are only read when /metrics is scraped.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets in seconds, from a fast model call to a slow Gemini request
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _CounterValue:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name, labels):
+        yield name, labels, self.value
+
+class _GaugeValue:
+    def __init__(self):
+        self.value = 0
+        self.function = None
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        with self._lock:
+            self.value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set_function(self, function):
+        """Read the value from function() at scrape time instead"""
+        self.function = function
+
+    def samples(self, name, labels):
+        yield name, labels, self.function() if self.function is not None else self.value
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot: above the largest bucket
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def samples(self, name, labels):
+        with self._lock:
+            counts, total_sum = list(self.counts), self.sum
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            yield f"{name}_bucket", labels + (("le", _format_value(float(bound))),), cumulative
+        yield f"{name}_sum", labels, total_sum
+        yield f"{name}_count", labels, cumulative
+
+class Metric(abc.ABC):
+    """
+    One metric family with optional labels.
+
+    Unlabelled metrics are updated directly (FRAMES_DECODED.inc()), labelled
+    ones through a child (INFERENCE_LATENCY.labels(model="main").observe(0.03)).
+    """
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None, **options):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.options = options
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    @abc.abstractmethod
+    def _new_child(self):
+        """Return a fresh child holding the value for one label set"""
+
+    def labels(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def samples(self):
+        for key, child in sorted(self._children.items()):
+            yield from child.samples(self.name, tuple(zip(self.labelnames, key)))
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterValue()
+
+    def inc(self, amount=1):
+        self._children[()].inc(amount)
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeValue()
+
+    def set(self, value):
+        self._children[()].set(value)
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def _new_child(self):
+        return _HistogramValue(tuple(self.options.get("buckets", LATENCY_BUCKETS)))
+
+    def observe(self, value):
+        self._children[()].observe(value)
+
+class Registry:
+    """All metrics of the process, in registration order"""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self):
+        """The metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics)
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+def render_metrics():
+    return REGISTRY.render()
+
+# ---------------------------------------------------------------------------
+# Detector metrics
+# ---------------------------------------------------------------------------
+
+FRAMES_DECODED = Counter("traffic_frames_decoded_total", "Frames read from video files, cameras and streams")
+FRAMES_INFERRED = Counter("traffic_frames_inferred_total", "Frames run through the detection models")
+FRAMES_SKIPPED = Counter("traffic_frames_skipped_total", "Frames not inferred, by reason (motion gate, dropped live frames)",
+                         ["reason"])
+INFERENCE_LATENCY = Histogram("traffic_inference_seconds", "Duration of one predict call (a batch of frames) per model",
+                              ["model"])
+VIOLATIONS_DETECTED = Counter("traffic_violations_detected_total", "Violations reported by the detector, per class",
+                              ["type"])
+VALIDATION_VERDICTS = Counter("traffic_validation_verdicts_total", "Gemini verdicts handled by the detector",
+                              ["status"])
+GEMINI_LATENCY = Histogram("traffic_gemini_call_seconds", "Duration of Gemini API calls")
+GEMINI_CALLS = Counter("traffic_gemini_calls_total",
+                       "Gemini validations by outcome "
+                       "(success, error, timeout, rate_limited, short_circuited, saturated, cached)",
+                       ["outcome"])
+DB_WRITE_LATENCY = Histogram("traffic_db_write_seconds", "Duration of one violation insert (a batch of rows)",
+                             ["backend"])
+DB_ROWS_WRITTEN = Counter("traffic_db_rows_written_total", "Violations inserted into the database", ["backend"])
+DB_WRITE_ERRORS = Counter("traffic_db_write_errors_total", "Failed violation inserts", ["backend"])
+QUEUE_DEPTH = Gauge("traffic_queue_depth", "Items waiting in each queue of the detectors", ["queue"])
+
+# queue name -> {owner: depth function}, for queues that come and go with each run
+_watched_queues = {}
+_watched_lock = threading.Lock()
+
+def _queue_depth(queue_name):
+    with _watched_lock:
+        owners = list(_watched_queues[queue_name].items())
+    return sum(depth(owner) for owner, depth in owners)
+
+def watch_queue(queue_name, owner, depth):
+    """
+    Report depth(owner) as traffic_queue_depth{queue=queue_name}, summed over
+    every live owner (e.g. all running pipelines). Owners are held weakly.
+    """
+    with _watched_lock:
+        if queue_name not in _watched_queues:
+            _watched_queues[queue_name] = weakref.WeakKeyDictionary()
+            QUEUE_DEPTH.labels(queue=queue_name).set_function(lambda: _queue_depth(queue_name))
+        _watched_queues[queue_name][owner] = depth
+
+def unwatch_queue(queue_name, owner):
+    """Stop reporting an owner's queue, e.g. once its run has finished"""
+    with _watched_lock:
+        _watched_queues.get(queue_name, {}).pop(owner, None)
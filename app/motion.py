@@ -0,0 +1,92 @@
+import cv2
+
+class MotionGate:
+    """
+    Cheap pre-filter that decides whether a frame is worth running the YOLO
+    models on.
+
+    Frames are converted to small grayscale thumbnails and compared with the
+    thumbnail of the last inferred frame. The motion score is the percentage of
+    thumbnail pixels whose brightness changed by more than `pixel_threshold`.
+    While the scene stays static the gate only re-checks every `stride` frames
+    and doubles the stride up to `max_stride`; any change resets it to 1.
+    A frame is always inferred once `max_skip_frames` frames have been skipped.
+    """
+
+    def __init__(self, diff_threshold=0.5, pixel_threshold=15, downscale_width=64, max_stride=8, max_skip_frames=30):
+        self.diff_threshold = diff_threshold
+        self.pixel_threshold = pixel_threshold
+        self.downscale_width = downscale_width
+        self.max_stride = max(1, int(max_stride))
+        self.max_skip_frames = max(0, int(max_skip_frames))
+
+        self.frames_inferred = 0
+        self.frames_skipped = 0
+        self.last_score = 0.0
+
+        self._reference = None
+        self._stride = 1
+        self._since_check = 0
+        self._since_infer = 0
+
+    def _thumbnail(self, frame):
+        h, w = frame.shape[:2]
+        size = (self.downscale_width, max(1, round(h * self.downscale_width / w)))
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (3, 3), 0)
+
+    def should_infer(self, frame):
+        """Return True if the models should run on this frame"""
+        self._since_check += 1
+        self._since_infer += 1
+
+        forced = self._since_infer > self.max_skip_frames
+        if not forced and self._reference is not None and self._since_check < self._stride:
+            return self._skip()
+
+        self._since_check = 0
+        small = self._thumbnail(frame)
+
+        if self._reference is None or forced:
+            return self._infer(small)
+
+        changed = cv2.absdiff(small, self._reference) > self.pixel_threshold
+        self.last_score = 100.0 * float(changed.mean())
+        if self.last_score >= self.diff_threshold:
+            self._stride = 1
+            return self._infer(small)
+
+        # Static scene: back off and look less often
+        self._stride = min(self._stride * 2, self.max_stride)
+        return self._skip()
+
+    def _infer(self, small):
+        self._reference = small
+        self._since_infer = 0
+        self.frames_inferred += 1
+        return True
+
+    def _skip(self):
+        self.frames_skipped += 1
+        return False
+
+    def summary(self):
+        """Counts of inferred vs skipped frames for the end-of-run report"""
+        total = self.frames_inferred + self.frames_skipped
+        skipped_pct = 100.0 * self.frames_skipped / total if total else 0.0
+        return f"{self.frames_inferred} inferred, {self.frames_skipped} skipped ({skipped_pct:.1f}% skipped)"
+
+def create_motion_gate(config):
+    """Build a MotionGate from app/config.yaml, or None if gating is disabled"""
+    gate_config = config.get("motion_gate") or {}
+    if not gate_config.get("enabled", False):
+        return None
+    return MotionGate(
+        diff_threshold=gate_config.get("diff_threshold", 0.5),
+        pixel_threshold=gate_config.get("pixel_threshold", 15),
+        downscale_width=gate_config.get("downscale_width", 64),
+        max_stride=gate_config.get("max_stride", 8),
+        max_skip_frames=gate_config.get("max_skip_frames", 30),
+    )
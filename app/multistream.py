@@ -0,0 +1,297 @@
+import cv2
+import time
+import sys
+import argparse
+import os
+import queue
+import threading
+
+# Add the project root to Python path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.storage import init_db
+from app.utils import load_yaml
+from app.gemini_validator import create_gemini_validator
+from app.motion import create_motion_gate
+from app.tracker import create_violation_tracker
+from app.async_validator import create_validation_pool
+from app.clips import create_clip_recorder
+from app.detector import load_models, create_postprocessor, predict_batch, find_violations, record_violations, handle_validation_result, finish_validation
+from app.metrics import FRAMES_DECODED, FRAMES_SKIPPED, watch_queue, unwatch_queue
+
+_SKIPPED_BY_GATE = FRAMES_SKIPPED.labels(reason="motion")
+_DROPPED = FRAMES_SKIPPED.labels(reason="dropped")
+
+def open_source(source):
+    """Open a camera index, video file or RTSP/HTTP URL with OpenCV"""
+    if isinstance(source, int) or str(source).isdigit():
+        return cv2.VideoCapture(int(source)), True
+    source = str(source)
+    is_live = source.lower().startswith(("rtsp://", "rtmp://", "http://", "https://"))
+    return cv2.VideoCapture(source), is_live
+
+class StreamReader:
+    """
+    Decoder thread for one source, feeding a small bounded queue.
+
+    Live sources (cameras, network streams) drop their oldest frame when the
+    scheduler falls behind so they stay real time; file sources block instead,
+    so every frame of a file is processed in order.
+    """
+
+    def __init__(self, stream_id, source, queue_size=4, gate=None, tracker=None, config=None):
+        self.stream_id = stream_id
+        self.source = source
+        self.cap, self.is_live = open_source(source)
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.gate = gate
+        self.finished = False
+
+        # Per-stream state used by the scheduler
+        self.tracker = tracker
+        self.clip_recorder = create_clip_recorder(config or {}, self.cap.get(cv2.CAP_PROP_FPS))
+        self.frames_decoded = 0
+        self.frames_dropped = 0
+        self.frames_processed = 0
+        self.violations_detected = 0
+        self.start_time = time.time()
+
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._read_loop, name=f"stream-{stream_id}", daemon=True)
+
+    def is_opened(self):
+        return self.cap.isOpened()
+
+    def start(self):
+        self.start_time = time.time()
+        self._thread.start()
+        watch_queue("stream", self, lambda stream: stream.frames.qsize())
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join(timeout=5)
+        self.cap.release()
+        unwatch_queue("stream", self)
+
+    def close_clips(self):
+        """Finish this stream's clip evidence (after validation has finished)"""
+        if self.clip_recorder is not None:
+            self.clip_recorder.close()
+
+    def _read_loop(self):
+        while not self._stop_event.is_set():
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            self.frames_decoded += 1
+            FRAMES_DECODED.inc()
+            infer = self.gate is None or self.gate.should_infer(frame)
+            if not infer:
+                _SKIPPED_BY_GATE.inc()
+            item = (time.time(), frame, infer)
+
+            if self.is_live:
+                # Keep the newest frames: drop the oldest one if the queue is full
+                while True:
+                    try:
+                        self.frames.put_nowait(item)
+                        break
+                    except queue.Full:
+                        try:
+                            self.frames.get_nowait()
+                            self.frames_dropped += 1
+                            _DROPPED.inc()
+                        except queue.Empty:
+                            pass
+            else:
+                while not self._stop_event.is_set():
+                    try:
+                        self.frames.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+        self.finished = True
+
+    def exhausted(self):
+        """True once the source has ended and every decoded frame was taken"""
+        return self.finished and self.frames.empty()
+
+    def stats(self):
+        elapsed = time.time() - self.start_time
+        return {
+            "source": str(self.source),
+            "frames_decoded": self.frames_decoded,
+            "frames_processed": self.frames_processed,
+            "frames_dropped": self.frames_dropped,
+            "fps": round(self.frames_processed / elapsed, 2) if elapsed > 0 else 0.0,
+            "violations_detected": self.violations_detected,
+            "motion_gate": self.gate.summary() if self.gate is not None else None,
+        }
+
+def next_batch(streams, batch_size, start):
+    """
+    Take frames from the streams round-robin (one per stream per pass, starting
+    at a rotating offset) until the batch is full or no stream has a frame ready.
+    """
+    batch = []
+    while len(batch) < batch_size:
+        took_any = False
+        for i in range(len(streams)):
+            stream = streams[(start + i) % len(streams)]
+            if len(batch) >= batch_size:
+                break
+            try:
+                ts, frame, infer = stream.frames.get_nowait()
+            except queue.Empty:
+                continue
+            batch.append((stream, ts, frame, infer))
+            took_any = True
+        if not took_any:
+            break
+    return batch
+
+def process_streams(sources, duration_seconds=None, show_display=True, models=None, gemini_validator=None):
+    """
+    Process several video sources with one shared set of loaded models.
+
+    Frames from all sources are scheduled fairly and batched across streams;
+    tracking state and FPS statistics are kept per stream.
+
+    Returns:
+        dict: Per-stream statistics, or False if no source could be opened
+    """
+
+    # Initialize DB
+    init_db()
+
+    # Load config and fines
+    config = load_yaml("app/config.yaml")
+    fines = load_yaml("app/fines.yaml")
+
+    # Initialize Gemini validator
+    if gemini_validator is None:
+        gemini_validator = create_gemini_validator(config)
+
+    # Load all YOLO models once, shared by every stream
+    if models is None:
+        models = load_models()
+
+    # Class-id -> violation-key tables used to post-process every frame
+    postprocessor = create_postprocessor(models, fines)
+
+    batch_size = max(1, int(config.get("batch_size", 1)))
+    queue_size = config.get("pipeline_queue_size", 8)
+
+    streams = []
+    for i, source in enumerate(sources):
+        stream = StreamReader(i, source, queue_size=queue_size, gate=create_motion_gate(config),
+                              tracker=create_violation_tracker(config), config=config)
+        if not stream.is_opened():
+            print(f"❌ Error: Could not open source: {source}")
+            stream.cap.release()
+            stream.close_clips()
+            continue
+        streams.append(stream)
+
+    if not streams:
+        return False
+
+    # Optional background Gemini validation shared by all streams
+    validation_pool = create_validation_pool(config, gemini_validator, handle_validation_result)
+
+    print(f"🎥 Processing {len(streams)} streams (batch size: {batch_size})")
+    for stream in streams:
+        stream.start()
+
+    start_time = time.time()
+    rotation = 0
+    stopped = False
+
+    try:
+        while not stopped:
+            if duration_seconds and time.time() - start_time > duration_seconds:
+                print(f"⏰ Detection duration ({duration_seconds}s) completed.")
+                break
+
+            if all(stream.exhausted() for stream in streams):
+                print("✅ All streams ended.")
+                break
+
+            batch = next_batch(streams, batch_size, rotation)
+            rotation = (rotation + 1) % len(streams)
+            if not batch:
+                time.sleep(0.005)
+                continue
+
+            # One batched predict call per model across all streams
+            to_infer = [frame for _, _, frame, infer in batch if infer]
+            inferred = iter(predict_batch(models, to_infer, config) if to_infer else [])
+
+            for stream, ts, frame, infer in batch:
+                stream.frames_processed += 1
+                if not infer:
+                    frame_results = None
+                else:
+                    frame_results = next(inferred)
+
+                violations_in_frame = []
+                if frame_results is not None:
+                    violations_in_frame = find_violations(
+                        frame, frame_results, postprocessor, fines, stream.tracker
+                    )
+
+                if stream.clip_recorder is not None:
+                    stream.clip_recorder.push(frame)
+
+                if violations_in_frame:
+                    stream.violations_detected += 1
+                    record_violations(frame, violations_in_frame, gemini_validator,
+                                      prefix=f"stream{stream.stream_id}_annotated",
+                                      validation_pool=validation_pool,
+                                      clip_recorder=stream.clip_recorder)
+
+                if show_display:
+                    cv2.imshow(f"Detection (Stream {stream.stream_id})", frame)
+                    if cv2.waitKey(1) & 0xFF == ord("q"):
+                        stopped = True
+                        break
+    finally:
+        for stream in streams:
+            stream.stop()
+        finish_validation(gemini_validator, validation_pool,
+                          clip_recorders=[stream.clip_recorder for stream in streams])
+        if show_display:
+            cv2.destroyAllWindows()
+
+    stats = [stream.stats() for stream in streams]
+    for stream_stats in stats:
+        print(f"📊 {stream_stats['source']}: {stream_stats['frames_processed']} frames, "
+              f"{stream_stats['fps']} FPS, {stream_stats['frames_dropped']} dropped, "
+              f"{stream_stats['violations_detected']} violations")
+    print(f"Total violations detected: {sum(s['violations_detected'] for s in stats)}")
+    return {"streams": stats, "elapsed_sec": round(time.time() - start_time, 2)}
+
+def main():
+    """Main function to handle command line arguments"""
+    parser = argparse.ArgumentParser(description="Multi-stream Traffic Violation Detection")
+    parser.add_argument("sources", nargs="*",
+                       help="Camera indices, video files or RTSP URLs (default: 'streams' in app/config.yaml)")
+    parser.add_argument("--duration", type=int, default=None,
+                       help="Stop after this many seconds (default: run until all sources end)")
+    parser.add_argument("--no-display", action="store_true",
+                       help="Run without GUI display")
+
+    args = parser.parse_args()
+
+    sources = args.sources or load_yaml("app/config.yaml").get("streams") or []
+    if not sources:
+        parser.error("no sources given and no 'streams' configured in app/config.yaml")
+
+    success = process_streams(sources, args.duration, not args.no_display)
+
+    if not success:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import queue
+import threading
+import time
+
+from app.metrics import FRAMES_DECODED, FRAMES_SKIPPED, watch_queue, unwatch_queue
+
+# Marks the end of the stream inside the stage queues
+_END = object()
+
+_SKIPPED_BY_GATE = FRAMES_SKIPPED.labels(reason="motion")
+
+class FramePipeline:
+    """
+    Staged detection pipeline with bounded queues between the stages:
+
+        decoder thread -> decode queue -> inference thread -> result queue -> caller
+
+    The caller iterates over the pipeline and does post-processing and evidence
+    handling, so a slow Gemini call or disk write no longer stalls decoding and
+    inference (until the bounded queues fill up). Each stage is a single thread
+    reading a FIFO queue, so frames always come out in decode order.
+    """
+
+    def __init__(self, cap, infer_fn, batch_size=1, queue_size=8, should_stop=None, gate=None):
+        """
+        Args:
+            cap: Opened cv2.VideoCapture (or anything with a read() method)
+            infer_fn: Callable taking a list of frames and returning one result per frame
+            batch_size: Number of frames passed to infer_fn at once
+            queue_size: Maximum number of items waiting in each stage queue
+            should_stop: Optional callable polled by the decoder to end the stream early
+            gate: Optional MotionGate; frames it rejects skip inference and
+                come out of the pipeline with None results
+        """
+        self.cap = cap
+        self.infer_fn = infer_fn
+        self.batch_size = max(1, int(batch_size))
+        self.should_stop = should_stop
+        self.gate = gate
+        self.decode_queue = queue.Queue(maxsize=queue_size)
+        self.result_queue = queue.Queue(maxsize=queue_size)
+        self.peak_depths = {"decode": 0, "inference": 0}
+        self.frames_decoded = 0
+        self.error = None
+        self._stop_event = threading.Event()
+        self._threads = []
+
+    def start(self):
+        """Start the decoder and inference threads"""
+        self._threads = [
+            threading.Thread(target=self._decode_loop, name="decoder", daemon=True),
+            threading.Thread(target=self._inference_loop, name="inference", daemon=True),
+        ]
+        watch_queue("decode", self, lambda pipeline: pipeline.decode_queue.qsize())
+        watch_queue("inference", self, lambda pipeline: pipeline.result_queue.qsize())
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        """Ask the stages to stop and wait for them to exit"""
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        unwatch_queue("decode", self)
+        unwatch_queue("inference", self)
+
+    def queue_depths(self):
+        """Current number of items waiting in front of each stage"""
+        return {
+            "decode": self.decode_queue.qsize(),        # frames waiting for inference
+            "inference": self.result_queue.qsize(),     # results waiting for post-processing
+        }
+
+    def __iter__(self):
+        """Yield (frame_index, timestamp, frame, results) in decode order"""
+        while True:
+            try:
+                item = self.result_queue.get(timeout=0.1)
+            except queue.Empty:
+                if self._stop_event.is_set():
+                    break
+                continue
+            if item is _END:
+                break
+            yield item
+
+        if self.error is not None:
+            raise self.error
+
+    def _put(self, q, item, stage):
+        """Blocking put that gives up once the pipeline is stopped"""
+        while not self._stop_event.is_set():
+            try:
+                q.put(item, timeout=0.1)
+            except queue.Full:
+                continue
+            depth = q.qsize()
+            if depth > self.peak_depths[stage]:
+                self.peak_depths[stage] = depth
+            return True
+        return False
+
+    def _decode_loop(self):
+        try:
+            while not self._stop_event.is_set():
+                if self.should_stop and self.should_stop():
+                    break
+                ret, frame = self.cap.read()
+                if not ret:
+                    break
+                FRAMES_DECODED.inc()
+                infer = self.gate is None or self.gate.should_infer(frame)
+                if not infer:
+                    _SKIPPED_BY_GATE.inc()
+                item = (self.frames_decoded, time.time(), frame, infer)
+                if not self._put(self.decode_queue, item, "decode"):
+                    return
+                self.frames_decoded += 1
+        except Exception as e:
+            self.error = e
+        self._put(self.decode_queue, _END, "decode")
+
+    def _inference_loop(self):
+        try:
+            finished = False
+            while not finished and not self._stop_event.is_set():
+                # Gather up to batch_size decoded frames
+                batch = []
+                while len(batch) < self.batch_size:
+                    try:
+                        item = self.decode_queue.get(timeout=0.1)
+                    except queue.Empty:
+                        if self._stop_event.is_set():
+                            return
+                        continue
+                    if item is _END:
+                        finished = True
+                        break
+                    batch.append(item)
+
+                if not batch:
+                    break
+
+                # Only frames that passed the motion gate go through the models
+                to_infer = [frame for _, _, frame, infer in batch if infer]
+                inferred = iter(self.infer_fn(to_infer) if to_infer else [])
+                for index, ts, frame, infer in batch:
+                    frame_results = next(inferred) if infer else None
+                    if not self._put(self.result_queue, (index, ts, frame, frame_results), "inference"):
+                        return
+        except Exception as e:
+            self.error = e
+        self._put(self.result_queue, _END, "inference")
@@ -0,0 +1,97 @@
+import weakref
+
+import numpy as np
+
+# Vectorized post-processing of YOLO results: whole boxes.cls / boxes.xyxy
+# arrays are mapped to violation keys through a class-id lookup table built
+# once per model, so a frame costs a few NumPy operations per model instead
+# of Python work per box.
+
+EMPTY_BOXES = np.empty((0, 4), dtype=np.float32)
+
+def to_numpy(values):
+    """NumPy view of a result tensor (PyTorch on any device) or array"""
+    if hasattr(values, "cpu"):
+        values = values.cpu().numpy()
+    return np.asarray(values)
+
+def class_table(names, keys, key_of):
+    """
+    Lookup table from class id to violation key.
+
+    Args:
+        names: Model class names, {class id: name}
+        keys: Violation keys, in output order
+        key_of: Callable (class id, class name) -> violation key or None
+
+    Returns:
+        np.ndarray: Index into `keys` for each class id, -1 for classes that are not violations
+    """
+    size = max(names) + 1 if names else 0
+    table = np.full(size, -1, dtype=np.int64)
+    positions = {key: i for i, key in enumerate(keys)}
+    for cls_id in range(size):
+        key = key_of(cls_id, names.get(cls_id))
+        if key in positions:
+            table[cls_id] = positions[key]
+    return table
+
+def key_indices(boxes, table):
+    """Violation key index of every box (-1 if its class is not a violation)"""
+    cls = to_numpy(boxes.cls).astype(np.int64).reshape(-1)
+    indices = np.full(len(cls), -1, dtype=np.int64)
+    known = (cls >= 0) & (cls < len(table))
+    indices[known] = table[cls[known]]
+    return indices
+
+class ViolationPostProcessor:
+    """
+    Turns one frame's results of every model into the candidate boxes of each
+    violation key. Build it once after loading the models (see detector.py).
+    """
+
+    def __init__(self, models, keys, key_rules):
+        """
+        Args:
+            models: Dict of loaded models with a `names` attribute
+            keys: Violation keys to report, in output order
+            key_rules: Model name -> callable (class id, class name) -> violation key or None
+        """
+        self.keys = list(keys)
+        self.tables = {
+            name: class_table(model.names, self.keys, key_rules[name])
+            for name, model in models.items() if name in key_rules
+        }
+
+    def candidates(self, frame_results):
+        """
+        Returns:
+            dict: Violation key -> (N, 4) float32 array of xyxy boxes, for every key
+        """
+        found = [[] for _ in self.keys]
+        for name, table in self.tables.items():
+            boxes = frame_results[name].boxes
+            if not len(boxes):
+                continue
+            indices = key_indices(boxes, table)
+            matched = indices >= 0
+            if not matched.any():
+                continue
+            xyxy = to_numpy(boxes.xyxy).astype(np.float32).reshape(-1, 4)
+            for k in np.unique(indices[matched]):
+                found[k].append(xyxy[indices == k])
+        return {
+            key: np.concatenate(parts) if len(parts) > 1 else (parts[0] if parts else EMPTY_BOXES)
+            for key, parts in zip(self.keys, found)
+        }
+
+# Tables for process_frame, which gets its models per call: model -> (fines keys, table)
+_name_tables = weakref.WeakKeyDictionary()
+
+def class_name_table(model, names, keys):
+    """Cached class-id table for violations keyed by class name (as in fines.yaml)"""
+    keys = tuple(keys)
+    cached = _name_tables.get(model)
+    if cached is None or cached[0] != keys:
+        cached = _name_tables[model] = (keys, class_table(names, keys, lambda cls_id, cls_name: cls_name))
+    return cached[1]
@@ -4,34 +4,75 @@ import yaml
 import sys
 import argparse
 import os
-from ultralytics import YOLO
-from collections import defaultdict
-from pathlib import Path
 
 # Add the project root to Python path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.dbsql import init_db, insert_violation
+from app.storage import init_db
 from app.utils import load_yaml
-from app.gemini_validator import GeminiValidator
-
-def process_video(video_path, show_display=True):
-    """Process video for traffic violations detection"""
+from app.gemini_validator import create_gemini_validator
+from app.pipeline import FramePipeline
+from app.motion import create_motion_gate
+from app.tracker import create_violation_tracker
+from app.async_validator import create_validation_pool
+from app.clips import create_clip_recorder
+from app.detector import load_models, create_postprocessor, predict_batch, find_violations, record_violations, handle_validation_result, finish_validation
+
+# Minimum number of seconds between two progress reports
+PROGRESS_INTERVAL_SEC = 0.5
+
+def make_progress(frames_processed, total_frames, violations_detected, start_time):
+    """Build the structured progress report sent to progress callbacks"""
+    elapsed = time.time() - start_time
+    fps = frames_processed / elapsed if elapsed > 0 else 0.0
+    eta_sec = None
+    if total_frames > 0 and fps > 0:
+        eta_sec = max(total_frames - frames_processed, 0) / fps
+    return {
+        "frames_processed": frames_processed,
+        "total_frames": total_frames if total_frames > 0 else None,
+        "percent": round(100.0 * frames_processed / total_frames, 1) if total_frames > 0 else None,
+        "fps": round(fps, 2),
+        "violations_detected": violations_detected,
+        "elapsed_sec": round(elapsed, 1),
+        "eta_sec": round(eta_sec, 1) if eta_sec is not None else None,
+    }
+
+def process_video(video_path, show_display=True, models=None, gemini_validator=None, progress_callback=None):
+    """
+    Process video for traffic violations detection
+
+    Args:
+        video_path: Path to the video file
+        show_display: Show the annotated frames in a window
+        models: Already loaded YOLO models (see detector.load_models); loaded here if None
+        gemini_validator: Already initialized GeminiValidator; created here if None
+        progress_callback: Optional callable receiving a progress dict (see make_progress)
+
+    Returns:
+        dict: Run summary, or False if the video could not be opened
+    """
     
     # Initialize DB
     init_db()
     
-    # Initialize Gemini validator
-    gemini_validator = GeminiValidator()
-
     # Load config and fines
     config = load_yaml("app/config.yaml")
     fines = load_yaml("app/fines.yaml")
 
+    # Initialize Gemini validator
+    if gemini_validator is None:
+        gemini_validator = create_gemini_validator(config)
+
     # Load all YOLO models
-    main_model = YOLO("models/best.pt")  # Original model
-    helmet_model = YOLO("models/helmet_triple_best.pt")  # Helmet and triple riding model
-    seatbelt_model = YOLO("models/seatbelt_best.pt")  # Seatbelt model
+    if models is None:
+        models = load_models()
+
+    # Class-id -> violation-key tables used to post-process every frame
+    postprocessor = create_postprocessor(models, fines)
+
+    # Optional motion gate that skips inference on static frames
+    motion_gate = create_motion_gate(config)
 
     cap = cv2.VideoCapture(video_path)
     
@@ -39,161 +80,93 @@ def process_video(video_path, show_display=True):
         print(f"❌ Error: Could not open video file: {video_path}")
         return False
 
-    last_detection_time = defaultdict(float)
-    cooldown_sec = config["cooldown_sec"]
+    # Optional background Gemini validation (confirmed violations are stored as they finish)
+    validation_pool = create_validation_pool(config, gemini_validator, handle_validation_result)
+
+    # Each tracked object is reported at most once per violation class
+    tracker = create_violation_tracker(config)
+
+    # Optional pre/post-event clip evidence from a fixed-size frame buffer
+    clip_recorder = create_clip_recorder(config, cap.get(cv2.CAP_PROP_FPS))
+    batch_size = max(1, int(config.get("batch_size", 1)))
     
-    print(f"🎥 Processing video: {video_path}")
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    print(f"🎥 Processing video: {video_path} (batch size: {batch_size})")
     violations_detected = 0
+    frames_processed = 0
+    start_time = time.time()
+    last_progress_time = 0.0
+
+    # Decoder and inference run on their own threads; post-processing,
+    # Gemini validation and DB writes happen here, in decode order
+    pipeline = FramePipeline(
+        cap,
+        lambda frames: predict_batch(models, frames, config),
+        batch_size=batch_size,
+        queue_size=config.get("pipeline_queue_size", 8),
+        gate=motion_gate,
+    ).start()
+
+    try:
+        for frame_index, ts, frame, frame_results in pipeline:
+            frames_processed += 1
+
+            # Frames rejected by the motion gate have no results
+            violations_in_frame = []
+            if frame_results is not None:
+                violations_in_frame = find_violations(
+                    frame, frame_results, postprocessor, fines, tracker
+                )
+
+            if clip_recorder is not None:
+                clip_recorder.push(frame)
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
+            # If any violation detected, save the full annotated frame and validate with Gemini
+            if violations_in_frame:
+                violations_detected += 1
+                record_violations(frame, violations_in_frame, gemini_validator, prefix="annotated",
+                                  validation_pool=validation_pool, clip_recorder=clip_recorder)
+
+            if frames_processed % 100 == 0:
+                print(f"📊 Frame {frame_index}: queue depths {pipeline.queue_depths()}")
+
+            if progress_callback and time.time() - last_progress_time >= PROGRESS_INTERVAL_SEC:
+                last_progress_time = time.time()
+                progress_callback(make_progress(frames_processed, total_frames, violations_detected, start_time))
+
+            # Only show display if requested (for standalone use)
+            if show_display:
+                cv2.imshow("Detection (Video)", frame)
+                if cv2.waitKey(1) & 0xFF == ord("q"):
+                    break
+        else:
             print("✅ End of video reached.")
-            break
-
-        now = time.time()
-
-        # Run detection with all models
-        main_results = main_model.predict(frame, conf=config["conf_thresholds"]["helmet_triple"])
-        helmet_results = helmet_model.predict(frame, conf=config["conf_thresholds"]["helmet_triple"])
-        seatbelt_results = seatbelt_model.predict(frame, conf=config["conf_thresholds"]["helmet_triple"])
-
-        detected = False  # Flag to check if any violation is detected
-        violations_in_frame = []  # Store all violations detected in this frame
-
-        # Process main model results (original violations)
-        for r in main_results:
-            for box in r.boxes:
-                cls_id = int(box.cls[0])  # since model has only one class
-                cls_name = str(cls_id)    # treat it as "0"
-
-                if cls_name not in fines:
-                    continue
-
-                if now - last_detection_time[cls_name] < cooldown_sec:
-                    continue
-
-                last_detection_time[cls_name] = now
-
-                # Draw bounding box and label on the frame
-                xyxy = box.xyxy[0].tolist()
-                x1, y1, x2, y2 = map(int, xyxy)
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
-                cv2.putText(frame, "No helmet", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 255), 2)
-
-                violations_in_frame.append({
-                    'type': 'No helmet',
-                    'fine': fines[cls_name]
-                })
-                detected = True
-
-        # Process helmet model results (triple riding and helmetless)
-        for r in helmet_results:
-            for box in r.boxes:
-                cls_id = int(box.cls[0])
-                # Get class names from the model
-                class_names = helmet_model.names
-                cls_name = class_names[cls_id] if cls_id in class_names else str(cls_id)
-                
-                # Only process triple riding violations from this model
-                if cls_name.lower() == 'triple riding':
-                    violation_key = 'triple riding'
-                    
-                    if violation_key not in fines:
-                        continue
-
-                    if now - last_detection_time[violation_key] < cooldown_sec:
-                        continue
-
-                    last_detection_time[violation_key] = now
-
-                    # Draw bounding box and label on the frame
-                    xyxy = box.xyxy[0].tolist()
-                    x1, y1, x2, y2 = map(int, xyxy)
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), (255, 0, 0), 2)  # Blue for triple riding
-                    cv2.putText(frame, "Triple Riding", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 0, 0), 2)
-
-                    violations_in_frame.append({
-                        'type': 'Triple Riding',
-                        'fine': fines[violation_key]
-                    })
-                    detected = True
-
-        # Process seatbelt model results
-        for r in seatbelt_results:
-            for box in r.boxes:
-                cls_id = int(box.cls[0])
-                # Get class names from the model
-                class_names = seatbelt_model.names
-                cls_name = class_names[cls_id] if cls_id in class_names else str(cls_id)
-                
-                # Process No-seat-belt violations from this model
-                if cls_name.lower() == 'no-seat-belt' or cls_name == 'No-seat-belt':
-                    violation_key = 'No-seat-belt'
-                    
-                    if violation_key not in fines:
-                        continue
-
-                    if now - last_detection_time[violation_key] < cooldown_sec:
-                        continue
-
-                    last_detection_time[violation_key] = now
-
-                    # Draw bounding box and label on the frame
-                    xyxy = box.xyxy[0].tolist()
-                    x1, y1, x2, y2 = map(int, xyxy)
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)  # Green for seatbelt
-                    cv2.putText(frame, "No Seatbelt", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-
-                    violations_in_frame.append({
-                        'type': 'No-seat-belt',
-                        'fine': fines[violation_key]
-                    })
-                    detected = True
-
-        # If any violation detected, save the full annotated frame and validate with Gemini
-        if detected:
-            violations_detected += 1
-            img_name = f"annotated_{int(time.time()*1000)}.jpg"
-            img_path = str(Path("crops") / img_name)
-            Path("crops").mkdir(parents=True, exist_ok=True)
-            cv2.imwrite(img_path, frame)
-
-            # Validate and save each violation to DB
-            for violation in violations_in_frame:
-                # Validate detection with Gemini
-                validation_result = gemini_validator.validate_detection(
-                    img_path, violation['type']
-                )
-                
-                print(f"Gemini validation for {violation['type']}: {validation_result['status']} (confidence: {validation_result['confidence']:.2f})")
-                print(f"Reason: {validation_result['reason']}")
-                
-                # Only save to DB if validation is correct
-                if validation_result['status'] == 'correct':
-                    insert_violation(
-                        file_path=img_path,
-                        violation_type=violation['type'],
-                        fine=violation['fine']
-                    )
-                    print(f"✅ Violation saved to database: {violation['type']}")
-                else:
-                    print(f"❌ Violation rejected by Gemini: {violation['type']}")
-                    # Optionally, you could save rejected detections to a separate folder
-                    # for manual review later
-
-        # Only show display if requested (for standalone use)
-        if show_display:
-            cv2.imshow("Detection (Video)", frame)
-            if cv2.waitKey(1) & 0xFF == ord("q"):
-                break
+    finally:
+        pipeline.stop()
+        finish_validation(gemini_validator, validation_pool, clip_recorders=[clip_recorder])
 
     cap.release()
     if show_display:
         cv2.destroyAllWindows()
     
+    elapsed = time.time() - start_time
+    fps = frames_processed / elapsed if elapsed > 0 else 0.0
+    if progress_callback:
+        progress_callback(make_progress(frames_processed, total_frames, violations_detected, start_time))
+
+    print(f"⏱️  Processed {frames_processed} frames in {elapsed:.1f}s ({fps:.1f} FPS)")
+    print(f"📊 Peak queue depths: {pipeline.peak_depths}")
+    if motion_gate is not None:
+        print(f"🏃 Motion gate: {motion_gate.summary()}")
     print(f"Total violations detected: {violations_detected}")
-    return True
+    return {
+        "video_path": video_path,
+        "frames_processed": frames_processed,
+        "violations_detected": violations_detected,
+        "elapsed_sec": round(elapsed, 2),
+        "fps": round(fps, 2),
+    }
 
 def main():
     """Main function to handle command line arguments"""
@@ -4,16 +4,19 @@ import yaml
 import sys
 import argparse
 import os
-from ultralytics import YOLO
-from collections import defaultdict
-from pathlib import Path
 
 # Add the project root to Python path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.dbsql import init_db, insert_violation
+from app.storage import init_db
 from app.utils import load_yaml
-from app.gemini_validator import GeminiValidator
+from app.gemini_validator import create_gemini_validator
+from app.pipeline import FramePipeline
+from app.motion import create_motion_gate
+from app.tracker import create_violation_tracker
+from app.async_validator import create_validation_pool
+from app.clips import create_clip_recorder
+from app.detector import load_models, create_postprocessor, predict_batch, find_violations, record_violations, handle_validation_result, finish_validation
 
 def process_webcam(duration_seconds=30, show_display=True):
     """Process webcam feed for traffic violations detection"""
@@ -21,17 +24,21 @@ def process_webcam(duration_seconds=30, show_display=True):
     # Initialize DB
     init_db()
     
-    # Initialize Gemini validator
-    gemini_validator = GeminiValidator()
-
     # Load config and fines
     config = load_yaml("app/config.yaml")
     fines = load_yaml("app/fines.yaml")
 
+    # Initialize Gemini validator
+    gemini_validator = create_gemini_validator(config)
+
     # Load all YOLO models
-    main_model = YOLO("models/best.pt")  # Original model
-    helmet_model = YOLO("models/helmet_triple_best.pt")  # Helmet and triple riding model
-    seatbelt_model = YOLO("models/seatbelt_best.pt")  # Seatbelt model
+    models = load_models()
+
+    # Class-id -> violation-key tables used to post-process every frame
+    postprocessor = create_postprocessor(models, fines)
+
+    # Optional motion gate that skips inference on static frames
+    motion_gate = create_motion_gate(config)
 
     cap = cv2.VideoCapture(config["camera_index"])
     
@@ -39,165 +46,73 @@ def process_webcam(duration_seconds=30, show_display=True):
         print("❌ Error: Could not open webcam.")
         return False
 
-    last_detection_time = defaultdict(float)
-    cooldown_sec = config["cooldown_sec"]
+    # Optional background Gemini validation (confirmed violations are stored as they finish)
+    validation_pool = create_validation_pool(config, gemini_validator, handle_validation_result)
+
+    # Each tracked object is reported at most once per violation class
+    tracker = create_violation_tracker(config)
+
+    # Optional pre/post-event clip evidence from a fixed-size frame buffer
+    clip_recorder = create_clip_recorder(config, cap.get(cv2.CAP_PROP_FPS))
+    batch_size = max(1, int(config.get("batch_size", 1)))
     
     print(f"🎥 Starting webcam detection for {duration_seconds} seconds...")
     violations_detected = 0
     start_time = time.time()
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            print("✅ End of webcam stream.")
-            break
-
-        # Check if duration has elapsed
-        if time.time() - start_time > duration_seconds:
-            print(f"⏰ Detection duration ({duration_seconds}s) completed.")
-            break
-
-        now = time.time()
-
-        # Run detection with all models
-        main_results = main_model.predict(frame, conf=config["conf_thresholds"]["helmet_triple"])
-        helmet_results = helmet_model.predict(frame, conf=config["conf_thresholds"]["helmet_triple"])
-        seatbelt_results = seatbelt_model.predict(frame, conf=config["conf_thresholds"]["helmet_triple"])
-
-        detected = False  # Flag to check if any violation is detected
-        violations_in_frame = []  # Store all violations detected in this frame
-
-        # Process main model results (original violations)
-        for r in main_results:
-            for box in r.boxes:
-                cls_id = int(box.cls[0])  # since model has only one class
-                cls_name = str(cls_id)    # treat it as "0"
-
-                if cls_name not in fines:
-                    continue
-
-                if now - last_detection_time[cls_name] < cooldown_sec:
-                    continue
-
-                last_detection_time[cls_name] = now
-
-                # Draw bounding box and label on the frame
-                xyxy = box.xyxy[0].tolist()
-                x1, y1, x2, y2 = map(int, xyxy)
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
-                cv2.putText(frame, "No helmet", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 255), 2)
-
-                violations_in_frame.append({
-                    'type': 'No helmet',
-                    'fine': fines[cls_name]
-                })
-                detected = True
-
-        # Process helmet model results (triple riding and helmetless)
-        for r in helmet_results:
-            for box in r.boxes:
-                cls_id = int(box.cls[0])
-                # Get class names from the model
-                class_names = helmet_model.names
-                cls_name = class_names[cls_id] if cls_id in class_names else str(cls_id)
-                
-                # Only process triple riding violations from this model
-                if cls_name.lower() == 'triple riding':
-                    violation_key = 'triple riding'
-                    
-                    if violation_key not in fines:
-                        continue
-
-                    if now - last_detection_time[violation_key] < cooldown_sec:
-                        continue
-
-                    last_detection_time[violation_key] = now
-
-                    # Draw bounding box and label on the frame
-                    xyxy = box.xyxy[0].tolist()
-                    x1, y1, x2, y2 = map(int, xyxy)
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), (255, 0, 0), 2)  # Blue for triple riding
-                    cv2.putText(frame, "Triple Riding", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 0, 0), 2)
-
-                    violations_in_frame.append({
-                        'type': 'Triple Riding',
-                        'fine': fines[violation_key]
-                    })
-                    detected = True
-
-        # Process seatbelt model results
-        for r in seatbelt_results:
-            for box in r.boxes:
-                cls_id = int(box.cls[0])
-                # Get class names from the model
-                class_names = seatbelt_model.names
-                cls_name = class_names[cls_id] if cls_id in class_names else str(cls_id)
-                
-                # Process No-seat-belt violations from this model
-                if cls_name.lower() == 'no-seat-belt' or cls_name == 'No-seat-belt':
-                    violation_key = 'No-seat-belt'
-                    
-                    if violation_key not in fines:
-                        continue
-
-                    if now - last_detection_time[violation_key] < cooldown_sec:
-                        continue
-
-                    last_detection_time[violation_key] = now
-
-                    # Draw bounding box and label on the frame
-                    xyxy = box.xyxy[0].tolist()
-                    x1, y1, x2, y2 = map(int, xyxy)
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)  # Green for seatbelt
-                    cv2.putText(frame, "No Seatbelt", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-
-                    violations_in_frame.append({
-                        'type': 'No-seat-belt',
-                        'fine': fines[violation_key]
-                    })
-                    detected = True
-
-        # If any violation detected, save the full annotated frame and validate with Gemini
-        if detected:
-            violations_detected += 1
-            img_name = f"webcam_annotated_{int(time.time()*1000)}.jpg"
-            img_path = str(Path("crops") / img_name)
-            Path("crops").mkdir(parents=True, exist_ok=True)
-            cv2.imwrite(img_path, frame)
-
-            # Validate and save each violation to DB
-            for violation in violations_in_frame:
-                # Validate detection with Gemini
-                validation_result = gemini_validator.validate_detection(
-                    img_path, violation['type']
+    def duration_elapsed():
+        return time.time() - start_time > duration_seconds
+
+    # Decoder and inference run on their own threads; post-processing,
+    # Gemini validation and DB writes happen here, in capture order
+    pipeline = FramePipeline(
+        cap,
+        lambda frames: predict_batch(models, frames, config),
+        batch_size=batch_size,
+        queue_size=config.get("pipeline_queue_size", 8),
+        gate=motion_gate,
+        should_stop=duration_elapsed,
+    ).start()
+
+    try:
+        for frame_index, ts, frame, frame_results in pipeline:
+            # Frames rejected by the motion gate have no results
+            violations_in_frame = []
+            if frame_results is not None:
+                violations_in_frame = find_violations(
+                    frame, frame_results, postprocessor, fines, tracker
                 )
-                
-                print(f"Gemini validation for {violation['type']}: {validation_result['status']} (confidence: {validation_result['confidence']:.2f})")
-                print(f"Reason: {validation_result['reason']}")
-                
-                # Only save to DB if validation is correct
-                if validation_result['status'] == 'correct':
-                    insert_violation(
-                        file_path=img_path,
-                        violation_type=violation['type'],
-                        fine=violation['fine']
-                    )
-                    print(f"✅ Violation saved to database: {violation['type']}")
-                else:
-                    print(f"❌ Violation rejected by Gemini: {violation['type']}")
-                    # Optionally, you could save rejected detections to a separate folder
-                    # for manual review later
-
-        # Only show display if requested (for standalone use)
-        if show_display:
-            cv2.imshow("Detection (Webcam)", frame)
-            if cv2.waitKey(1) & 0xFF == ord("q"):
-                break
+
+            if clip_recorder is not None:
+                clip_recorder.push(frame)
+
+            # If any violation detected, save the full annotated frame and validate with Gemini
+            if violations_in_frame:
+                violations_detected += 1
+                record_violations(frame, violations_in_frame, gemini_validator, prefix="webcam_annotated",
+                                  validation_pool=validation_pool, clip_recorder=clip_recorder)
+
+            # Only show display if requested (for standalone use)
+            if show_display:
+                cv2.imshow("Detection (Webcam)", frame)
+                if cv2.waitKey(1) & 0xFF == ord("q"):
+                    break
+        else:
+            if duration_elapsed():
+                print(f"⏰ Detection duration ({duration_seconds}s) completed.")
+            else:
+                print("✅ End of webcam stream.")
+    finally:
+        pipeline.stop()
+        finish_validation(gemini_validator, validation_pool, clip_recorders=[clip_recorder])
 
     cap.release()
     if show_display:
         cv2.destroyAllWindows()
     
+    print(f"📊 Peak queue depths: {pipeline.peak_depths}")
+    if motion_gate is not None:
+        print(f"🏃 Motion gate: {motion_gate.summary()}")
     print(f"🚨 Total violations detected: {violations_detected}")
     return True
 
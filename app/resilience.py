@@ -0,0 +1,111 @@
+import threading
+import time
+from collections import deque
+
+class TokenBucket:
+    """Token-bucket rate limiter: `rate` tokens per second, up to `burst` saved up"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout=0.0):
+        """Take one token, waiting at most `timeout` seconds. Returns False if none came"""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return True
+                wait = (1.0 - self._tokens) / self.rate
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker.
+
+    closed: calls go through; `failure_threshold` consecutive failures open it.
+    open: calls are refused until `reset_timeout_sec` has passed.
+    half_open: a single trial call is let through; success closes the
+        breaker, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout_sec=30.0):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout_sec = reset_timeout_sec
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.times_opened = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Return True if a call may be made now"""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout_sec:
+                self.state = "half_open"
+                self._trial_in_flight = False
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def release_trial(self):
+        """Give back a half-open trial slot for a call that was never made (refused locally)"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.times_opened += 1
+                    print(f"🔌 Circuit breaker opened after {self.consecutive_failures} failures")
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+class LatencyTracker:
+    """Rolling window of call latencies with percentile summaries"""
+
+    def __init__(self, window=1000):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+
+    def percentiles(self, points=(50, 95, 99)):
+        """Latency percentiles in milliseconds over the window, e.g. {'p50': 812.0}"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return {f"p{p}": None for p in points}
+        return {
+            f"p{p}": round(1000 * samples[min(len(samples) - 1, int(len(samples) * p / 100))], 1)
+            for p in points
+        }
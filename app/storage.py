@@ -0,0 +1,232 @@
+import csv
+import importlib
+import io
+import threading
+import time
+import zlib
+from datetime import date, timedelta
+
+from app.utils import load_yaml
+from app.metrics import DB_WRITE_LATENCY, DB_ROWS_WRITTEN, DB_WRITE_ERRORS
+
+# Storage backends: every module implements the same violation API
+BACKENDS = {
+    "mysql": "app.dbsql",
+    "sqlite": "app.db",
+}
+
+CSV_HEADER = ['ID', 'Date & Time (UTC)', 'Violation Type', 'Fine Amount (₹)', 'Number Plate']
+
+_backend = None
+_backend_name = None
+_backend_lock = threading.Lock()
+
+def get_backend():
+    """Return the storage backend module selected by `database.backend` in app/config.yaml"""
+    global _backend, _backend_name
+    with _backend_lock:
+        if _backend is None:
+            db_config = load_yaml("app/config.yaml").get("database") or {}
+            name = db_config.get("backend", "mysql")
+            if name not in BACKENDS:
+                raise ValueError(f"Unknown database backend '{name}' (expected one of {sorted(BACKENDS)})")
+            _backend = importlib.import_module(BACKENDS[name])
+            _backend_name = name
+        return _backend
+
+def set_backend(name):
+    """Switch backends at runtime, e.g. to run the pipeline offline on SQLite"""
+    global _backend, _backend_name
+    with _backend_lock:
+        _backend = importlib.import_module(BACKENDS[name])
+        _backend_name = name
+    return _backend
+
+def _timed_write(write, rows):
+    """Run one insert, recording its latency, row count and failures in app.metrics"""
+    backend = get_backend()
+    start = time.perf_counter()
+    try:
+        result = write(backend)
+    except Exception:
+        DB_WRITE_ERRORS.labels(backend=_backend_name).inc()
+        raise
+    finally:
+        DB_WRITE_LATENCY.labels(backend=_backend_name).observe(time.perf_counter() - start)
+    DB_ROWS_WRITTEN.labels(backend=_backend_name).inc(rows)
+    return result
+
+# ---------------------------------------------------------------------------
+# Public API: forwards to the selected backend
+# ---------------------------------------------------------------------------
+
+def init_db():
+    return get_backend().init_db()
+
+def insert_violation(file_path, violation_type, fine, clip_path=None):
+    return _timed_write(lambda backend: backend.insert_violation(file_path, violation_type, fine, clip_path), 1)
+
+def insert_violations(rows):
+    rows = list(rows)
+    return _timed_write(lambda backend: backend.insert_violations(rows), len(rows))
+
+def get_all_violations():
+    return get_backend().get_all_violations()
+
+def get_violations_page(limit=50, before=None, after=None, **filters):
+    return get_backend().get_violations_page(limit=limit, before=before, after=after, **filters)
+
+def get_violation_summary(**filters):
+    return get_backend().get_violation_summary(**filters)
+
+def get_violation_types():
+    return get_backend().get_violation_types()
+
+def get_violation_file_path(violation_id):
+    return get_backend().get_violation_file_path(violation_id)
+
+def get_violation_clip_path(violation_id):
+    return get_backend().get_violation_clip_path(violation_id)
+
+def update_number_plate(violation_id, number_plate):
+    return get_backend().update_number_plate(violation_id, number_plate)
+
+def delete_violation(violation_id):
+    return get_backend().delete_violation(violation_id)
+
+def delete_all_violations():
+    return get_backend().delete_all_violations()
+
+def iter_violations(batch_size=1000, **filters):
+    return get_backend().iter_violations(batch_size=batch_size, **filters)
+
+def stream_violations_csv(batch_size=1000, **filters):
+    return get_backend().stream_violations_csv(batch_size=batch_size, **filters)
+
+def stream_violations_csv_gz(batch_size=1000, level=6, **filters):
+    return get_backend().stream_violations_csv_gz(batch_size=batch_size, level=level, **filters)
+
+def export_violations_to_csv(**filters):
+    return get_backend().export_violations_to_csv(**filters)
+
+def get_pool_stats():
+    return get_backend().get_pool_stats()
+
+# ---------------------------------------------------------------------------
+# Helpers shared by the backends
+# ---------------------------------------------------------------------------
+
+def violation_filters(violation_type=None, date_from=None, date_to=None, number_plate=None, placeholder="%s"):
+    """
+    Build the WHERE conditions shared by the dashboard and export queries.
+
+    Args:
+        violation_type: Exact violation type
+        date_from: First day to include (YYYY-MM-DD)
+        date_to: Last day to include (YYYY-MM-DD)
+        number_plate: Plate prefix, e.g. "KA01"
+        placeholder: Parameter marker of the backend's driver ("%s" or "?")
+
+    Returns:
+        tuple: (list of SQL conditions, list of parameters)
+    """
+    conditions, params = [], []
+    if violation_type:
+        conditions.append(f"violation_type = {placeholder}")
+        params.append(violation_type)
+    if date_from:
+        conditions.append(f"ts_utc >= {placeholder}")
+        params.append(date.fromisoformat(date_from).isoformat())
+    if date_to:
+        # ts_utc is an ISO string, so "before the next day" includes all of date_to
+        conditions.append(f"ts_utc < {placeholder}")
+        params.append((date.fromisoformat(date_to) + timedelta(days=1)).isoformat())
+    if number_plate:
+        conditions.append(f"number_plate LIKE {placeholder}")
+        params.append(number_plate.replace("%", "").replace("_", "") + "%")
+    return conditions, params
+
+def where_clause(conditions):
+    return f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+def encode_cursor(violation):
+    """Keyset cursor for a row: its (ts_utc, id) position"""
+    return f"{violation['ts_utc']}|{violation['id']}"
+
+def decode_cursor(cursor):
+    ts_utc, _, violation_id = cursor.rpartition("|")
+    return ts_utc, int(violation_id)
+
+def keyset_condition(conditions, params, before=None, after=None, placeholder="%s"):
+    """
+    Add the keyset condition for a page before/after a cursor.
+
+    Returns:
+        bool: True if the page walks towards newer rows (query in ascending order)
+    """
+    newer = after is not None and before is None
+    if before is not None or after is not None:
+        ts_utc, violation_id = decode_cursor(before if before is not None else after)
+        op = ">" if newer else "<"
+        p = placeholder
+        conditions.append(f"(ts_utc {op} {p} OR (ts_utc = {p} AND id {op} {p}))")
+        params.extend([ts_utc, ts_utc, violation_id])
+    return newer
+
+def finish_page(violations, limit, before=None, after=None):
+    """
+    Turn the `limit + 1` rows of a keyset query into a page.
+
+    Returns:
+        dict: violations, next_cursor (older page) and prev_cursor (newer page)
+    """
+    newer = after is not None and before is None
+    has_more = len(violations) > limit
+    violations = violations[:limit]
+    if newer:
+        violations.reverse()
+
+    next_cursor = prev_cursor = None
+    if violations:
+        # Walking back towards newer rows, older rows always exist behind us
+        if has_more or newer:
+            next_cursor = encode_cursor(violations[-1])
+        if before is not None or (newer and has_more):
+            prev_cursor = encode_cursor(violations[0])
+    return {"violations": violations, "next_cursor": next_cursor, "prev_cursor": prev_cursor}
+
+def csv_chunks(violations, batch_size=1000):
+    """
+    Render violations as CSV text chunks of about `batch_size` rows each.
+
+    The first chunk is only produced once the first row has been read, so
+    database errors surface before anything has been sent to a client.
+    """
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(CSV_HEADER)
+
+    for i, violation in enumerate(violations, 1):
+        writer.writerow([
+            violation['id'],
+            violation['ts_utc'],
+            violation['violation_type'],
+            violation['fine'],
+            violation['number_plate'] or ''
+        ])
+        if i % batch_size == 0:
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate(0)
+
+    yield output.getvalue()
+
+def gzip_chunks(chunks, level=6):
+    """Compress a stream of text chunks into a gzip byte stream"""
+    # wbits=31 writes a gzip header and trailer around the deflate stream
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,69 @@
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+import cv2
+
+THUMBNAIL_DIR = "crops/thumbs"
+
+def resolve_evidence_path(file_path):
+    """
+    Turn a stored evidence path (possibly written on Windows) into a local file path.
+
+    Returns:
+        str: Existing file path, or None if the file is missing
+    """
+    if not file_path:
+        return None
+    path = Path(file_path.replace("\\", "/"))
+    if not path.is_absolute():
+        path = Path.cwd() / path
+    return str(path) if path.is_file() else None
+
+def thumbnail_path(image_path, max_side=240, thumb_dir=THUMBNAIL_DIR):
+    """Cache location of an image's thumbnail (unique per source path and size)"""
+    name = Path(image_path).stem
+    digest = hashlib.sha1(os.path.abspath(image_path).encode("utf-8")).hexdigest()[:10]
+    return os.path.join(thumb_dir, str(max_side), f"{name}_{digest}.jpg")
+
+def get_thumbnail(image_path, max_side=240, jpeg_quality=80, thumb_dir=THUMBNAIL_DIR):
+    """
+    Return a cached JPEG thumbnail of an evidence image, creating it on first use.
+
+    The thumbnail is rebuilt when the source file is newer than the cached
+    copy, and written atomically so concurrent requests never read half a file.
+
+    Args:
+        image_path: Full-size evidence image
+        max_side: Longest side of the thumbnail in pixels
+        jpeg_quality: JPEG quality of the thumbnail
+        thumb_dir: Root of the on-disk thumbnail cache
+
+    Returns:
+        str: Absolute thumbnail path, or None if the source image cannot be read
+    """
+    if not os.path.isfile(image_path):
+        return None
+    thumb = os.path.abspath(thumbnail_path(image_path, max_side, thumb_dir))
+    if os.path.exists(thumb) and os.path.getmtime(thumb) >= os.path.getmtime(image_path):
+        return thumb
+
+    image = cv2.imread(image_path)
+    if image is None:
+        return None
+    h, w = image.shape[:2]
+    scale = max_side / max(h, w)
+    if scale < 1:
+        image = cv2.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))),
+                           interpolation=cv2.INTER_AREA)
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, int(jpeg_quality)])
+    if not ok:
+        return None
+
+    os.makedirs(os.path.dirname(thumb), exist_ok=True)
+    tmp_path = f"{thumb}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(encoded.tobytes())
+    os.replace(tmp_path, thumb)
+    return thumb
@@ -0,0 +1,135 @@
+import numpy as np
+
+def iou_matrix(boxes_a, boxes_b):
+    """Pairwise IoU between two (N, 4) and (M, 4) arrays of xyxy boxes"""
+    boxes_a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-6), 0.0)
+
+class Track:
+    """One tracked object: last box, smoothed velocity and bookkeeping"""
+
+    def __init__(self, track_id, box):
+        self.track_id = track_id
+        self.box = np.asarray(box, dtype=np.float32)
+        self.velocity = np.zeros(4, dtype=np.float32)
+        self.hits = 1
+        self.misses = 0
+        self.reported = False
+
+    def predict(self):
+        """Constant-velocity guess of where the box is on the next inferred frame"""
+        return self.box + self.velocity * (self.misses + 1)
+
+    def update(self, box, smoothing=0.5):
+        box = np.asarray(box, dtype=np.float32)
+        step = (box - self.box) / (self.misses + 1)
+        self.velocity = smoothing * step + (1 - smoothing) * self.velocity
+        self.box = box
+        self.hits += 1
+        self.misses = 0
+
+class IoUTracker:
+    """
+    Lightweight CPU tracker: greedy IoU matching of new detections against the
+    constant-velocity predictions of the existing tracks.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_age=15):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.tracks = []
+        self._next_id = 1
+
+    def update(self, boxes):
+        """
+        Match one inferred frame's boxes to tracks.
+
+        Returns:
+            list: The Track for each input box, in input order
+        """
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        assigned = [None] * len(boxes)
+
+        if self.tracks and len(boxes):
+            predicted = np.stack([track.predict() for track in self.tracks])
+            ious = iou_matrix(predicted, boxes)
+
+            # Greedy assignment, best overlaps first
+            taken = set()
+            for flat in np.argsort(-ious, axis=None):
+                t, d = np.unravel_index(flat, ious.shape)
+                if ious[t, d] < self.iou_threshold:
+                    break
+                if assigned[d] is not None or t in taken:
+                    continue
+                taken.add(t)
+                assigned[d] = self.tracks[t]
+                self.tracks[t].update(boxes[d])
+
+        # Age tracks that were not matched and forget the stale ones
+        matched = {id(track) for track in assigned if track is not None}
+        for track in self.tracks:
+            if id(track) not in matched:
+                track.misses += 1
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_age]
+
+        # Unmatched detections start new tracks
+        for d, track in enumerate(assigned):
+            if track is None:
+                track = Track(self._next_id, boxes[d])
+                self._next_id += 1
+                self.tracks.append(track)
+                assigned[d] = track
+
+        return assigned
+
+class ViolationTracker:
+    """
+    One IoUTracker per violation class. A violation is reported at most once
+    per track, so the same rider is not recorded again while it stays in view
+    and two different riders are never merged into one record.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_age=15, min_hits=1):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.trackers = {}
+
+    def new_violations(self, violation_key, boxes):
+        """
+        Update the tracks of one violation class with this frame's boxes.
+
+        Returns:
+            list: (box index, track id) for tracks reporting for the first time
+        """
+        tracker = self.trackers.get(violation_key)
+        if tracker is None:
+            tracker = self.trackers[violation_key] = IoUTracker(self.iou_threshold, self.max_age)
+
+        new = []
+        for index, track in enumerate(tracker.update(boxes)):
+            if not track.reported and track.hits >= self.min_hits:
+                track.reported = True
+                new.append((index, track.track_id))
+        return new
+
+def create_violation_tracker(config):
+    """Build a ViolationTracker from app/config.yaml"""
+    tracker_config = config.get("tracker") or {}
+    return ViolationTracker(
+        iou_threshold=tracker_config.get("iou_threshold", 0.3),
+        max_age=tracker_config.get("max_age", 15),
+        min_hits=tracker_config.get("min_hits", 1),
+    )
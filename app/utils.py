@@ -1,8 +1,11 @@
 from pathlib import Path
 import cv2
+import numpy as np
 import yaml
 import time
 
+from app.postprocess import key_indices, class_name_table, to_numpy
+
 def load_yaml(path):
     return yaml.safe_load(Path(path).read_text())
 
@@ -21,18 +24,31 @@ def process_frame(frame, models, config, last_detection_time, fines):
     """
     violations = []
     now = time.time()
+    keys = list(fines)
+    cooldown = config.get("cooldown_sec", 10)
     for model, tag in models:
         results = model.predict(frame, conf=config["conf_thresholds"][tag])
         for r in results:
-            for box in r.boxes:
-                cls_name = r.names[int(box.cls[0])]
-                if cls_name not in fines:
-                    continue
+            if not len(r.boxes):
+                continue
+            # Violation index of every box at once, via the model's class-id table
+            indices = key_indices(r.boxes, class_name_table(model, r.names, keys))
+            matched = np.flatnonzero(indices >= 0)
+            if not len(matched):
+                continue
+            if cooldown > 0:
+                # Within one call only the first box of each class can pass the cooldown
+                _, first = np.unique(indices[matched], return_index=True)
+                matched = np.sort(matched[first])
+            xyxy_all = to_numpy(r.boxes.xyxy).reshape(-1, 4)
+
+            for box_index in matched:
+                cls_name = keys[indices[box_index]]
                 # cooldown check
-                if now - last_detection_time.get(cls_name, 0) < config["cooldown_sec"]:
+                if now - last_detection_time.get(cls_name, 0) < cooldown:
                     continue
                 last_detection_time[cls_name] = now
-                xyxy = box.xyxy[0].tolist()
+                xyxy = xyxy_all[box_index].tolist()
                 violations.append({
                     "type": cls_name,
                     "bbox": xyxy,
@@ -0,0 +1,157 @@
+import queue
+import threading
+import time
+import traceback
+import uuid
+
+from app.utils import load_yaml
+
+class DetectionWorkerPool:
+    """
+    Long-lived pool of detection workers.
+
+    Each worker thread loads the YOLO models and the Gemini validator once and
+    then processes videos taken from a shared job queue, so the cold-start cost
+    is paid once per worker instead of once per uploaded video.
+
+    Finished jobs are kept for `job_ttl_sec`, and only the newest `max_jobs`
+    of them, so their results can be polled without the table growing forever.
+    """
+
+    def __init__(self, num_workers=1, job_ttl_sec=3600, max_jobs=1000):
+        self.num_workers = max(1, int(num_workers))
+        self.job_ttl_sec = job_ttl_sec
+        self.max_jobs = max_jobs
+        self.jobs = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._live_workers = 0
+        self._start_error = None  # set once every worker failed to load
+
+    def start(self):
+        """Start the worker threads (models are loaded inside each worker)"""
+        with self._lock:
+            if self._threads:
+                return self
+            for i in range(self.num_workers):
+                thread = threading.Thread(target=self._worker_loop, name=f"detection-worker-{i}", daemon=True)
+                self._threads.append(thread)
+            self._live_workers = len(self._threads)
+            for thread in self._threads:
+                thread.start()
+        return self
+
+    def submit(self, video_path):
+        """Queue a video for detection and return its job id immediately"""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._prune_jobs()
+            self.jobs[job_id] = {
+                "job_id": job_id,
+                "status": "queued",
+                "video_path": video_path,
+                "submitted_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "progress": None,
+                "result": None,
+                "error": None,
+            }
+            if self._start_error is not None:
+                # No worker will ever pick it up
+                self.jobs[job_id].update(status="failed", error=self._start_error, finished_at=time.time())
+            else:
+                self._queue.put(job_id)
+        return job_id
+
+    def _prune_jobs(self):
+        # Called with the lock held; queued and running jobs are always kept
+        now = time.time()
+        finished = sorted((job["finished_at"], job_id) for job_id, job in self.jobs.items()
+                          if job["finished_at"] is not None)
+        excess = len(self.jobs) - self.max_jobs + 1
+        for i, (finished_at, job_id) in enumerate(finished):
+            if i < excess or now - finished_at > self.job_ttl_sec:
+                del self.jobs[job_id]
+
+    def get_job(self, job_id):
+        """Return a snapshot of the job's status and result, or None if unknown"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _update_job(self, job_id, **fields):
+        with self._lock:
+            self.jobs[job_id].update(fields)
+
+    def _worker_failed(self, error):
+        """Retire a worker that could not load; fail the queued jobs once no worker is left"""
+        with self._lock:
+            self._live_workers -= 1
+            if self._live_workers > 0:
+                return
+            self._start_error = f"Detection workers failed to start: {error}"
+            while True:
+                try:
+                    job_id = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                self.jobs[job_id].update(status="failed", error=self._start_error, finished_at=time.time())
+                self._queue.task_done()
+
+    def _worker_loop(self):
+        # Imported here so that importing the web apps does not pull in ultralytics
+        from app.realtime import process_video
+        from app.detector import load_models
+        from app.gemini_validator import create_gemini_validator
+
+        name = threading.current_thread().name
+        print(f"🚀 {name}: loading models...")
+        try:
+            models = load_models()
+            gemini_validator = create_gemini_validator(load_yaml("app/config.yaml"))
+        except Exception as e:
+            traceback.print_exc()
+            print(f"❌ {name}: could not load the models, worker stopped: {e}")
+            self._worker_failed(e)
+            return
+        print(f"✅ {name}: ready")
+
+        while True:
+            job_id = self._queue.get()
+            job = self.get_job(job_id)
+            self._update_job(job_id, status="running", started_at=time.time())
+            try:
+                result = process_video(
+                    job["video_path"], show_display=False,
+                    models=models, gemini_validator=gemini_validator,
+                    progress_callback=lambda progress, job_id=job_id: self._update_job(job_id, progress=progress)
+                )
+                if result:
+                    self._update_job(job_id, status="completed", result=result, finished_at=time.time())
+                else:
+                    self._update_job(job_id, status="failed", error="Could not open video file",
+                                     finished_at=time.time())
+            except Exception as e:
+                traceback.print_exc()
+                self._update_job(job_id, status="failed", error=str(e), finished_at=time.time())
+            finally:
+                self._queue.task_done()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_worker_pool():
+    """Return the process-wide worker pool, starting it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            config = load_yaml("app/config.yaml")
+            worker_config = config.get("worker") or {}
+            _pool = DetectionWorkerPool(
+                worker_config.get("num_workers", 1),
+                job_ttl_sec=worker_config.get("job_ttl_sec", 3600),
+                max_jobs=worker_config.get("max_jobs", 1000),
+            ).start()
+        return _pool
@@ -3,45 +3,37 @@
 Simple YOLO Model Evaluation using built-in validation
 """
 
-from ultralytics import YOLO
 import os
 
-def evaluate_yolo_model(model_path="models/best.pt", data_yaml_path="data/data.yaml"):
+import numpy as np
+
+def evaluate_yolo_model(model_path="models/best.pt", data_yaml_path="data/data.yaml", **val_args):
     """
     Evaluate YOLO model using built-in validation method
     
     Args:
-        model_path: Path to your trained YOLO model (.pt file)
+        model_path: Path to your trained YOLO model (.pt file, or an exported .onnx)
         data_yaml_path: Path to data.yaml file (optional - add manually later)
+        **val_args: Extra arguments for model.val, e.g. imgsz or device
     """
     
     if not os.path.exists(model_path):
         print(f"❌ Model not found: {model_path}")
         return None
     
+    # Imported here so that importing this module (e.g. from quantize_yolo) does not pull in ultralytics
+    from ultralytics import YOLO
+
     print(f"🔍 Loading model: {model_path}")
     model = YOLO(model_path)
     
     try:
         if data_yaml_path and os.path.exists(data_yaml_path):
             print(f"📁 Using dataset config: {data_yaml_path}")
-            results = model.val(data=data_yaml_path)
+            results = model.val(data=data_yaml_path, **val_args)
         else:
             print("📁 Using model's built-in dataset configuration")
-            results = model.val()
-        
-        # Print key metrics
-        print("\n📊 Validation Results:")
-        print("-" * 40)
-        print(f"mAP50:     {results.box.map50:.4f}")
-        print(f"mAP50-95:  {results.box.map:.4f}")
-        print(f"Precision: {results.box.mp:.4f}")
-        print(f"Recall:    {results.box.mr:.4f}")
-        print(f"F1-Score:  {results.box.f1:.4f}")
-        print("-" * 40)
-        
-        return results
-        
+            results = model.val(**val_args)
     except Exception as e:
         print(f"❌ Validation failed: {str(e)}")
         print("💡 This usually means:")
@@ -50,6 +42,18 @@ def evaluate_yolo_model(model_path="models/best.pt", data_yaml_path="data/data.y
         print("   - The dataset paths in data.yaml are incorrect")
         return None
 
+    # Print key metrics (f1 is per class, like ap50)
+    print("\n📊 Validation Results:")
+    print("-" * 40)
+    print(f"mAP50:     {results.box.map50:.4f}")
+    print(f"mAP50-95:  {results.box.map:.4f}")
+    print(f"Precision: {results.box.mp:.4f}")
+    print(f"Recall:    {results.box.mr:.4f}")
+    print(f"F1-Score:  {float(np.mean(results.box.f1)):.4f}")
+    print("-" * 40)
+
+    return results
+
 def main():
     """Main evaluation function"""
     print("🎯 YOLO Model Evaluation")
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+INT8 post-training quantization of the three YOLO detectors, with an
+accuracy-vs-speed report against the FP32 models.
+
+For each model the FP32 ONNX export (see app/inference.py) is statically
+quantized with ONNX Runtime, calibrated on frames sampled from local videos
+or image folders, and saved as models/<name>.<imgsz>.int8.onnx. Both variants
+are then evaluated with eval_yolo.evaluate_yolo_model (mAP50, mAP50-95,
+precision, recall) and timed on the CPU with the engine's own ONNX Runtime
+path. Set `inference.variant: int8` in app/config.yaml to run the result.
+
+Usage:
+    python quantize_yolo.py --calib videos --data main=data/data.yaml
+"""
+
+import argparse
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+import onnx
+from onnxruntime.quantization import (CalibrationDataReader, CalibrationMethod, QuantFormat, QuantType,
+                                      quantize_static)
+from onnxruntime.quantization.shape_inference import quant_pre_process
+
+from app.detector import MODEL_PATHS
+from app.inference import OnnxRuntimeModel, export_model, inference_settings, letterbox, quantized_path
+from app.utils import load_yaml
+from eval_yolo import evaluate_yolo_model
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+# Detect-head ops kept in FP32: box decoding (DFL softmax, anchor arithmetic)
+# and the class sigmoid lose most accuracy when quantized, the convs do not
+HEAD_FLOAT_OPS = {"Concat", "Split", "Sigmoid", "Softmax", "Mul", "Add", "Sub", "Div", "Reshape", "Transpose"}
+
+def sample_frames(sources, count=100):
+    """
+    Sample calibration frames evenly from videos and image folders.
+
+    Args:
+        sources: Video files and/or directories (searched recursively)
+        count: Total number of frames
+
+    Returns:
+        list: BGR frames
+    """
+    videos, images = [], []
+    for source in sources:
+        if os.path.isdir(source):
+            for root, _, files in os.walk(source):
+                for fname in sorted(files):
+                    ext = os.path.splitext(fname)[1].lower()
+                    if ext in VIDEO_EXTENSIONS:
+                        videos.append(os.path.join(root, fname))
+                    elif ext in IMAGE_EXTENSIONS:
+                        images.append(os.path.join(root, fname))
+        elif os.path.splitext(source)[1].lower() in IMAGE_EXTENSIONS:
+            images.append(source)
+        else:
+            videos.append(source)
+
+    frames = []
+    per_video = count // max(1, len(videos) + (1 if images else 0))
+    for video in videos:
+        cap = cv2.VideoCapture(video)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        for index in np.linspace(0, max(0, total - 1), num=max(1, per_video), dtype=int):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(index))
+            ret, frame = cap.read()
+            if ret:
+                frames.append(frame)
+        cap.release()
+
+    remaining = count - len(frames)
+    if images and remaining > 0:
+        step = max(1, len(images) // remaining)
+        for path in images[::step][:remaining]:
+            frame = cv2.imread(path)
+            if frame is not None:
+                frames.append(frame)
+    return frames
+
+class FrameCalibrationReader(CalibrationDataReader):
+    """Feeds letterboxed calibration frames to quantize_static, one at a time"""
+
+    def __init__(self, frames, input_name, imgsz):
+        self.input_name = input_name
+        self.imgsz = imgsz
+        self.frames = iter(frames)
+
+    def get_next(self):
+        frame = next(self.frames, None)
+        if frame is None:
+            return None
+        image = letterbox(frame, (self.imgsz, self.imgsz))[..., ::-1].transpose(2, 0, 1)  # BGR->RGB, CHW
+        return {self.input_name: np.ascontiguousarray(image[None], dtype=np.float32) / 255.0}
+
+def head_nodes_to_exclude(model):
+    """Names of the detect-head nodes to keep in FP32 (ultralytics names them /model.<last>/...)"""
+    layers = set()
+    for node in model.graph.node:
+        parts = node.name.split("/")
+        if len(parts) > 2 and parts[1].startswith("model.") and parts[1][6:].isdigit():
+            layers.add(int(parts[1][6:]))
+    if not layers:
+        return []
+    head = f"/model.{max(layers)}/"
+    return [node.name for node in model.graph.node if node.name.startswith(head) and node.op_type in HEAD_FLOAT_OPS]
+
+def quantize_model(fp32_path, int8_path, frames, imgsz=640, per_channel=True):
+    """
+    Statically quantize an FP32 ONNX model to INT8 (QDQ format).
+
+    Returns:
+        str: Path of the quantized model
+    """
+    # Shape inference and graph folding first, as ONNX Runtime recommends
+    tmp_path = f"{int8_path}.tmp"
+    prep_path = f"{int8_path}.prep.onnx"
+    try:
+        quant_pre_process(fp32_path, prep_path)
+    except Exception as e:
+        print(f"⚠️ Pre-processing failed, quantizing the export as is: {e}")
+        prep_path = fp32_path
+
+    model = onnx.load(prep_path)
+    input_name = model.graph.input[0].name
+    exclude = head_nodes_to_exclude(model)
+    print(f"🧮 Quantizing {fp32_path} on {len(frames)} frames ({len(exclude)} head nodes kept in FP32)...")
+
+    quantize_static(
+        prep_path,
+        tmp_path,
+        FrameCalibrationReader(frames, input_name, imgsz),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=per_channel,
+        calibrate_method=CalibrationMethod.MinMax,
+        nodes_to_exclude=exclude,
+    )
+    if prep_path != fp32_path:
+        os.remove(prep_path)
+
+    # Keep the export metadata (class names, stride, task) for the engine and model.val
+    quantized = onnx.load(tmp_path)
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(model.metadata_props)
+    onnx.save(quantized, tmp_path)
+    os.replace(tmp_path, int8_path)
+    print(f"✅ Saved INT8 model: {int8_path}")
+    return int8_path
+
+def measure_speed(model, frames, batch_size=4, runs=50):
+    """
+    CPU latency (one frame per call) and throughput (batches) of a loaded model.
+
+    Returns:
+        dict: latency_ms_p50, latency_ms_p95 and throughput_fps
+    """
+    for frame in frames[:3]:
+        model.predict([frame])  # warm up
+
+    timings = []
+    for i in range(runs):
+        start = time.perf_counter()
+        model.predict([frames[i % len(frames)]])
+        timings.append((time.perf_counter() - start) * 1000)
+
+    processed = 0
+    start = time.perf_counter()
+    for i in range(0, max(runs, batch_size), batch_size):
+        batch = [frames[(i + j) % len(frames)] for j in range(batch_size)]
+        model.predict(batch)
+        processed += len(batch)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "latency_ms_p50": float(np.percentile(timings, 50)),
+        "latency_ms_p95": float(np.percentile(timings, 95)),
+        "throughput_fps": processed / elapsed,
+    }
+
+def evaluate_variant(path, data_yaml_path, imgsz, frames, threads, batch_size, runs):
+    """Accuracy (model.val) and speed of one model file"""
+    report = {"path": path, "size_mb": os.path.getsize(path) / 1e6}
+    results = evaluate_yolo_model(path, data_yaml_path, imgsz=imgsz) if data_yaml_path else None
+    if results is not None:
+        report.update({
+            "map50": float(results.box.map50),
+            "map50_95": float(results.box.map),
+            "precision": float(results.box.mp),
+            "recall": float(results.box.mr),
+        })
+    report.update(measure_speed(OnnxRuntimeModel(path, threads=threads, imgsz=imgsz), frames, batch_size, runs))
+    return report
+
+def print_report(report):
+    """Print the FP32 vs INT8 table and what INT8 costs and buys per model"""
+    def fmt(value, spec):
+        return format(value, spec) if value is not None else "-"
+
+    print("\n📊 Quantization Report:")
+    print("-" * 96)
+    print(f"{'Model':<10}{'Variant':<9}{'Size MB':>9}{'mAP50':>8}{'mAP50-95':>10}{'P':>8}{'R':>8}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'FPS':>8}")
+    for name, variants in report.items():
+        for variant, r in variants.items():
+            print(f"{name:<10}{variant:<9}{r['size_mb']:>9.1f}{fmt(r.get('map50'), '.4f'):>8}"
+                  f"{fmt(r.get('map50_95'), '.4f'):>10}{fmt(r.get('precision'), '.4f'):>8}"
+                  f"{fmt(r.get('recall'), '.4f'):>8}{r['latency_ms_p50']:>9.1f}{r['latency_ms_p95']:>9.1f}"
+                  f"{r['throughput_fps']:>8.1f}")
+    print("-" * 96)
+    for name, variants in report.items():
+        fp32, int8 = variants.get("fp32"), variants.get("int8")
+        if not fp32 or not int8:
+            continue
+        line = (f"{name}: INT8 vs FP32 speedup {fp32['latency_ms_p50'] / int8['latency_ms_p50']:.2f}x (p50), "
+                f"throughput {int8['throughput_fps'] / fp32['throughput_fps']:.2f}x, "
+                f"size {int8['size_mb'] / fp32['size_mb']:.0%}")
+        if fp32.get("map50") is not None and int8.get("map50") is not None:
+            line += (f", mAP50 {int8['map50'] - fp32['map50']:+.4f}, "
+                     f"mAP50-95 {int8['map50_95'] - fp32['map50_95']:+.4f}")
+        print(line)
+
+def main():
+    """Quantize the detectors and report FP32 vs INT8"""
+    parser = argparse.ArgumentParser(description="Build INT8 YOLO models and compare them with FP32")
+    parser.add_argument("--models", nargs="+", choices=sorted(MODEL_PATHS), default=sorted(MODEL_PATHS),
+                       help="Models to quantize (default: all)")
+    parser.add_argument("--calib", nargs="+", default=["videos"],
+                       help="Videos or image folders to sample calibration frames from (default: videos)")
+    parser.add_argument("--calib-frames", type=int, default=100,
+                       help="Number of calibration frames (default: 100)")
+    parser.add_argument("--data", action="append", default=[], metavar="NAME=YAML",
+                       help="Validation data.yaml per model, e.g. main=data/data.yaml (repeatable)")
+    parser.add_argument("--runs", type=int, default=50,
+                       help="Timed predict calls per variant (default: 50)")
+    parser.add_argument("--skip-quantize", action="store_true",
+                       help="Only evaluate existing INT8 models")
+    parser.add_argument("--report", default="models/quantization_report.json",
+                       help="Where to save the JSON report")
+    args = parser.parse_args()
+
+    config = load_yaml("app/config.yaml")
+    settings = inference_settings(config)
+    data_yaml = dict(item.split("=", 1) for item in args.data)
+
+    frames = sample_frames(args.calib, args.calib_frames)
+    if not frames:
+        print(f"❌ No calibration frames found in {args.calib}")
+        return
+    print(f"🎞️  Sampled {len(frames)} calibration frames")
+
+    report = {}
+    for name in args.models:
+        model_settings = settings["models"].get(name) or {}
+        imgsz = model_settings.get("imgsz", 640)
+        threads = model_settings.get("threads")
+
+        fp32_path = export_model(MODEL_PATHS[name], "onnxruntime", imgsz)
+        int8_path = quantized_path(MODEL_PATHS[name], imgsz)
+        if not args.skip_quantize:
+            quantize_model(fp32_path, int8_path, frames, imgsz)
+
+        report[name] = {
+            variant: evaluate_variant(path, data_yaml.get(name), imgsz, frames, threads,
+                                      config.get("batch_size", 4), args.runs)
+            for variant, path in (("fp32", fp32_path), ("int8", int8_path))
+        }
+
+    print_report(report)
+    os.makedirs(os.path.dirname(args.report) or ".", exist_ok=True)
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Report saved: {args.report}")
+
+if __name__ == "__main__":
+    main()
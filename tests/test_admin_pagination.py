@@ -0,0 +1,145 @@
+import csv
+import gzip
+import io
+import re
+from html import unescape
+
+import pytest
+
+from app import db, storage
+
+# 13 rows; several share a timestamp so the id tie-break decides their order
+ROWS = [
+    ("2024-05-01T08:00:00", "No helmet", 1000),
+    ("2024-05-01T08:00:00", "Triple Riding", 2000),
+    ("2024-05-01T08:00:00", "No helmet", 1000),
+    ("2024-05-01T09:30:00", "No-seat-belt", 1000),
+    ("2024-05-02T10:00:00", "No helmet", 1000),
+    ("2024-05-02T10:00:00", "No helmet", 1000),
+    ("2024-05-02T11:00:00", "Triple Riding", 2000),
+    ("2024-05-03T07:15:00", "No helmet", 1000),
+    ("2024-05-03T07:15:00", "No-seat-belt", 1000),
+    ("2024-05-03T07:15:00", "No helmet", 1000),
+    ("2024-05-03T07:15:00", "Triple Riding", 2000),
+    ("2024-05-04T12:00:00", "No helmet", 1000),
+    ("2024-05-05T12:00:00", "No helmet", 1000),
+]
+
+
+@pytest.fixture
+def sqlite_storage(tmp_path, monkeypatch):
+    """The SQLite backend on a fresh database file, selected as the storage backend"""
+    monkeypatch.setattr(db, "get_db_path", lambda: str(tmp_path / "violations.sqlite"))
+    db.close_connection()
+    monkeypatch.setattr(storage, "_backend", None)
+    monkeypatch.setattr(storage, "_backend_name", None)
+    storage.set_backend("sqlite")
+    storage.init_db()
+    storage.insert_violations([(ts, f"crops/{i}.jpg", kind, fine, None) for i, (ts, kind, fine) in enumerate(ROWS)])
+    yield storage
+    db.close_connection()
+
+
+def expected_order(violation_type=None):
+    """Row ids newest first, ties on ts_utc broken by the higher id"""
+    rows = [(ts, i + 1) for i, (ts, kind, _) in enumerate(ROWS) if violation_type in (None, kind)]
+    return [violation_id for _, violation_id in sorted(rows, reverse=True)]
+
+
+def walk_forwards(limit, **filters):
+    pages, cursor = [], None
+    while True:
+        page = storage.get_violations_page(limit=limit, before=cursor, **filters)
+        pages.append(page)
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def ids(page):
+    return [violation["id"] for violation in page["violations"]]
+
+
+@pytest.mark.parametrize("limit", [1, 3, 4, 13])
+def test_pages_walk_forwards_through_every_row_once(sqlite_storage, limit):
+    pages = walk_forwards(limit)
+    assert [i for page in pages for i in ids(page)] == expected_order()
+    assert all(len(ids(page)) == limit for page in pages[:-1])
+    assert pages[0]["prev_cursor"] is None
+
+
+@pytest.mark.parametrize("limit", [2, 3, 5])
+def test_pages_walk_backwards_to_the_newest_row(sqlite_storage, limit):
+    pages = walk_forwards(limit)
+    page = pages[-1]
+    backwards = [ids(page)]
+    while page["prev_cursor"] is not None:
+        page = storage.get_violations_page(limit=limit, after=page["prev_cursor"])
+        backwards.append(ids(page))
+    assert backwards == [ids(page) for page in reversed(pages)]
+    assert page["next_cursor"] is not None  # the newest page still links to older rows
+
+
+def test_pages_respect_filters(sqlite_storage):
+    pages = walk_forwards(2, violation_type="No helmet", date_from="2024-05-02", date_to="2024-05-03")
+    found = [i for page in pages for i in ids(page)]
+    assert found == [10, 8, 6, 5]
+
+
+def test_summary_counts_in_sql(sqlite_storage):
+    summary = storage.get_violation_summary(violation_type="Triple Riding")
+    assert summary["total"] == 3 and summary["total_fines"] == 6000
+    assert summary["latest_ts"] == "2024-05-03T07:15:00" and summary["most_common"] == "Triple Riding"
+
+
+@pytest.fixture
+def client(sqlite_storage):
+    from app.app_flask import app
+    app.config["TESTING"] = True
+    return app.test_client()
+
+
+def test_admin_dashboard_links_pages_both_ways(client):
+    seen = []
+    response = client.get("/admin?page_size=5")
+    while True:
+        assert response.status_code == 200
+        html = response.get_data(as_text=True)
+        seen.extend(int(i) for i in re.findall(r"/violations/(\d+)/thumbnail", html))
+        older = re.search(r'href="([^"]*before=[^"]*)"', html)
+        if older is None:
+            break
+        response = client.get(unescape(older.group(1)))
+    assert list(dict.fromkeys(seen)) == expected_order()
+
+    newer = re.search(r'href="([^"]*after=[^"]*)"', html)
+    response = client.get(unescape(newer.group(1)))
+    page_ids = list(dict.fromkeys(int(i) for i in re.findall(r"/violations/(\d+)/thumbnail",
+                                                            response.get_data(as_text=True))))
+    assert page_ids == expected_order()[5:10]
+
+
+def parse_csv(text):
+    rows = list(csv.reader(io.StringIO(text)))
+    assert rows[0] == storage.CSV_HEADER
+    return [int(row[0]) for row in rows[1:]]
+
+
+@pytest.mark.parametrize("batch_size", [1, 4, 1000])
+def test_csv_streams_every_row(sqlite_storage, batch_size):
+    chunks = list(storage.stream_violations_csv(batch_size=batch_size))
+    assert parse_csv("".join(chunks)) == expected_order()
+    assert len(chunks) >= len(ROWS) // batch_size
+
+    compressed = b"".join(storage.stream_violations_csv_gz(batch_size=batch_size))
+    assert parse_csv(gzip.decompress(compressed).decode("utf-8")) == expected_order()
+
+
+def test_export_csv_endpoint_plain_and_gzip(client):
+    response = client.get("/export_csv")
+    assert response.status_code == 200 and response.mimetype == "text/csv"
+    assert parse_csv(response.get_data(as_text=True)) == expected_order()
+
+    response = client.get("/export_csv?format=csv.gz&type=Triple%20Riding")
+    assert response.status_code == 200 and response.mimetype == "application/gzip"
+    assert parse_csv(gzip.decompress(response.get_data()).decode("utf-8")) == expected_order("Triple Riding")
@@ -0,0 +1,71 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import api
+
+
+class StubPool:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, video_path):
+        self.submitted.append(video_path)
+        return "job-1"
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """Client running from a scratch directory with uploads/, videos/ and a video outside them"""
+    for name in ("uploads", "videos", "private"):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "clip.mp4").write_bytes(b"video")
+    monkeypatch.chdir(tmp_path)
+    pool = StubPool()
+    monkeypatch.setattr(api, "get_worker_pool", lambda: pool)
+    client = TestClient(api.app)
+    client.pool = pool
+    return client
+
+
+@pytest.mark.parametrize("video_path", [
+    "uploads/clip.mp4",
+    "videos/clip.mp4",
+    "private/../videos/clip.mp4",
+])
+def test_predict_queues_videos_in_allowed_dirs(client, video_path):
+    response = client.get("/predict", params={"video_path": video_path})
+
+    assert response.status_code == 202
+    assert response.json()["job_id"] == "job-1"
+    assert client.pool.submitted == [video_path]
+
+
+@pytest.mark.parametrize("video_path", [
+    "private/clip.mp4",
+    "videos/../private/clip.mp4",
+    "uploads",
+    "/etc/passwd",
+])
+def test_predict_rejects_paths_outside_allowed_dirs(client, video_path):
+    response = client.get("/predict", params={"video_path": video_path})
+
+    assert response.status_code == 400
+    assert client.pool.submitted == []
+
+
+def test_predict_rejects_symlinks_out_of_allowed_dirs(client, tmp_path):
+    os.symlink(tmp_path / "private" / "clip.mp4", tmp_path / "uploads" / "link.mp4")
+
+    response = client.get("/predict", params={"video_path": "uploads/link.mp4"})
+
+    assert response.status_code == 400
+    assert client.pool.submitted == []
+
+
+def test_predict_missing_video_is_404(client):
+    response = client.get("/predict", params={"video_path": "uploads/missing.mp4"})
+
+    assert response.status_code == 404
+    assert client.pool.submitted == []
@@ -0,0 +1,89 @@
+import threading
+import time
+
+from app.async_validator import AsyncValidationPool
+
+
+class BlockingValidator:
+    """Stand-in GeminiValidator whose calls wait until `release` is set"""
+
+    def __init__(self, status="correct"):
+        self.status = status
+        self.release = threading.Event()
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def validate_detections(self, image, detections):
+        with self._lock:
+            self.calls += 1
+        self.release.wait(timeout=5)
+        return [{"status": self.status, "confidence": 0.9, "reason": "stub"} for _ in detections]
+
+
+def violations(count=1):
+    return [{"type": "No helmet", "fine": 500, "bbox": [0, 0, 10, 10]} for _ in range(count)]
+
+
+def test_submit_blocks_once_max_pending_frames_are_waiting():
+    validator = BlockingValidator()
+    pool = AsyncValidationPool(validator, lambda path, violation, result: True, max_concurrency=1, max_pending=2)
+    pool.submit("a.jpg", violations())
+    pool.submit("b.jpg", violations())
+
+    third = threading.Thread(target=pool.submit, args=("c.jpg", violations()))
+    third.start()
+    third.join(timeout=0.2)
+    assert third.is_alive()  # no slot left: detection waits instead of queueing
+
+    validator.release.set()
+    third.join(timeout=5)
+    assert not third.is_alive()
+    pool.close(wait=True)
+    assert validator.calls == 3
+    assert pool.pending() == 0
+
+
+def test_concurrency_is_limited():
+    validator = BlockingValidator()
+    pool = AsyncValidationPool(validator, lambda path, violation, result: True, max_concurrency=2, max_pending=8)
+    for i in range(5):
+        pool.submit(f"{i}.jpg", violations())
+    time.sleep(0.2)
+    assert validator.calls == 2
+    assert pool.pending() == 5
+
+    validator.release.set()
+    pool.close(wait=True)
+    assert validator.calls == 5
+
+
+def test_results_are_counted_by_outcome():
+    handled = []
+
+    def on_result(path, violation, result):
+        handled.append((path, result["status"]))
+        return result["status"] == "correct"
+
+    for status, outcome in (("correct", "confirmed"), ("incorrect", "rejected"), ("deferred", "deferred")):
+        validator = BlockingValidator(status)
+        validator.release.set()
+        pool = AsyncValidationPool(validator, on_result, max_concurrency=2, max_pending=4)
+        pool.submit("frame.jpg", violations(3))
+        pool.close(wait=True)
+        assert pool.stats["submitted"] == 3
+        assert pool.stats[outcome] == 3
+        assert pool.pending() == 0
+    assert len(handled) == 9
+
+
+def test_validator_errors_release_their_slot():
+    class FailingValidator:
+        def validate_detections(self, image, detections):
+            raise RuntimeError("boom")
+
+    pool = AsyncValidationPool(FailingValidator(), lambda path, violation, result: True, max_concurrency=1, max_pending=1)
+    for i in range(3):
+        pool.submit(f"{i}.jpg", violations(2))  # would block forever if a failed call kept its slot
+    pool.close(wait=True)
+    assert pool.stats["errors"] == 6
+    assert pool.pending() == 0
@@ -0,0 +1,109 @@
+import json
+
+import numpy as np
+import pytest
+
+from app.gemini_validator import GeminiValidator, ValidationCache
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    """Local stand-in for the Gemini model: returns canned response texts and records the prompts"""
+
+    def __init__(self, *texts):
+        self.texts = list(texts)
+        self.prompts = []
+
+    def generate_content(self, parts, **kwargs):
+        self.prompts.append(parts[0])
+        return StubResponse(self.texts.pop(0))
+
+
+def detection_list(prompt):
+    """The numbered detections of a batch prompt"""
+    return prompt.split("The detections to validate are:")[1].split("Please analyze")[0].strip().splitlines()
+
+
+def verdict(status="correct", confidence=0.9, **extra):
+    return dict({"status": status, "confidence": confidence, "reason": "stub"}, **extra)
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 255, size=(240, 320, 3), dtype=np.uint8)
+
+
+def detections():
+    return [
+        {"type": "No helmet", "bbox": [10, 10, 60, 80]},
+        {"type": "Triple Riding", "bbox": [100, 40, 200, 160]},
+        {"type": "No-seat-belt", "bbox": [220, 100, 300, 200]},
+    ]
+
+
+def test_parse_matches_items_by_id():
+    validator = GeminiValidator(model=StubModel())
+    text = json.dumps([verdict("incorrect", id=2), verdict("correct", id=1)])
+    parsed = validator.parse_batch_response(text, 2)
+    assert [(result["status"], valid) for result, valid in parsed] == [("correct", True), ("incorrect", True)]
+
+
+def test_parse_matches_items_without_id_by_position():
+    validator = GeminiValidator(model=StubModel())
+    text = json.dumps([verdict("incorrect"), verdict("correct", 0.4)])
+    parsed = validator.parse_batch_response(text, 2)
+    assert [result["status"] for result, _ in parsed] == ["incorrect", "correct"]
+    assert parsed[1][0]["confidence"] == 0.4
+
+
+def test_parse_falls_back_per_item():
+    validator = GeminiValidator(model=StubModel())
+    text = json.dumps([verdict(id=1), {"id": 2, "status": "maybe", "confidence": 0.5, "reason": "?"}])
+    parsed = validator.parse_batch_response(text, 3)
+    assert parsed[0] == (verdict(), True)
+    assert parsed[1][1] is False and parsed[1][0]["confidence"] == 0.7  # invalid status: text fallback
+    assert parsed[2][1] is False  # missing item
+
+
+def test_parse_falls_back_for_every_item_when_not_an_array():
+    validator = GeminiValidator(model=StubModel())
+    parsed = validator.parse_batch_response("The detections look correct.", 3)
+    assert [(result["status"], valid) for result, valid in parsed] == [("correct", False)] * 3
+
+
+def test_one_request_for_all_detections_of_a_frame(frame):
+    model = StubModel(json.dumps([verdict("correct", id=1), verdict("incorrect", id=2), verdict("correct", id=3)]))
+    validator = GeminiValidator(model=model)
+    results = validator.validate_detections(frame, detections())
+    assert len(model.prompts) == 1
+    assert [result["status"] for result in results] == ["correct", "incorrect", "correct"]
+    assert [line.split(" at ")[0] for line in detection_list(model.prompts[0])] == [
+        '1. "No helmet"', '2. "Triple Riding"', '3. "No-seat-belt"']
+
+
+def test_cached_detections_are_not_sent_again(frame):
+    model = StubModel(json.dumps([verdict("correct", id=1), verdict("incorrect", id=2), verdict("correct", id=3)]),
+                      json.dumps([verdict("incorrect", id=1)]))
+    validator = GeminiValidator(model=model, cache=ValidationCache(max_distance=0))
+    validator.validate_detections(frame, detections())
+
+    changed = detections()
+    changed[2]["type"] = "No helmet"  # same region, other type: not cached
+    results = validator.validate_detections(frame, changed)
+    assert len(model.prompts) == 2
+    assert [line.split(" at ")[0] for line in detection_list(model.prompts[1])] == ['1. "No helmet"']
+    assert [result["status"] for result in results] == ["correct", "incorrect", "incorrect"]
+
+
+def test_model_errors_accept_every_detection(frame):
+    class FailingModel:
+        def generate_content(self, parts, **kwargs):
+            raise RuntimeError("boom")
+
+    results = GeminiValidator(model=FailingModel()).validate_detections(frame, detections())
+    assert [(result["status"], result["confidence"]) for result in results] == [("correct", 0.5)] * 3
@@ -0,0 +1,152 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.clips import ClipRecorder, FrameRingBuffer, create_clip_recorder
+
+
+def frame(value, shape=(96, 128, 3)):
+    return np.full(shape, value % 256, dtype=np.uint8)
+
+
+@pytest.fixture
+def recorder(tmp_path, monkeypatch):
+    """ClipRecorder at 10 fps (3 frames before, 2 after) whose encoder records instead of writing video"""
+    encoded = []
+
+    def fake_encode(self, job):
+        if job.frames is None or not len(job.frames):
+            outcome = "failed"
+        else:
+            encoded.append((job.path, job.frames[:, 0, 0, 0].tolist()))
+            open(job.path, "wb").close()
+            outcome = "encoded"
+        self._finish(job, outcome)
+
+    monkeypatch.setattr(ClipRecorder, "_encode", fake_encode)
+    recorder = ClipRecorder(10, pre_sec=0.3, post_sec=0.2, width=64, max_pending=2, clip_dir=str(tmp_path))
+    recorder.encoded = encoded
+    yield recorder
+    if recorder._encoder.is_alive():
+        recorder.close()
+
+
+def push(recorder, count):
+    for _ in range(count):
+        recorder.push(frame(recorder.frame_index + 1))
+
+
+def test_ring_buffer_keeps_the_latest_frames_in_order():
+    buffer = FrameRingBuffer(4, width=64)
+    for i in range(6):
+        buffer.push(frame(i), i)
+    frames = buffer.copy_range(0, 10)
+    assert frames.shape == (4, 48, 64, 3)
+    assert frames[:, 0, 0, 0].tolist() == [2, 3, 4, 5]
+    assert not np.shares_memory(frames, buffer.frames)
+
+
+def test_confirmed_clip_covers_pre_and_post_frames(recorder):
+    push(recorder, 10)  # frames 0..9
+    job = recorder.request()
+    paths = []
+    job.when_encoded(paths.append)
+    job.confirm()
+    push(recorder, 2)  # post-event frames 10, 11
+    recorder._encode_queue.join()
+    assert recorder.encoded == [(job.path, [6, 7, 8, 9, 10, 11])]
+    assert paths == [job.path] and os.path.exists(job.path)
+
+
+def test_clip_is_dropped_only_when_every_verdict_rejects(recorder):
+    push(recorder, 5)
+    job = recorder.request(verdicts=2)
+    results = []
+    job.when_encoded(results.append)
+    job.discard()
+    assert job.decision is None  # one violation of the frame is still pending
+    job.discard()
+    assert job.decision == "discarded" and results == [None]
+    push(recorder, 3)
+    recorder._encode_queue.join()
+    assert recorder.encoded == [] and recorder.stats["discarded"] == 1
+
+
+def test_one_confirmation_keeps_a_shared_clip(recorder):
+    push(recorder, 5)
+    job = recorder.request(verdicts=3)
+    job.discard()
+    job.confirm()
+    job.discard()  # decided already
+    push(recorder, 2)
+    recorder._encode_queue.join()
+    assert [path for path, _ in recorder.encoded] == [job.path]
+
+
+def test_max_pending_caps_held_clips(recorder):
+    push(recorder, 5)
+    first, second = recorder.request(), recorder.request()
+    assert recorder.request() is None
+    assert recorder.stats["skipped"] == 1
+    first.discard()
+    assert recorder.request() is not None
+    second.discard()
+
+
+def test_when_encoded_after_the_fact_runs_immediately(recorder):
+    push(recorder, 5)
+    job = recorder.request()
+    job.discard()
+    results = []
+    job.when_encoded(results.append)
+    assert results == [None]
+
+
+def test_failed_encode_reports_no_path(recorder, monkeypatch):
+    push(recorder, 5)
+    job = recorder.request()
+    monkeypatch.setattr(recorder.buffer, "copy_range", lambda first, last: np.empty((0, 48, 64, 3), np.uint8))
+    results = []
+    job.when_encoded(results.append)
+    job.confirm()
+    push(recorder, 2)
+    recorder._encode_queue.join()
+    assert results == [None] and recorder.stats["failed"] == 1
+
+
+def test_close_encodes_confirmed_and_drops_undecided_clips(recorder):
+    push(recorder, 5)
+    confirmed, undecided = recorder.request(), recorder.request()
+    results = {}
+    confirmed.when_encoded(lambda path: results.setdefault("confirmed", path))
+    undecided.when_encoded(lambda path: results.setdefault("undecided", path))
+    confirmed.confirm()
+    push(recorder, 1)  # the stream ends before the post-event frames
+    recorder.close()
+    assert results == {"confirmed": confirmed.path, "undecided": None}
+    assert recorder.encoded == [(confirmed.path, [1, 2, 3, 4, 5])]
+    assert recorder.stats["encoded"] == 1 and recorder.stats["discarded"] == 1
+    assert not recorder._encoder.is_alive()
+
+
+def test_real_encoder_writes_a_video(tmp_path):
+    recorder = ClipRecorder(10, pre_sec=0.2, post_sec=0.1, width=64, clip_dir=str(tmp_path), codec="MJPG",
+                            extension=".avi")
+    push(recorder, 4)
+    job = recorder.request()
+    paths = []
+    job.when_encoded(paths.append)
+    job.confirm()
+    push(recorder, 1)
+    recorder.close()
+    if recorder.stats["failed"]:
+        pytest.skip("no MJPG video writer in this OpenCV build")
+    assert paths == [job.path] and os.path.getsize(job.path) > 0
+
+
+def test_create_clip_recorder_is_off_unless_enabled():
+    assert create_clip_recorder({}, 25) is None
+    recorder = create_clip_recorder({"clips": {"enabled": True, "pre_sec": 1, "post_sec": 1, "width": 64}}, 0)
+    assert recorder.fps == 15.0 and recorder.pre_frames == 15
+    recorder.close()
@@ -0,0 +1,132 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from app.dbpool import ConnectionPool, PoolTimeout
+
+
+class StubConnection:
+    """Minimal DB-API connection that can be made to fail its health check"""
+
+    def __init__(self):
+        self.alive = True
+        self.closed = False
+        self.rollbacks = 0
+
+    def ping(self, reconnect=False):
+        if not self.alive:
+            raise ConnectionError("server has gone away")
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+class StubConnector:
+    def __init__(self):
+        self.connections = []
+
+    def __call__(self):
+        con = StubConnection()
+        self.connections.append(con)
+        return con
+
+
+def test_connections_are_reused():
+    connect = StubConnector()
+    pool = ConnectionPool(connect, size=2)
+    for _ in range(3):
+        with pool.connection() as con:
+            assert con is connect.connections[0]
+    stats = pool.stats()
+    assert stats["checkouts"] == 3 and stats["open"] == 1 and stats["in_use"] == 0
+
+
+def test_checkout_waits_for_a_returned_connection():
+    pool = ConnectionPool(StubConnector(), size=1, max_wait_sec=2)
+    borrowed = threading.Event()
+
+    def hold():
+        with pool.connection():
+            borrowed.set()
+            time.sleep(0.1)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    borrowed.wait()
+    with pool.connection():
+        pass
+    holder.join()
+    stats = pool.stats()
+    assert stats["waits"] == 1 and stats["max_wait_ms"] >= 50 and stats["open"] == 1
+
+
+def test_checkout_times_out_when_the_pool_is_exhausted():
+    pool = ConnectionPool(StubConnector(), size=1, max_wait_sec=0.05)
+    with pool.connection():
+        with pytest.raises(PoolTimeout):
+            with pool.connection():
+                pass
+    assert pool.stats()["timeouts"] == 1
+
+
+def test_dead_idle_connection_is_replaced():
+    connect = StubConnector()
+    pool = ConnectionPool(connect, size=1, health_check_sec=0)
+    with pool.connection() as con:
+        pass
+    con.alive = False
+    time.sleep(0.01)
+    with pool.connection() as replacement:
+        assert replacement is not con
+    assert con.closed
+    stats = pool.stats()
+    assert stats["health_check_failures"] == 1 and stats["open"] == 1
+
+
+def test_error_rolls_back_and_returns_the_connection():
+    pool = ConnectionPool(StubConnector(), size=1)
+    with pytest.raises(ValueError):
+        with pool.connection() as con:
+            raise ValueError("query failed")
+    assert con.rollbacks == 1
+    assert pool.stats()["in_use"] == 0
+
+
+def test_invalidated_connection_is_closed_on_return():
+    connect = StubConnector()
+    pool = ConnectionPool(connect, size=1)
+    with pool.connection() as con:
+        pool.invalidate(con)
+    assert con.closed
+    with pool.connection() as other:
+        assert other is not con
+    assert pool.stats()["open"] == 1
+
+
+def test_sqlite_health_check_and_shared_use(tmp_path):
+    path = str(tmp_path / "pool.db")
+    pool = ConnectionPool(lambda: sqlite3.connect(path, check_same_thread=False), size=2, health_check_sec=0)
+    with pool.connection() as con:
+        con.execute("CREATE TABLE t (x INTEGER)")
+        con.commit()
+
+    def insert(value):
+        with pool.connection() as con:
+            con.execute("INSERT INTO t VALUES (?)", (value,))
+            con.commit()
+
+    threads = [threading.Thread(target=insert, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with pool.connection() as con:
+        assert con.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 8
+    assert pool.stats()["open"] <= 2
+    pool.close()
+    assert pool.stats()["open"] == 0
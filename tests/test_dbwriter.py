@@ -0,0 +1,121 @@
+import threading
+import time
+
+import pytest
+
+from app.dbwriter import ViolationWriter
+
+
+class StubInsert:
+    """insert_many stand-in recording each batch, optionally failing the first calls"""
+
+    def __init__(self, failures=0):
+        self.batches = []
+        self.failures = failures
+        self._lock = threading.Lock()
+
+    def __call__(self, rows):
+        with self._lock:
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError("database unavailable")
+            self.batches.append(list(rows))
+        return len(rows)
+
+    @property
+    def rows(self):
+        with self._lock:
+            return [row for batch in self.batches for row in batch]
+
+
+def write(writer, count, start=0):
+    for i in range(start, start + count):
+        writer.write(f"crops/{i}.jpg", "No helmet", 1000)
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+def test_reaching_batch_rows_triggers_a_flush():
+    insert = StubInsert()
+    writer = ViolationWriter(insert, batch_rows=5, flush_ms=10_000)
+    write(writer, 4)
+    time.sleep(0.1)
+    assert insert.rows == [] and writer.pending() == 4
+    write(writer, 1, start=4)
+    assert wait_for(lambda: len(insert.rows) == 5)  # long before flush_ms
+    assert len(insert.batches) == 1 and writer.pending() == 0
+    writer.close()
+
+
+def test_partial_batches_are_flushed_after_flush_ms():
+    insert = StubInsert()
+    writer = ViolationWriter(insert, batch_rows=100, flush_ms=50)
+    write(writer, 3)
+    assert insert.rows == []
+    assert wait_for(lambda: len(insert.rows) == 3, timeout=1.0)
+    assert len(insert.batches) == 1
+    writer.close()
+
+
+def test_close_writes_every_buffered_row_in_order():
+    insert = StubInsert()
+    writer = ViolationWriter(insert, batch_rows=1000, flush_ms=10_000)
+    write(writer, 7)
+    writer.close()
+    assert [row[1] for row in insert.rows] == [f"crops/{i}.jpg" for i in range(7)]
+    assert writer.pending() == 0
+
+    write(writer, 1, start=7)  # closed writers write straight through
+    assert len(insert.rows) == 8
+
+
+def test_synchronous_mode_writes_each_row_immediately():
+    insert = StubInsert()
+    writer = ViolationWriter(insert, synchronous=True)
+    write(writer, 3)
+    assert [len(batch) for batch in insert.batches] == [1, 1, 1]
+    assert writer.pending() == 0
+    assert writer.stats == {"rows_written": 3, "flushes": 3, "failures": 0}
+
+
+def test_failed_flush_keeps_its_rows():
+    insert = StubInsert(failures=1)
+    writer = ViolationWriter(insert, batch_rows=1000, flush_ms=10_000)
+    write(writer, 4)
+    with pytest.raises(ConnectionError):
+        writer.flush()
+    assert writer.pending() == 4
+    write(writer, 1, start=4)
+    assert writer.flush() == 5
+    assert [row[1] for row in insert.rows] == [f"crops/{i}.jpg" for i in range(5)]
+    assert writer.stats["failures"] == 1
+    writer.close()
+
+
+def test_rows_are_timestamped_and_carry_the_clip_path():
+    insert = StubInsert()
+    writer = ViolationWriter(insert, synchronous=True)
+    writer.write("crops/a.jpg", "Triple Riding", 2000, clip_path="crops/clips/a.mp4")
+    ts_utc, file_path, violation_type, fine, clip_path = insert.rows[0]
+    assert ts_utc and (file_path, violation_type, fine, clip_path) == (
+        "crops/a.jpg", "Triple Riding", 2000, "crops/clips/a.mp4")
+
+
+@pytest.mark.parametrize("synchronous", [False, True])
+def test_stats_are_exact_under_concurrent_writers(synchronous):
+    insert = StubInsert()
+    writer = ViolationWriter(insert, batch_rows=7, flush_ms=5, synchronous=synchronous)
+    threads = [threading.Thread(target=write, args=(writer, 2000)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.close()
+    stats = writer.stats
+    assert stats["rows_written"] == len(insert.rows) == 8000
+    assert stats["flushes"] == len(insert.batches)
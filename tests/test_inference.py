@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from app.inference import ExportedModel
+
+
+class StubExportedModel(ExportedModel):
+    """Exported model whose graph returns one canned prediction per image"""
+
+    def __init__(self, prediction, **kwargs):
+        super().__init__({0: "helmet", 1: "no helmet"}, **kwargs)
+        self.prediction = prediction
+        self.batches = []
+
+    def run(self, batch):
+        self.batches.append(batch.shape)
+        return np.stack([self.prediction] * len(batch))
+
+
+def yolo_output(rows, anchors=8, classes=2):
+    """Raw YOLOv8 output (4 + classes, anchors) with the given (cx, cy, w, h, class, score) rows"""
+    prediction = np.zeros((4 + classes, anchors), dtype=np.float32)
+    for i, (cx, cy, w, h, cls, score) in enumerate(rows):
+        prediction[:4, i] = (cx, cy, w, h)
+        prediction[4 + cls, i] = score
+    return prediction
+
+
+def test_exported_model_requires_run():
+    class NoRun(ExportedModel):
+        pass
+
+    with pytest.raises(TypeError):
+        NoRun({0: "helmet"})
+
+
+def test_predict_batches_frames_of_the_same_shape():
+    model = StubExportedModel(yolo_output([(320, 320, 64, 64, 1, 0.9), (100, 100, 20, 20, 0, 0.1)]),
+                              imgsz=640, dynamic=False)
+    frames = [np.zeros((640, 640, 3), dtype=np.uint8)] * 3
+
+    results = model.predict(frames, conf=0.25)
+
+    assert model.batches == [(3, 3, 640, 640)]
+    assert len(results) == 3
+    for result in results:
+        assert len(result.boxes) == 1
+        assert result.boxes.cls.tolist() == [1.0]
+        np.testing.assert_allclose(result.boxes.xyxy, [[288, 288, 352, 352]])
+        assert result.names[1] == "no helmet"
@@ -0,0 +1,29 @@
+import pytest
+
+from app.metrics import Counter, Histogram, Metric, Registry
+
+
+def test_metric_requires_new_child():
+    class NoChild(Metric):
+        kind = "counter"
+
+    with pytest.raises(TypeError):
+        NoChild("traffic_test_total", "Test", registry=Registry())
+
+
+def test_render_counters_and_histograms():
+    registry = Registry()
+    frames = Counter("traffic_test_frames_total", "Frames", ["source"], registry=registry)
+    latency = Histogram("traffic_test_seconds", "Latency", registry=registry, buckets=(0.1, 1.0))
+
+    frames.labels(source="camera").inc()
+    frames.labels(source="camera").inc(2)
+    latency.observe(0.5)
+
+    text = registry.render()
+
+    assert "# TYPE traffic_test_frames_total counter" in text
+    assert 'traffic_test_frames_total{source="camera"} 3' in text
+    assert 'traffic_test_seconds_bucket{le="0.1"} 0' in text
+    assert 'traffic_test_seconds_bucket{le="1.0"} 1' in text
+    assert "traffic_test_seconds_count 1" in text
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from app.motion import MotionGate, create_motion_gate
+from app.pipeline import FramePipeline
+
+
+def scene(moving_x=None, size=(120, 160)):
+    """Static grey background, optionally with a bright 16x16 object at moving_x"""
+    frame = np.full((*size, 3), 90, dtype=np.uint8)
+    if moving_x is not None:
+        frame[50:66, moving_x:moving_x + 16] = 250
+    return frame
+
+
+@pytest.fixture
+def counting_gate(monkeypatch):
+    gate = MotionGate(diff_threshold=0.5, max_stride=8, max_skip_frames=1000)
+    gate.checks = 0
+    thumbnail = gate._thumbnail
+
+    def counted(frame):
+        gate.checks += 1
+        return thumbnail(frame)
+
+    monkeypatch.setattr(gate, "_thumbnail", counted)
+    return gate
+
+
+def test_static_scene_backs_off_to_max_stride(counting_gate):
+    decisions = [counting_gate.should_infer(scene()) for _ in range(40)]
+    assert decisions[0] and not any(decisions[1:])
+    # Re-checked on frames 1, 2, 4, 8, 16, 24, 32, 40: the stride doubles up to 8
+    assert counting_gate.checks == 8
+    assert counting_gate.frames_skipped == 39
+
+
+def test_motion_resets_the_stride(counting_gate):
+    for _ in range(8):
+        counting_gate.should_infer(scene())  # stride is now 8, next check on frame 16
+    decisions = [counting_gate.should_infer(scene(moving_x=10 + 4 * i)) for i in range(8)]
+    assert decisions == [False] * 7 + [True]  # motion is only seen at the next check
+    assert counting_gate.should_infer(scene(moving_x=60))  # stride back to 1: checked right away
+    assert counting_gate.last_score >= 0.5
+
+
+def test_small_moving_object_counts_as_motion():
+    gate = MotionGate(diff_threshold=0.5)
+    assert gate.should_infer(scene(moving_x=10))
+    assert gate.should_infer(scene(moving_x=30))  # about 2% of the thumbnail changed
+    assert 0.5 <= gate.last_score < 10
+
+
+def test_sensor_noise_is_not_motion():
+    rng = np.random.default_rng(0)
+    gate = MotionGate(diff_threshold=0.5, max_stride=1)
+    gate.should_infer(scene())
+    noisy = [np.clip(scene().astype(np.int16) + rng.integers(-6, 7, (120, 160, 3)), 0, 255).astype(np.uint8)
+             for _ in range(10)]
+    assert not any(gate.should_infer(frame) for frame in noisy)
+
+
+def test_frame_is_forced_after_max_skip_frames():
+    gate = MotionGate(max_stride=4, max_skip_frames=5)
+    decisions = [gate.should_infer(scene()) for _ in range(13)]
+    assert [i for i, infer in enumerate(decisions) if infer] == [0, 6, 12]
+    assert "3 inferred, 10 skipped" in gate.summary()
+
+
+def test_create_motion_gate_reads_config():
+    assert create_motion_gate({}) is None
+    gate = create_motion_gate({"motion_gate": {"enabled": True, "diff_threshold": 2.0, "max_stride": 4}})
+    assert gate.diff_threshold == 2.0 and gate.max_stride == 4
+
+
+class FakeCapture:
+    """cv2.VideoCapture stand-in replaying a list of frames"""
+
+    def __init__(self, frames):
+        self.frames = list(frames)
+
+    def read(self):
+        if not self.frames:
+            return False, None
+        return True, self.frames.pop(0)
+
+
+def test_pipeline_passes_gated_frames_through_without_inference():
+    frames = [scene()] * 6 + [scene(moving_x=10 + 8 * i) for i in range(6)]
+    inferred = []
+
+    def infer(batch):
+        inferred.append(len(batch))
+        return [{"boxes": []} for _ in batch]
+
+    gate = MotionGate(max_stride=1)
+    pipeline = FramePipeline(FakeCapture(frames), infer, batch_size=4, gate=gate).start()
+    items = list(pipeline)
+    pipeline.stop()
+
+    assert [index for index, _, _, _ in items] == list(range(12))
+    assert [results is not None for _, _, _, results in items] == [True] + [False] * 5 + [True] * 6
+    assert all(frame is not None for _, _, frame, _ in items)  # skipped frames still reach display and clips
+    assert sum(inferred) == 7 == gate.frames_inferred
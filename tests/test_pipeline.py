@@ -0,0 +1,82 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from app.pipeline import FramePipeline
+
+
+class FakeCapture:
+    """cv2.VideoCapture stand-in yielding synthetic frames whose pixels hold their index"""
+
+    def __init__(self, count=None, delay_sec=0.0):
+        self.count = count
+        self.delay_sec = delay_sec
+        self.index = 0
+
+    def read(self):
+        if self.count is not None and self.index >= self.count:
+            return False, None
+        time.sleep(self.delay_sec)
+        frame = np.full((8, 8, 3), self.index % 256, dtype=np.uint8)
+        self.index += 1
+        return True, frame
+
+
+def infer_ids(batches):
+    """infer_fn recording its batches and returning each frame's index as its result"""
+    def infer(frames):
+        batches.append([int(frame[0, 0, 0]) for frame in frames])
+        time.sleep(0.001 * len(frames))
+        return [{"frame": int(frame[0, 0, 0])} for frame in frames]
+    return infer
+
+
+@pytest.mark.parametrize("batch_size", [1, 3, 8])
+def test_frames_come_out_in_decode_order(batch_size):
+    batches = []
+    pipeline = FramePipeline(FakeCapture(50), infer_ids(batches), batch_size=batch_size, queue_size=2).start()
+    items = list(pipeline)
+    pipeline.stop()
+    assert [index for index, _, _, _ in items] == list(range(50))
+    assert all(results == {"frame": index} for index, _, _, results in items)
+    assert all(len(batch) <= batch_size for batch in batches)
+    assert pipeline.frames_decoded == 50
+
+
+def test_stop_mid_stream_ends_iteration_and_threads():
+    pipeline = FramePipeline(FakeCapture(None, delay_sec=0.001), infer_ids([]), queue_size=2).start()
+    seen = []
+    for index, _, _, _ in pipeline:
+        seen.append(index)
+        if len(seen) == 5:
+            threading.Timer(0.01, pipeline.stop).start()
+    assert seen[:5] == list(range(5)) and seen == list(range(len(seen)))
+    time.sleep(0.05)
+    assert not any(thread.is_alive() for thread in pipeline._threads)
+
+
+def test_should_stop_ends_the_stream():
+    capture = FakeCapture(None)
+    pipeline = FramePipeline(capture, infer_ids([]), should_stop=lambda: capture.index >= 7).start()
+    assert len(list(pipeline)) == 7
+    pipeline.stop()
+
+
+def test_inference_errors_are_raised_to_the_caller():
+    def failing(frames):
+        raise RuntimeError("model crashed")
+
+    pipeline = FramePipeline(FakeCapture(10), failing).start()
+    with pytest.raises(RuntimeError, match="model crashed"):
+        list(pipeline)
+    pipeline.stop()
+
+
+def test_queues_stay_bounded_behind_a_slow_consumer():
+    pipeline = FramePipeline(FakeCapture(40), infer_ids([]), batch_size=2, queue_size=3).start()
+    for _ in pipeline:
+        time.sleep(0.002)
+    pipeline.stop()
+    assert pipeline.peak_depths["decode"] <= 3 and pipeline.peak_depths["inference"] <= 3
@@ -0,0 +1,155 @@
+import time
+from collections import defaultdict
+
+import cv2
+import numpy as np
+import pytest
+
+from app.detector import VIOLATION_STYLES, create_postprocessor, match_violations
+from app.inference import Boxes, Results
+from app.tracker import ViolationTracker
+from app.utils import process_frame
+
+FINES = {"triple riding": 2000, "No-seat-belt": 1000, "0": 1000}
+NAMES = {
+    "main": {0: "no helmet"},
+    "helmet": {0: "helmet", 1: "Triple Riding", 2: "rider"},
+    "seatbelt": {0: "seatbelt", 1: "No-seat-belt"},
+}
+
+
+class StubModel:
+    """Loaded model stand-in: class names plus canned predict() results"""
+
+    def __init__(self, names, results=()):
+        self.names = names
+        self.results = list(results)
+
+    def predict(self, frame, conf=None):
+        return [self.results.pop(0)]
+
+
+def random_results(rng, names, max_boxes=12):
+    count = int(rng.integers(0, max_boxes + 1))
+    xy = rng.uniform(0, 600, size=(count, 2)).astype(np.float32)
+    wh = rng.uniform(10, 120, size=(count, 2)).astype(np.float32)
+    boxes = Boxes(np.hstack([xy, xy + wh]), rng.uniform(0.25, 1.0, size=count).astype(np.float32),
+                  rng.integers(0, len(names), size=count).astype(np.float32))
+    return Results(boxes, names, (720, 720))
+
+
+def reference_match_violations(frame_results, models, fines, tracker):
+    """The per-box post-processing loop this series replaced"""
+    candidates = defaultdict(list)
+    for box in frame_results["main"].boxes:
+        candidates[str(int(box.cls[0]))].append(box.xyxy[0].tolist())
+    for name, key in (("helmet", "triple riding"), ("seatbelt", "No-seat-belt")):
+        class_names = models[name].names
+        for box in frame_results[name].boxes:
+            cls_id = int(box.cls[0])
+            cls_name = class_names[cls_id] if cls_id in class_names else str(cls_id)
+            if cls_name.lower() == key.lower():
+                candidates[key].append(box.xyxy[0].tolist())
+
+    violations_in_frame = []
+    for violation_key, (violation_type, _, _) in VIOLATION_STYLES.items():
+        if violation_key not in fines:
+            continue
+        boxes = candidates.get(violation_key, [])
+        for index, track_id in tracker.new_violations(violation_key, boxes):
+            violations_in_frame.append({'type': violation_type, 'fine': fines[violation_key],
+                                        'bbox': boxes[index], 'track_id': track_id})
+    return violations_in_frame
+
+
+def reference_process_frame(frame, models, config, last_detection_time, fines):
+    """utils.process_frame before vectorization"""
+    violations = []
+    now = time.time()
+    for model, tag in models:
+        results = model.predict(frame, conf=config["conf_thresholds"][tag])
+        for r in results:
+            for box in r.boxes:
+                cls_name = r.names[int(box.cls[0])]
+                if cls_name not in fines:
+                    continue
+                if now - last_detection_time.get(cls_name, 0) < config.get("cooldown_sec", 10):
+                    continue
+                last_detection_time[cls_name] = now
+                xyxy = box.xyxy[0].tolist()
+                violations.append({"type": cls_name, "bbox": xyxy, "fine": fines[cls_name]})
+                x1, y1, x2, y2 = map(int, xyxy)
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
+                cv2.putText(frame, cls_name, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 255), 2)
+    return frame, violations
+
+
+def assert_same_violations(new, old):
+    assert len(new) == len(old)
+    for a, b in zip(new, old):
+        assert {k: v for k, v in a.items() if k != "bbox"} == {k: v for k, v in b.items() if k != "bbox"}
+        assert a["bbox"] == pytest.approx(b["bbox"])
+
+
+def test_match_violations_matches_the_per_box_loop():
+    rng = np.random.default_rng(7)
+    models = {name: StubModel(names) for name, names in NAMES.items()}
+    postprocessor = create_postprocessor(models, FINES)
+    new_tracker, old_tracker = ViolationTracker(max_age=3), ViolationTracker(max_age=3)
+
+    reported = 0
+    for _ in range(200):
+        frame_results = {name: random_results(rng, names) for name, names in NAMES.items()}
+        new = match_violations(frame_results, postprocessor, FINES, new_tracker)
+        old = reference_match_violations(frame_results, models, FINES, old_tracker)
+        assert_same_violations(new, old)
+        reported += len(new)
+    assert reported > 0
+
+
+def test_missing_fines_are_not_reported():
+    rng = np.random.default_rng(3)
+    fines = {"0": 1000}
+    models = {name: StubModel(names) for name, names in NAMES.items()}
+    postprocessor = create_postprocessor(models, fines)
+    for _ in range(20):
+        frame_results = {name: random_results(rng, names) for name, names in NAMES.items()}
+        for violation in match_violations(frame_results, postprocessor, fines, ViolationTracker()):
+            assert violation["type"] == "No helmet"
+
+
+@pytest.mark.parametrize("config", [
+    {"conf_thresholds": {"a": 0.25, "b": 0.4}},  # cooldown_sec no longer in config.yaml: default 10s
+    {"conf_thresholds": {"a": 0.25, "b": 0.4}, "cooldown_sec": 2},
+    {"conf_thresholds": {"a": 0.25, "b": 0.4}, "cooldown_sec": 0},
+])
+def test_process_frame_matches_the_per_box_loop(config, monkeypatch):
+    names = {0: "helmet", 1: "triple riding", 2: "No-seat-belt", 3: "rider"}
+    fines = {"triple riding": 2000, "No-seat-belt": 1000}
+    rng = np.random.default_rng(11)
+    calls = [[random_results(rng, names, max_boxes=6) for _ in range(2)] for _ in range(60)]
+
+    clock = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: clock[0])
+
+    new_models = [(StubModel(names, [c[0] for c in calls]), "a"), (StubModel(names, [c[1] for c in calls]), "b")]
+    old_models = [(StubModel(names, [c[0] for c in calls]), "a"), (StubModel(names, [c[1] for c in calls]), "b")]
+    new_times, old_times = {}, {}
+    reported = 0
+    for _ in calls:
+        new_frame = np.zeros((720, 720, 3), dtype=np.uint8)
+        old_frame = new_frame.copy()
+        _, new = process_frame(new_frame, new_models, config, new_times, fines)
+        _, old = reference_process_frame(old_frame, old_models, config, old_times, fines)
+        assert_same_violations(new, old)
+        assert np.array_equal(new_frame, old_frame)
+        assert new_times == old_times
+        reported += len(new)
+        clock[0] += 0.5
+
+    if config.get("cooldown_sec", 10) > 0:
+        # Cooldown: each class at most once per cooldown window
+        window = config.get("cooldown_sec", 10) / 0.5
+        assert 0 < reported <= 2 * (len(calls) / window + 1)
+    else:
+        assert reported > len(calls)
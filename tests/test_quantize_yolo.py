@@ -0,0 +1,68 @@
+import sys
+import types
+
+import numpy as np
+import pytest
+
+import quantize_yolo
+
+
+class StubMetrics:
+    """Box metrics laid out like ultralytics' DetMetrics.box: scalars plus per-class arrays"""
+    map50 = 0.81
+    map = 0.52
+    mp = 0.77
+    mr = 0.69
+    f1 = np.array([0.70, 0.74])
+    ap50 = np.array([0.80, 0.82])
+
+
+class StubYOLO:
+    calls = []
+
+    def __init__(self, path):
+        self.path = path
+
+    def val(self, **kwargs):
+        StubYOLO.calls.append((self.path, kwargs))
+        return types.SimpleNamespace(box=StubMetrics())
+
+
+@pytest.fixture
+def model_file(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "ultralytics", types.SimpleNamespace(YOLO=StubYOLO))
+    monkeypatch.setattr(quantize_yolo, "OnnxRuntimeModel", lambda path, threads=None, imgsz=640: None)
+    monkeypatch.setattr(quantize_yolo, "measure_speed", lambda model, frames, batch_size, runs: {
+        "latency_ms_p50": 10.0, "latency_ms_p95": 12.0, "throughput_fps": 90.0})
+    StubYOLO.calls = []
+    path = tmp_path / "best.640.int8.onnx"
+    path.write_bytes(b"\0" * 2_000_000)
+    data = tmp_path / "data.yaml"
+    data.write_text("val: images\n")
+    return str(path), str(data)
+
+
+def test_evaluate_variant_reports_accuracy(model_file):
+    path, data = model_file
+    report = quantize_yolo.evaluate_variant(path, data, 480, frames=[], threads=2, batch_size=4, runs=5)
+    assert report["map50"] == pytest.approx(0.81)
+    assert report["map50_95"] == pytest.approx(0.52)
+    assert report["precision"] == pytest.approx(0.77)
+    assert report["recall"] == pytest.approx(0.69)
+    assert report["size_mb"] == pytest.approx(2.0)
+    assert report["latency_ms_p50"] == 10.0
+    assert StubYOLO.calls == [(path, {"data": data, "imgsz": 480})]
+
+
+def test_evaluate_variant_without_data_only_times(model_file):
+    path, _ = model_file
+    report = quantize_yolo.evaluate_variant(path, None, 640, frames=[], threads=None, batch_size=4, runs=5)
+    assert "map50" not in report and report["throughput_fps"] == 90.0
+    assert StubYOLO.calls == []
+
+
+def test_print_report_compares_variants(model_file, capsys):
+    path, data = model_file
+    variant = quantize_yolo.evaluate_variant(path, data, 640, frames=[], threads=None, batch_size=4, runs=5)
+    quantize_yolo.print_report({"main": {"fp32": dict(variant, map50=0.83), "int8": variant}})
+    assert "mAP50 -0.0200" in capsys.readouterr().out
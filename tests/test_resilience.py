@@ -0,0 +1,178 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from app.gemini_validator import GeminiValidator, ValidationUnavailable
+from app.resilience import CircuitBreaker, TokenBucket
+
+VERDICT = '{"status": "correct", "confidence": 0.9, "reason": "stub"}'
+
+
+class StubResponse:
+    text = VERDICT
+
+
+class FlakyModel:
+    """Local stand-in for Gemini that fails, or answers after `latency_sec`, on demand"""
+
+    def __init__(self, fail=False, latency_sec=0.0):
+        self.fail = fail
+        self.latency_sec = latency_sec
+        self.started = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, parts, **kwargs):
+        with self._lock:
+            self.started += 1
+        time.sleep(self.latency_sec)
+        if self.fail:
+            raise RuntimeError("injected failure")
+        return StubResponse()
+
+
+@pytest.fixture
+def frame():
+    return np.full((120, 160, 3), 128, dtype=np.uint8)
+
+
+def test_breaker_opens_and_lets_one_trial_through_after_reset():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout_sec=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()  # the trial call
+    assert breaker.state == "half_open" and not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_failed_trial_opens_the_breaker_again():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout_sec=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and breaker.times_opened == 2
+
+
+def test_token_bucket_limits_the_rate():
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.acquire() and bucket.acquire()
+    assert not bucket.acquire(timeout=0.01)
+    assert bucket.acquire(timeout=0.2)
+
+
+def test_open_breaker_uses_the_degraded_policy(frame):
+    model = FlakyModel(fail=True)
+    validator = GeminiValidator(model=model, breaker_failures=2, breaker_reset_sec=60, degraded_policy="reject")
+    for _ in range(2):
+        assert validator.validate_detection(frame, "No helmet")["confidence"] == 0.5  # error: accepted
+    result = validator.validate_detection(frame, "No helmet")
+    assert result["status"] == "incorrect"
+    assert model.started == 2
+    assert validator.health()["short_circuited"] == 1
+
+
+def test_deferred_detections_are_revalidated_once_the_breaker_resets(frame):
+    model = FlakyModel(fail=True)
+    validator = GeminiValidator(model=model, breaker_failures=1, breaker_reset_sec=0.05, degraded_policy="queue")
+    validator.validate_detection(frame, "No helmet")  # opens the breaker
+    for violation_type in ("No helmet", "Triple Riding"):
+        assert validator.validate_detection(frame, violation_type)["status"] == "deferred"
+    assert len(validator.deferred) == 2
+
+    # Still open: nothing is retried or lost
+    handled = []
+    assert validator.revalidate_deferred(lambda detection, result: handled.append((detection, result))) == 0
+    assert len(validator.deferred) == 2
+
+    model.fail = False
+    time.sleep(0.06)
+    assert validator.revalidate_deferred(lambda detection, result: handled.append((detection, result))) == 2
+    assert [(detection["type"], result["status"]) for detection, result in handled] == [
+        ("No helmet", "correct"), ("Triple Riding", "correct")]
+    assert validator.breaker.state == "closed" and not validator.deferred
+
+
+def test_failed_revalidation_keeps_the_detection_queued(frame):
+    model = FlakyModel(fail=True)
+    validator = GeminiValidator(model=model, breaker_failures=1, breaker_reset_sec=0.05, degraded_policy="queue")
+    validator.validate_detection(frame, "No helmet")
+    validator.validate_detection(frame, "No helmet")
+    time.sleep(0.06)
+    assert validator.revalidate_deferred(lambda detection, result: None) == 0
+    assert len(validator.deferred) == 1 and validator.breaker.state == "open"
+
+
+def test_slow_calls_hit_the_deadline(frame):
+    validator = GeminiValidator(model=FlakyModel(latency_sec=0.3), deadline_sec=0.05, breaker_failures=10)
+    start = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        validator.generate(["prompt"])
+    assert time.perf_counter() - start < 0.25
+    assert validator.health()["timeouts"] == 1
+
+
+def test_saturated_calls_are_refused_instead_of_queued():
+    model = FlakyModel(latency_sec=0.3)
+    validator = GeminiValidator(model=model, deadline_sec=0.05, breaker_failures=10, max_calls_in_flight=2)
+    for _ in range(2):
+        with pytest.raises(TimeoutError):
+            validator.generate(["prompt"])
+
+    # Both slots are held by calls that missed their deadline
+    start = time.perf_counter()
+    with pytest.raises(ValidationUnavailable):
+        validator.generate(["prompt"])
+    assert time.perf_counter() - start < 0.05
+    assert validator.health()["saturated"] == 1
+
+    time.sleep(0.35)
+    assert model.started == 2  # the refused call never ran late
+    model.latency_sec = 0.0
+    assert validator.generate(["prompt"]).text == VERDICT
+
+
+def test_timed_out_calls_that_have_not_started_are_cancelled():
+    model = FlakyModel(latency_sec=0.2)
+    validator = GeminiValidator(model=model, deadline_sec=0.05, breaker_failures=10)
+    validator._call_executor.shutdown()
+    validator._call_executor = ThreadPoolExecutor(max_workers=1)
+    blocker = validator._call_executor.submit(time.sleep, 0.2)  # keeps the only thread busy
+
+    with pytest.raises(TimeoutError):
+        validator.generate(["prompt"])
+    blocker.result()
+    time.sleep(0.1)
+    assert model.started == 0
+
+
+def test_local_refusals_do_not_reopen_a_half_open_breaker():
+    model = FlakyModel(fail=True)
+    validator = GeminiValidator(model=model, breaker_failures=1, breaker_reset_sec=0.05,
+                                rate_limit_per_sec=0.5, rate_limit_burst=1, rate_limit_wait_sec=0.0)
+    with pytest.raises(RuntimeError):
+        validator.generate(["prompt"])  # uses the only token and opens the breaker
+    time.sleep(0.06)
+
+    with pytest.raises(ValidationUnavailable, match="rate limit"):
+        validator.generate(["prompt"])
+    assert validator.breaker.state == "half_open"
+    assert validator.breaker.times_opened == 1
+    assert validator.breaker.allow()  # the trial slot was given back
+
+
+def test_rate_limit_wait_is_capped(frame):
+    validator = GeminiValidator(model=FlakyModel(), rate_limit_per_sec=0.1, rate_limit_burst=1,
+                                rate_limit_wait_sec=0.05, deadline_sec=15, degraded_policy="reject")
+    assert validator.validate_detection(frame, "No helmet")["status"] == "correct"
+    start = time.perf_counter()
+    assert validator.validate_detection(frame, "No helmet")["status"] == "incorrect"
+    assert time.perf_counter() - start < 1.0
+    assert validator.health()["rate_limited"] == 1
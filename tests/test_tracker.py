@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from app.tracker import IoUTracker, ViolationTracker, create_violation_tracker, iou_matrix
+
+
+def test_iou_matrix():
+    ious = iou_matrix([[0, 0, 10, 10]], [[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]])
+    assert ious[0] == pytest.approx([1.0, 1 / 3, 0.0])
+
+
+def test_overlapping_boxes_keep_their_track():
+    tracker = IoUTracker(iou_threshold=0.3)
+    first = tracker.update([[0, 0, 50, 50], [200, 200, 260, 260]])
+    second = tracker.update([[205, 202, 265, 262], [3, 1, 53, 51]])  # same objects, other order
+    assert second[0] is first[1] and second[1] is first[0]
+    assert [track.hits for track in second] == [2, 2]
+
+
+def test_low_overlap_starts_a_new_track():
+    tracker = IoUTracker(iou_threshold=0.3)
+    first = tracker.update([[0, 0, 50, 50]])[0]
+    second = tracker.update([[40, 40, 90, 90]])[0]
+    assert second is not first and second.track_id == first.track_id + 1
+
+
+def test_each_track_takes_at_most_one_detection():
+    tracker = IoUTracker()
+    track = tracker.update([[0, 0, 50, 50]])[0]
+    matched = tracker.update([[0, 0, 50, 50], [2, 2, 52, 52]])
+    assert matched[0] is track and matched[1] is not track
+
+
+def test_unmatched_tracks_age_and_expire():
+    tracker = IoUTracker(max_age=2)
+    track = tracker.update([[0, 0, 50, 50]])[0]
+    for misses in (1, 2):
+        tracker.update([])
+        assert track in tracker.tracks and track.misses == misses
+    tracker.update([])
+    assert track not in tracker.tracks
+    assert tracker.update([[0, 0, 50, 50]])[0] is not track
+
+
+def test_velocity_prediction_bridges_a_missed_frame():
+    tracker = IoUTracker(iou_threshold=0.3, max_age=5)
+    track = tracker.update([[0, 0, 40, 40]])[0]
+    assert tracker.update([[20, 0, 60, 40]])[0] is track
+    assert track.velocity == pytest.approx([10, 0, 10, 0])  # smoothed step of 20px
+
+    tracker.update([])  # missed: the object keeps moving
+    # The last seen box does not overlap the object two frames later at all
+    assert iou_matrix([[20, 0, 60, 40]], [[60, 0, 100, 40]])[0, 0] == 0
+    assert tracker.update([[60, 0, 100, 40]])[0] is track
+    assert track.misses == 0 and track.hits == 3
+
+
+def test_one_report_per_track_per_violation_class():
+    tracker = ViolationTracker(iou_threshold=0.3, max_age=3)
+    rider = [[100, 100, 160, 200]]
+    assert tracker.new_violations("0", rider) == [(0, 1)]
+    for dx in range(5, 30, 5):
+        assert tracker.new_violations("0", [[100 + dx, 100, 160 + dx, 200]]) == []
+
+    # Another class at the same place is its own violation, reported once too
+    assert tracker.new_violations("triple riding", rider) == [(0, 1)]
+    assert tracker.new_violations("triple riding", rider) == []
+
+    # A second rider is reported separately
+    assert tracker.new_violations("0", [[125, 100, 185, 200], [400, 100, 460, 200]]) == [(1, 2)]
+
+
+def test_rider_is_reported_again_after_the_track_expires():
+    tracker = ViolationTracker(max_age=1)
+    box = [[0, 0, 50, 50]]
+    assert tracker.new_violations("0", box) == [(0, 1)]
+    tracker.new_violations("0", [])
+    tracker.new_violations("0", [])
+    assert tracker.new_violations("0", box) == [(0, 2)]
+
+
+def test_min_hits_delays_the_report():
+    tracker = ViolationTracker(min_hits=3)
+    box = [[0, 0, 50, 50]]
+    assert tracker.new_violations("0", box) == []
+    assert tracker.new_violations("0", box) == []
+    assert tracker.new_violations("0", box) == [(0, 1)]
+    assert tracker.new_violations("0", box) == []
+
+
+def test_create_violation_tracker_reads_config():
+    tracker = create_violation_tracker({"tracker": {"iou_threshold": 0.5, "max_age": 4, "min_hits": 2}})
+    assert (tracker.iou_threshold, tracker.max_age, tracker.min_hits) == (0.5, 4, 2)
+    assert create_violation_tracker({}).max_age == 15
+
+
+def test_empty_frames_report_nothing():
+    tracker = ViolationTracker()
+    assert tracker.new_violations("0", np.empty((0, 4), dtype=np.float32)) == []
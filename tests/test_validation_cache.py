@@ -0,0 +1,130 @@
+import json
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from app.gemini_validator import GeminiValidator, ValidationCache, perceptual_hash
+
+RESULT = {"status": "correct", "confidence": 0.9, "reason": "stub"}
+
+
+@pytest.fixture
+def crop():
+    rng = np.random.default_rng(5)
+    small = rng.integers(0, 255, size=(12, 16, 3), dtype=np.uint8)
+    return cv2.resize(small, (160, 120), interpolation=cv2.INTER_LINEAR)
+
+
+def test_near_duplicate_crop_has_a_close_hash(crop):
+    noisy = np.clip(crop.astype(np.int16) + np.random.default_rng(1).integers(-3, 4, crop.shape), 0, 255)
+    recompressed = cv2.imdecode(cv2.imencode(".jpg", noisy.astype(np.uint8), [cv2.IMWRITE_JPEG_QUALITY, 70])[1],
+                                cv2.IMREAD_COLOR)
+    assert (perceptual_hash(crop) ^ perceptual_hash(recompressed)).bit_count() <= 4
+    assert (perceptual_hash(crop) ^ perceptual_hash(255 - crop)).bit_count() > 32
+
+
+def test_hit_within_the_hamming_threshold(crop):
+    cache = ValidationCache(max_distance=4)
+    image_hash = perceptual_hash(crop)
+    cache.put("No helmet", image_hash, RESULT)
+    assert cache.get("No helmet", image_hash ^ 0b1011) == RESULT  # 3 bits apart
+    assert cache.get("No helmet", image_hash ^ (0b11111 << 40)) is None  # 5 bits apart
+    assert cache.get("Triple Riding", image_hash) is None  # other violation type
+    assert cache.get("No helmet", perceptual_hash(255 - crop)) is None  # different crop
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hits_by_distance"]) == (1, 3, {3: 1})
+
+
+def test_closest_entry_wins():
+    cache = ValidationCache(max_distance=4)
+    cache.put("0", 0b1111, {"status": "incorrect", "confidence": 0.8, "reason": "far"})
+    cache.put("0", 0b0001, RESULT)
+    assert cache.get("0", 0) == RESULT
+
+
+def test_hits_match_a_full_scan():
+    rng = np.random.default_rng(9)
+    cache = ValidationCache(max_entries=1000, max_distance=4)
+    hashes = [int(h) for h in rng.integers(0, 2 ** 63, size=300, dtype=np.int64)]
+    for h in hashes:
+        cache.put("0", h, {"hash": h})
+    for _ in range(500):
+        query = hashes[int(rng.integers(len(hashes)))]
+        for bit in rng.choice(64, size=int(rng.integers(0, 7)), replace=False):
+            query ^= 1 << int(bit)
+        distances = [(h ^ query).bit_count() for h in hashes]
+        found = cache.get("0", query)
+        if min(distances) <= 4:
+            assert (found["hash"] ^ query).bit_count() == min(distances)
+        else:
+            assert found is None
+
+
+def test_entries_expire_after_ttl():
+    cache = ValidationCache(ttl_sec=0.05)
+    cache.put("0", 42, RESULT)
+    assert cache.get("0", 42) == RESULT
+    time.sleep(0.06)
+    assert cache.get("0", 42) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ValidationCache(max_entries=2, max_distance=0)
+    cache.put("0", 1, RESULT)
+    cache.put("0", 2, RESULT)
+    cache.get("0", 1)  # 2 is now the least recently used
+    cache.put("0", 3, RESULT)
+    assert cache.get("0", 2) is None
+    assert cache.get("0", 1) == RESULT and cache.get("0", 3) == RESULT
+    assert cache.stats()["evictions"] == 1
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "cache.json")
+    cache = ValidationCache(path=path, save_interval_sec=60)
+    cache.put("No helmet", 0xFFFF0000FFFF0000, RESULT)
+    cache.put("Triple Riding", 7, {"status": "incorrect", "confidence": 0.6, "reason": "stub"})
+    cache.flush()
+    assert len(json.load(open(path))) == 2
+
+    loaded = ValidationCache(path=path)
+    assert loaded.get("No helmet", 0xFFFF0000FFFF0001) == RESULT
+    assert loaded.get("Triple Riding", 7)["status"] == "incorrect"
+
+
+def test_save_is_batched_on_a_timer(tmp_path):
+    path = tmp_path / "cache.json"
+    cache = ValidationCache(path=str(path), save_interval_sec=0.05)
+    cache.put("0", 1, RESULT)
+    cache.put("0", 2, RESULT)
+    assert not path.exists()
+    time.sleep(0.2)
+    assert len(json.loads(path.read_text())) == 2
+
+
+def test_revalidated_verdicts_are_cached(crop):
+    class RecoveringModel:
+        fail = True
+        calls = 0
+
+        def generate_content(self, parts, **kwargs):
+            self.calls += 1
+            if self.fail:
+                raise RuntimeError("injected failure")
+            return type("Response", (), {"text": json.dumps(RESULT)})()
+
+    model = RecoveringModel()
+    validator = GeminiValidator(model=model, cache=ValidationCache(), breaker_failures=1, breaker_reset_sec=0.05,
+                                degraded_policy="queue")
+    validator.validate_detection(crop, "No helmet")  # opens the breaker
+    assert validator.validate_detection(crop, "No helmet")["status"] == "deferred"
+
+    model.fail = False
+    time.sleep(0.06)
+    assert validator.revalidate_deferred(lambda detection, result: None) == 1
+    calls = model.calls
+    assert validator.validate_detection(crop, "No helmet") == RESULT
+    assert model.calls == calls  # served from the cache